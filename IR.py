@@ -4,7 +4,10 @@ Hỗ trợ điều khiển LED phát và LED thu qua slider bar
 """
 
 import threading
-import time
+from throttle import Throttle
+from applog import get_logger
+
+log = get_logger('ir')
 
 class IRController:
     """Class điều khiển IR với slider analog"""
@@ -27,10 +30,10 @@ class IRController:
         # Lock để đảm bảo thread-safe
         self._lock = threading.Lock()
         
-        # Thời gian gửi lệnh cuối (để tránh spam)
-        self.last_transmit_send = 0
-        self.last_receive_send = 0
+        # Throttle gửi lệnh (để tránh spam), luôn gửi giá trị cuối của slider
         self.send_interval = 0.1  # 100ms interval minimum
+        self._transmit_throttle = Throttle(self._send_transmit_command, self.send_interval)
+        self._receive_throttle = Throttle(self._send_receive_command, self.send_interval)
         
     def set_transmit_value(self, voltage):
         """
@@ -43,12 +46,8 @@ class IRController:
             # Giới hạn giá trị trong khoảng 0-3.3V
             voltage = max(0.0, min(3.3, voltage))
             self.transmit_value = voltage
-            
-            # Kiểm tra thời gian gửi để tránh spam
-            current_time = time.time()
-            if current_time - self.last_transmit_send >= self.send_interval:
-                self._send_transmit_command(voltage)
-                self.last_transmit_send = current_time
+        
+        self._transmit_throttle(voltage)
     
     def set_receive_value(self, voltage):
         """
@@ -61,12 +60,8 @@ class IRController:
             # Giới hạn giá trị trong khoảng 0-3.3V
             voltage = max(0.0, min(3.3, voltage))
             self.receive_value = voltage
-            
-            # Kiểm tra thời gian gửi để tránh spam
-            current_time = time.time()
-            if current_time - self.last_receive_send >= self.send_interval:
-                self._send_receive_command(voltage)
-                self.last_receive_send = current_time
+        
+        self._receive_throttle(voltage)
     
     def _send_transmit_command(self, voltage):
         """
@@ -77,10 +72,10 @@ class IRController:
         """
         try:
             command = f"IRtransmitOut:{voltage:.1f}"
-            self.comm_handler.send_udp_command(command)
-            print(f"[IR] Sent transmit command: {command}")
+            self.comm_handler.queue_command(command)
+            log.debug("Sent transmit command: %s", command)
         except Exception as e:
-            print(f"[IR] Error sending transmit command: {e}")
+            log.error("Error sending transmit command: %s", e)
     
     def _send_receive_command(self, voltage):
         """
@@ -91,10 +86,10 @@ class IRController:
         """
         try:
             command = f"IRRecieveOut:{voltage:.1f}"
-            self.comm_handler.send_udp_command(command)
-            print(f"[IR] Sent receive command: {command}")
+            self.comm_handler.queue_command(command)
+            log.debug("Sent receive command: %s", command)
         except Exception as e:
-            print(f"[IR] Error sending receive command: {e}")
+            log.error("Error sending receive command: %s", e)
     
     def get_transmit_value(self):
         """Lấy giá trị hiện tại của LED phát"""
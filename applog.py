@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Logging subsystem for Cube Touch Monitor
+Logger theo module, lọc theo level và ghi qua QueueHandler để thread mạng/GUI không bị chặn bởi stdout
+"""
+
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+from typing import Dict, Optional
+
+ROOT_LOGGER = "cube"
+HOT_LOGGER = ROOT_LOGGER + ".hot"  # Log mỗi packet/mẫu, mặc định tắt
+LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR")
+
+LOG_FORMAT = "%(asctime)s %(levelname)-7s [%(tag)s] %(message)s"
+
+class SampleFilter(logging.Filter):
+    """Chỉ cho qua 1/N record từ mỗi vị trí gọi"""
+
+    def __init__(self, every: int = 1):
+        super().__init__()
+        self.every = max(1, int(every))
+        self._counts: Dict[tuple, int] = {}
+
+    def filter(self, record) -> bool:
+        if self.every == 1:
+            return True
+        key = (record.pathname, record.lineno)
+        count = self._counts.get(key, 0)
+        self._counts[key] = count + 1
+        if count % self.every:
+            return False
+        if count:
+            record.msg = f"{record.msg} [sampled 1/{self.every}]"
+        return True
+
+class _TagFormatter(logging.Formatter):
+    """Hiển thị tên module dạng [HEARTBEAT] như các log cũ"""
+
+    def format(self, record):
+        record.tag = record.name.rsplit('.', 1)[-1].upper()
+        return super().format(record)
+
+_lock = threading.Lock()
+_listener: Optional[logging.handlers.QueueListener] = None
+_sampler = SampleFilter()
+_hot_enabled = False
+
+def get_logger(name: str, hot: bool = False) -> logging.Logger:
+    """Logger cho một module; hot=True cho log trên hot path (lấy mẫu, mặc định tắt)"""
+    if not hot:
+        return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+    logger = logging.getLogger(f"{HOT_LOGGER}.{name}")
+    # Filter của logger không kế thừa nên gắn sampler cho từng hot logger
+    if _sampler not in logger.filters:
+        logger.addFilter(_sampler)
+    return logger
+
+def setup_logging(level: str = "INFO", hot_path: bool = False, sample_every: int = 100,
+                  stream=None):
+    """Khởi động listener ghi log nền (gọi nhiều lần chỉ cập nhật level)"""
+    global _listener
+
+    with _lock:
+        if _listener is None:
+            handler = logging.StreamHandler(stream or sys.stdout)
+            handler.setFormatter(_TagFormatter(LOG_FORMAT, datefmt="%H:%M:%S"))
+
+            log_queue = queue.SimpleQueue()
+            root = logging.getLogger(ROOT_LOGGER)
+            root.addHandler(logging.handlers.QueueHandler(log_queue))
+            root.propagate = False
+
+            _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+            _listener.start()
+
+    set_level(level)
+    set_hot_path(hot_path, sample_every)
+
+def shutdown_logging():
+    """Dừng listener sau khi ghi hết log còn trong queue"""
+    global _listener
+
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            root = logging.getLogger(ROOT_LOGGER)
+            for handler in list(root.handlers):
+                if isinstance(handler, logging.handlers.QueueHandler):
+                    root.removeHandler(handler)
+            _listener = None
+
+def set_level(level: str):
+    """Đổi level cho toàn bộ logger của ứng dụng lúc đang chạy"""
+    level = level.upper()
+    if level not in LEVELS:
+        raise ValueError(f"Unknown log level: {level}")
+    logging.getLogger(ROOT_LOGGER).setLevel(level)
+
+def set_hot_path(enabled: bool, sample_every: Optional[int] = None):
+    """Bật/tắt log hot path lúc đang chạy"""
+    global _hot_enabled
+
+    if sample_every is not None:
+        _sampler.every = max(1, int(sample_every))
+        _sampler._counts.clear()
+    _hot_enabled = bool(enabled)
+    # Khi tắt, isEnabledFor(DEBUG) trả về False ngay tại nơi gọi
+    logging.getLogger(HOT_LOGGER).setLevel(logging.DEBUG if _hot_enabled else logging.CRITICAL)
+
+def get_log_settings() -> dict:
+    """Cấu hình log hiện tại (cho admin window)"""
+    return {
+        'level': logging.getLevelName(logging.getLogger(ROOT_LOGGER).getEffectiveLevel()),
+        'hot_path': _hot_enabled,
+        'sample_every': _sampler.every
+    }
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Archive module for Cube Touch Monitor
+Ghi nền toàn bộ log và telemetry ra các file segment xoay vòng theo kích thước/thời gian
+"""
+
+import glob
+import gzip
+import io
+import os
+import queue
+import shutil
+import threading
+import time
+from typing import Dict, List, Optional
+from telemetry import AdcFrame, TouchFrame
+from applog import get_logger
+
+try:
+    import zstandard
+except ImportError:  # zstd là tùy chọn
+    zstandard = None
+
+log = get_logger('archive')
+
+STREAMS = ('logs', 'telemetry')
+TELEMETRY_HEADER = "time,ip,kind,value,threshold,stt\n"
+
+_COMPRESSED_SUFFIX = {'gzip': '.gz', 'zstd': '.zst'}
+
+class SegmentWriter:
+    """Ghi một stream vào các file segment, xoay vòng theo kích thước hoặc tuổi"""
+
+    def __init__(self, directory: str, stream: str, max_bytes: int, max_age: float,
+                 compress: Optional[str] = None, keep_segments: int = 0, header: str = ""):
+        self.directory = directory
+        self.stream = stream
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.compress = compress
+        self.keep_segments = keep_segments
+        self.header = header.encode('utf-8')
+
+        self._file = None
+        self._path = None
+        self._bytes = 0
+        self._opened_at = 0.0
+        self._index = 0
+        self.segments_closed = 0
+
+    def write(self, data: bytes):
+        """Ghi một lô dữ liệu, mở segment mới khi cần"""
+        if self._file is not None and (self._bytes >= self.max_bytes or
+                                       time.monotonic() - self._opened_at >= self.max_age):
+            self.rotate()
+        if self._file is None:
+            self._open()
+        self._file.write(data)
+        self._bytes += len(data)
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def rotate(self):
+        """Đóng segment hiện tại (nén nếu bật) và xóa segment cũ vượt giới hạn"""
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+
+        if self.compress:
+            self._compress(self._path)
+        self.segments_closed += 1
+        self._prune()
+
+    def close(self):
+        self.rotate()
+
+    def _open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        self._path = os.path.join(self.directory, f"{self.stream}-{stamp}-{self._index:04d}.log")
+        self._index += 1
+        # Buffer lớn: ghi xuống đĩa theo lô thay vì mỗi dòng
+        self._file = open(self._path, 'ab', buffering=256 * 1024)
+        self._file.write(self.header)
+        self._bytes = len(self.header)
+        self._opened_at = time.monotonic()
+
+    def _compress(self, path: str):
+        """Nén segment đã đóng, thay file gốc bằng file nén"""
+        target = path + _COMPRESSED_SUFFIX[self.compress]
+        try:
+            with open(path, 'rb') as src:
+                if self.compress == 'zstd':
+                    with open(target, 'wb') as dst:
+                        zstandard.ZstdCompressor().copy_stream(src, dst)
+                else:
+                    with gzip.open(target, 'wb', compresslevel=6) as dst:
+                        shutil.copyfileobj(src, dst, 1024 * 1024)
+            os.remove(path)
+        except OSError as e:
+            log.error("Error compressing segment %s: %s", path, e)
+
+    def _prune(self):
+        if self.keep_segments <= 0:
+            return
+        segments = self.list_segments()
+        for path in segments[:-self.keep_segments]:
+            try:
+                os.remove(path)
+            except OSError as e:
+                log.error("Error removing segment %s: %s", path, e)
+
+    def list_segments(self) -> List[str]:
+        """Các segment của stream theo thứ tự thời gian (kể cả segment đang ghi)"""
+        paths = glob.glob(os.path.join(self.directory, f"{self.stream}-*.log*"))
+        # Tên chứa thời điểm mở và số thứ tự nên sắp xếp theo tên là theo thời gian
+        return sorted(paths)
+
+def open_segment(path: str):
+    """Mở segment để đọc (tự giải nén theo đuôi file)"""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise RuntimeError(f"zstandard is required to read {path}")
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True))
+    return open(path, 'rb')
+
+class Archiver:
+    """Thread nền nhận log/telemetry qua queue và ghi ra segment"""
+
+    def __init__(self, config):
+        self.config = config
+        compress = config.archive_compress
+        if compress == 'zstd' and zstandard is None:
+            log.warning("zstandard not installed, archive segments will use gzip")
+            compress = 'gzip'
+        if compress not in (None, 'gzip', 'zstd'):
+            raise ValueError(f"Unknown archive compression: {compress}")
+
+        self.writers: Dict[str, SegmentWriter] = {
+            stream: SegmentWriter(config.archive_dir, stream, config.archive_segment_bytes,
+                                  config.archive_segment_seconds, compress,
+                                  config.archive_keep_segments,
+                                  TELEMETRY_HEADER if stream == 'telemetry' else "")
+            for stream in STREAMS
+        }
+
+        self._queue = queue.SimpleQueue()
+        self.is_running = False
+        self.thread = None
+
+        # Thống kê
+        self.lines_written = 0
+        self.records_written = 0
+
+    def start(self):
+        """Bắt đầu thread ghi"""
+        if self.is_running:
+            return
+        self.is_running = True
+        self.thread = threading.Thread(target=self._writer_loop, daemon=True)
+        self.thread.start()
+        log.info("Archiving to %s", os.path.abspath(self.config.archive_dir))
+
+    def stop(self):
+        """Ghi hết queue, đóng segment và dừng thread"""
+        if not self.is_running:
+            return
+        self.is_running = False
+        self._queue.put(None)
+        self.thread.join(timeout=10)
+
+    def log(self, entry: str):
+        """Lưu một dòng log (không chặn)"""
+        if self.is_running:
+            self._queue.put(('logs', entry))
+
+    def record(self, ip: str, frame):
+        """Lưu một telemetry record đã giải mã (không chặn, định dạng trong thread ghi)"""
+        if self.is_running:
+            self._queue.put(('telemetry', (time.time(), ip, frame)))
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Chờ thread ghi xuống đĩa mọi thứ đã đưa vào queue"""
+        if not self.is_running:
+            return True
+        done = threading.Event()
+        self._queue.put(('flush', done))
+        return done.wait(timeout)
+
+    def export(self, filename: str, stream: str = 'logs') -> str:
+        """Nối các segment của stream vào một file (giải nén nếu cần)"""
+        self.flush()
+        writer = self.writers[stream]
+        with open(filename, 'wb') as dst:
+            dst.write(writer.header)
+            for path in writer.list_segments():
+                with open_segment(path) as src:
+                    if writer.header:
+                        src.readline()  # Header chỉ ghi một lần
+                    shutil.copyfileobj(src, dst, 1024 * 1024)
+        return filename
+
+    def _writer_loop(self):
+        """Gom các item trong queue thành lô rồi ghi một lần mỗi stream"""
+        flush_interval = self.config.archive_flush_interval
+        last_flush = time.monotonic()
+        running = True
+
+        while running:
+            try:
+                item = self._queue.get(timeout=flush_interval)
+            except queue.Empty:
+                item = ()
+
+            batches = {'logs': [], 'telemetry': []}
+            waiters = []
+            # Lấy tiếp mọi item đang chờ mà không chặn
+            while True:
+                if item is None:
+                    running = False
+                elif item:
+                    kind, payload = item
+                    if kind == 'flush':
+                        waiters.append(payload)
+                    else:
+                        batches[kind].append(payload)
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            try:
+                self._write_batches(batches)
+                now = time.monotonic()
+                if waiters or not running or now - last_flush >= flush_interval:
+                    for writer in self.writers.values():
+                        writer.flush()
+                    last_flush = now
+            except Exception as e:
+                log.error("Error writing archive: %s", e)
+
+            for done in waiters:
+                done.set()
+
+        for writer in self.writers.values():
+            try:
+                writer.close()
+            except Exception as e:
+                log.error("Error closing archive segment: %s", e)
+
+    def _write_batches(self, batches: dict):
+        if batches['logs']:
+            lines = batches['logs']
+            self.writers['logs'].write(''.join(f"{line}\n" for line in lines).encode('utf-8'))
+            self.lines_written += len(lines)
+
+        if batches['telemetry']:
+            records = batches['telemetry']
+            self.writers['telemetry'].write(''.join(
+                self._format_record(*record) for record in records).encode('utf-8'))
+            self.records_written += len(records)
+
+    @staticmethod
+    def _format_record(timestamp: float, ip: str, frame) -> str:
+        if isinstance(frame, TouchFrame):
+            value, threshold, stt = ('' if field is None else field for field in frame)
+            return f"{timestamp:.3f},{ip},touch,{value},{threshold},{stt}\n"
+        if isinstance(frame, AdcFrame):
+            return f"{timestamp:.3f},{ip},adc,{frame.value},,\n"
+        return f"{timestamp:.3f},{ip},invalid,,,\n"
+
+    def get_statistics(self) -> dict:
+        """Thống kê archive"""
+        return {
+            'archive_lines': self.lines_written,
+            'archive_records': self.records_written,
+            'archive_segments': sum(w.segments_closed for w in self.writers.values())
+        }
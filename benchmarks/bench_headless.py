@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Load test: chạy app ở chế độ headless trong process con và bơm telemetry + heartbeat
+Báo số datagram nhận được, CPU và bộ nhớ của process app (Linux/macOS)
+"""
+
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from config import AppConfig
+
+DEVICES = 50
+RATE_HZ = 5000  # Tổng số datagram telemetry mỗi giây
+SECONDS = 10
+
+CHILD = """
+import resource, sys, threading, time
+sys.path.insert(0, sys.argv[1])
+import main
+app = main.CubeTouchApp()
+threading.Timer(float(sys.argv[2]), app.stop_event.set).start()
+app.run_headless()
+usage = resource.getrusage(resource.RUSAGE_SELF)
+# ru_maxrss: KB trên Linux, byte trên macOS
+maxrss_mb = usage.ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+print(f"datagrams={app.ingest_server.total_datagrams}")
+print(f"devices={app.heartbeat_manager.get_device_count()['total']}")
+print(f"cpu_s={usage.ru_utime + usage.ru_stime:.2f}")
+print(f"maxrss_mb={maxrss_mb:.1f}")
+print(f"tk_loaded={'tkinter' in sys.modules}")
+"""
+
+
+def main():
+    config = AppConfig()
+    workdir = tempfile.mkdtemp(prefix="headless_bench_")  # archive/tsdb ghi vào đây
+    run_seconds = SECONDS + 3
+    child = subprocess.Popen([sys.executable, "-c", CHILD, ROOT, str(run_seconds)], cwd=workdir,
+                             stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sent = 0
+    try:
+        time.sleep(1.5)  # Chờ app mở socket
+        telemetry = ("127.0.0.1", config.osc_port)
+        heartbeat = ("127.0.0.1", 1509)
+        start = time.perf_counter()
+        next_heartbeat = start
+        while time.perf_counter() - start < SECONDS:
+            now = time.perf_counter()
+            if now >= next_heartbeat:
+                for i in range(DEVICES):
+                    sender.sendto(f"HEARTBEAT:Cube{i},IP:127.0.0.1,HELLO".encode(), heartbeat)
+                next_heartbeat += config.heartbeat_interval
+            # Gửi theo lô 1 ms một lần
+            target = int((now - start) * RATE_HZ)
+            while sent < target:
+                sender.sendto(b"Val:22046 Thr:21649 Stt:0" if sent & 1 else b"IR_ADC:2342", telemetry)
+                sent += 1
+            time.sleep(0.001)
+        output, _ = child.communicate(timeout=run_seconds + 30)
+    finally:
+        sender.close()
+        if child.poll() is None:
+            child.kill()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    result = dict(line.split("=") for line in output.splitlines() if "=" in line)
+    print(f"sent {sent:,} telemetry datagrams in {SECONDS}s to a headless app with {DEVICES} devices")
+    for key, value in result.items():
+        print(f"  {key:<10} {value}")
+    if 'cpu_s' in result:
+        print(f"  cpu        {100 * float(result['cpu_s']) / run_seconds:.1f}% of one core over the run")
+
+
+if __name__ == "__main__":
+    main()
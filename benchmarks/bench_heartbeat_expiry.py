@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Mô phỏng 10k ESP32 gửi heartbeat tới HeartbeatManager
+Đo chi phí mỗi lần kiểm tra timeout và độ trễ phát hiện offline so với hạn thật
+"""
+
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import applog
+from config import AppConfig
+from heartbeat import HeartbeatManager
+
+DEVICES = 10000
+
+
+def make_manager() -> HeartbeatManager:
+    manager = HeartbeatManager(AppConfig())
+    for i in range(DEVICES):
+        manager._update_device(f"Cube{i}", f"10.{i // 65536}.{(i // 256) % 256}.{i % 256}")
+    return manager
+
+
+def bench_check_cost():
+    """Chi phí một lần kiểm tra khi không có device nào đến hạn"""
+    manager = make_manager()
+    devices = list(manager.devices.values())
+    rounds = 50
+    
+    # Cách cũ: duyệt toàn bộ device với datetime mỗi giây
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for device in devices:
+            device.check_timeout(manager.timeout_seconds)
+    linear = (time.perf_counter() - start) / rounds * 1000
+    
+    start = time.perf_counter()
+    for _ in range(rounds):
+        manager.check_timeouts()
+    heap = (time.perf_counter() - start) / rounds * 1000
+    
+    print(f"check cost with {DEVICES:,} online devices: linear scan {linear:.2f} ms, heap {heap:.4f} ms")
+
+
+def bench_detection_latency():
+    """Mỗi device có timeout riêng 0.2-1.5s, đo lúc bị đánh dấu offline so với hạn"""
+    random.seed(1)
+    lags = []
+    done = threading.Event()
+    
+    manager = HeartbeatManager(AppConfig())
+    
+    def on_offline(device):
+        lags.append(time.monotonic() - device.last_seen - manager.get_timeout(device))
+        if len(lags) == DEVICES:
+            done.set()
+    
+    manager.on_device_offline = on_offline
+    manager.is_running = True
+    checker = threading.Thread(target=manager._timeout_checker, daemon=True)
+    checker.start()
+    
+    for i in range(DEVICES):
+        name = f"Cube{i}"
+        manager._update_device(name, f"10.{i // 65536}.{(i // 256) % 256}.{i % 256}")
+        manager.set_device_timeout(name, random.uniform(0.2, 1.5))
+    
+    done.wait(10)
+    manager.stop()
+    lags_ms = sorted(lag * 1000 for lag in lags)
+    print(f"offline detection lag over {len(lags):,} devices: "
+          f"median {statistics.median(lags_ms):.2f} ms, p99 {lags_ms[int(len(lags_ms) * 0.99)]:.2f} ms, "
+          f"max {lags_ms[-1]:.2f} ms (old checker: up to 1000 ms)")
+
+
+def main():
+    applog.set_level("ERROR")  # Không in 10k dòng "went OFFLINE"
+    bench_check_cost()
+    bench_detection_latency()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: ghi log và đọc log mới khi store đã đầy
+So sánh cách cũ (list + pop(0), đọc bản sao toàn bộ) với LogStore ring buffer
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logstore import LogStore
+
+ENTRIES = 20000
+READ_EVERY = 10  # Admin window đọc log sau mỗi 10 dòng mới
+
+
+def run_list(capacity: int) -> float:
+    """Cách cũ: append + pop(0), admin đọc bản sao cả list"""
+    logs = [f"[00:00:00] IR ADC: {i}" for i in range(capacity)]
+    start = time.perf_counter()
+    for i in range(ENTRIES):
+        logs.append(f"[00:00:00] IR ADC: {i}")
+        if len(logs) > capacity:
+            logs.pop(0)
+        if i % READ_EVERY == 0:
+            '\n'.join(logs.copy())
+    return time.perf_counter() - start
+
+
+def run_store(capacity: int) -> float:
+    """LogStore: append O(1), admin chỉ đọc dòng mới"""
+    store = LogStore(capacity)
+    for i in range(capacity):
+        store.append(f"[00:00:00] IR ADC: {i}")
+    seq = store.next_seq
+    start = time.perf_counter()
+    for i in range(ENTRIES):
+        store.append(f"[00:00:00] IR ADC: {i}")
+        if i % READ_EVERY == 0:
+            seq, lines = store.get_since(seq)
+            ''.join(f"{line}\n" for line in lines)
+    return time.perf_counter() - start
+
+
+def main():
+    print(f"{'capacity':>10} {'list (us/entry)':>16} {'LogStore (us/entry)':>20}")
+    for capacity in (100, 10000, 100000):
+        old = run_list(capacity) / ENTRIES * 1e6
+        new = run_store(capacity) / ENTRIES * 1e6
+        print(f"{capacity:>10,} {old:>16.2f} {new:>20.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark: shared-memory bridge cho monitor.py
+Đo chi phí publish() trên thread ingest và số record một process monitor đọc được (có bị mất không)
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import applog
+from config import AppConfig
+from shmbridge import MonitorBridge
+from telemetry import AdcFrame, TouchFrame
+
+N = 200_000
+RATE_HZ = 20_000  # Tốc độ ghi khi đo process đọc
+SECONDS = 3
+
+# Process monitor: đọc ring mỗi monitor_refresh_ms như MonitorWindow.poll_bridge
+READER = """
+import sys, time
+sys.path.insert(0, sys.argv[1])
+from config import AppConfig
+from shmbridge import MonitorClient
+client = MonitorClient(sys.argv[2])
+interval = AppConfig().monitor_refresh_ms / 1000
+deadline = time.monotonic() + float(sys.argv[3])
+read_ns = 0
+while time.monotonic() < deadline:
+    start = time.perf_counter_ns()
+    client.read()
+    read_ns += time.perf_counter_ns() - start
+    time.sleep(interval)
+client.read()
+print(f"read={client.records_read}")
+print(f"lost={client.records_lost}")
+print(f"read_ns={read_ns / max(client.records_read, 1):.0f}")
+client.close()
+"""
+
+
+def main():
+    applog.set_level("ERROR")
+    config = AppConfig()
+    config.monitor_shm_name = f"bench_monitor_{os.getpid()}"
+    bridge = MonitorBridge(config)
+    bridge.start()
+    try:
+        frames = [TouchFrame(22046, 21649, i & 1) if i & 1 else AdcFrame(2342) for i in range(1000)]
+        start = time.perf_counter()
+        for i in range(N):
+            bridge.publish("192.168.0.43", frames[i % 1000])
+        elapsed = time.perf_counter() - start
+        print(f"publish: {elapsed / N * 1e9:.0f} ns/record ({N / elapsed:,.0f} records/s on one thread)")
+
+        reader = subprocess.Popen([sys.executable, "-c", READER, ROOT, bridge.name, str(SECONDS + 0.5)],
+                                  stdout=subprocess.PIPE, text=True)
+        time.sleep(0.3)  # Chờ reader kết nối
+        written = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < SECONDS:
+            target = int((time.perf_counter() - start) * RATE_HZ)
+            while written < target:
+                bridge.publish("192.168.0.43", frames[written % 1000])
+                written += 1
+            time.sleep(0.001)
+        output, _ = reader.communicate(timeout=30)
+    finally:
+        bridge.stop()
+
+    result = dict(line.split("=") for line in output.splitlines() if "=" in line)
+    print(f"reader process at {RATE_HZ:,} records/s for {SECONDS}s (ring {config.monitor_ring_records:,} records, "
+          f"polled every {config.monitor_refresh_ms} ms):")
+    print(f"  written   {written:,}")
+    print(f"  read      {int(result['read']):,}")
+    print(f"  lost      {int(result['lost']):,}")
+    print(f"  read cost {result['read_ns']} ns/record")
+
+
+if __name__ == "__main__":
+    main()
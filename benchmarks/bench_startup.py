@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark: thời gian khởi động
+Phân tích `-X importtime` của các module chính và đo thời gian từ lúc chạy process đến khi nhận packet đầu tiên
+"""
+
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from config import AppConfig
+
+MODULES = ("main", "gui", "matplotlib.backends.backend_tkagg")
+TOP = 12
+TIMEOUT = 30.0
+
+# Chạy trong process con: dựng app và khởi động mạng như CubeTouchApp.run, không có cửa sổ
+CHILD = """
+import sys, time
+sys.path.insert(0, sys.argv[1])
+import main
+app = main.CubeTouchApp()
+app.start_network()
+deadline = time.perf_counter() + float(sys.argv[2])
+while 'first packet' not in app.startup_marks and time.perf_counter() < deadline:
+    time.sleep(0.001)
+for name, ms in app.startup_marks.items():
+    print(f"{name}={ms:.1f}")
+if app.ingest_server.first_datagram_at is not None:
+    # perf_counter dùng đồng hồ monotonic chung của hệ thống nên so được với process cha
+    print(f"spawn to first packet={(app.ingest_server.first_datagram_at - float(sys.argv[3])) * 1000:.1f}")
+app.stop_network()
+"""
+
+
+def import_times(module: str):
+    """(self_us, cumulative_us, tên) của mỗi import, hoặc lỗi nếu module không import được"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        return None, result.stderr.strip().splitlines()[-1]
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(self_us), int(cumulative_us), name.rstrip()))
+    return rows, None
+
+
+def report_imports():
+    for module in MODULES:
+        rows, error = import_times(module)
+        if rows is None:
+            print(f"import {module}: failed ({error})")
+            continue
+        total_ms = rows[-1][1] / 1000
+        print(f"import {module}: {total_ms:.0f} ms cumulative, heaviest imports:")
+        for self_us, cumulative_us, name in sorted(rows, key=lambda r: r[1], reverse=True)[1:TOP + 1]:
+            print(f"  {cumulative_us / 1000:8.1f} ms  (self {self_us / 1000:6.1f} ms) {name}")
+
+
+def time_to_first_packet():
+    """Khởi động app trong process con và gửi telemetry liên tục đến khi nó nhận được"""
+    config = AppConfig()
+    workdir = tempfile.mkdtemp(prefix="startup_bench_")  # archive/tsdb ghi vào đây
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    started = time.perf_counter()
+    child = subprocess.Popen([sys.executable, "-c", CHILD, ROOT, str(TIMEOUT), repr(started)], cwd=workdir,
+                             stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    try:
+        while child.poll() is None and time.perf_counter() - started < TIMEOUT:
+            sender.sendto(b"IR_ADC:2048", ("127.0.0.1", config.osc_port))
+            time.sleep(0.002)
+        output, _ = child.communicate(timeout=TIMEOUT)
+    finally:
+        sender.close()
+        if child.poll() is None:
+            child.kill()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    marks = dict(line.split("=") for line in output.splitlines() if "=" in line)
+    if "first packet" not in marks:
+        print("time to first packet: no packet received")
+        return
+    print("startup marks (ms from import of main, last line from process spawn):")
+    for name, ms in marks.items():
+        print(f"  {name:<22} {float(ms):8.1f} ms")
+
+
+def main():
+    report_imports()
+    print()
+    time_to_first_packet()
+
+
+if __name__ == "__main__":
+    main()
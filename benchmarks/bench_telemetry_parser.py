@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Benchmark giải mã telemetry: frames/giây của đường cũ (decode + split + re.search ở GUI)
+và đường mới (telemetry.parse_frame trên bytes)
+
+Usage: python benchmarks/bench_telemetry_parser.py [corpus.txt]
+Corpus là file mỗi dòng một datagram (mặc định benchmarks/data/telemetry_frames.txt)
+"""
+
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telemetry import parse_frame
+
+ROUNDS = 50
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "telemetry_frames.txt")
+
+
+def old_path(data: bytes, state: dict):
+    """Đường cũ: handle_raw_udp_data + _parse_data_line / _parse_ir_adc_frame + regex ở GUI"""
+    data_line = data.decode('utf-8').strip()
+    if data_line.startswith("IR_ADC:"):
+        if "IR_ADC:" in data_line:
+            value = int(data_line.split("IR_ADC:")[1].strip())
+            adc_match = re.search(r'IR_ADC:(\d+)', data_line)
+            if adc_match:
+                value = int(adc_match.group(1))
+            return value
+    else:
+        if "Val:" in data_line:
+            state['value'] = data_line.split("Val:")[1].split()[0]
+        if "Thr:" in data_line:
+            state['threshold'] = data_line.split("Thr:")[1].split()[0]
+        if "Stt:" in data_line:
+            state['raw_touch'] = data_line.split("Stt:")[1].strip()
+        return state
+
+
+def new_path(data: bytes, state: dict):
+    return parse_frame(data)
+
+
+def run(label, parse, corpus):
+    state = {}
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for data in corpus:
+            parse(data, state)
+    elapsed = time.perf_counter() - start
+    rate = ROUNDS * len(corpus) / elapsed
+    print(f"{label:<10} {rate:>12,.0f} frames/s")
+    return rate
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_CORPUS
+    with open(path, 'rb') as f:
+        corpus = [line.rstrip(b'\r\n') for line in f if line.strip()]
+    
+    unparsed = sum(1 for data in corpus if parse_frame(data) is None)
+    print(f"corpus: {len(corpus)} frames from {path} ({unparsed} unrecognised)")
+    
+    old = run("old", old_path, corpus)
+    new = run("new", new_path, corpus)
+    print(f"speedup: {new / old:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Mô phỏng kéo slider nhanh qua Throttle
+Kiểm tra giá trị cuối luôn được gửi trong vòng một interval và đếm số lệnh gửi thật
+"""
+
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from throttle import Throttle
+
+INTERVAL = 0.1
+BURSTS = 20
+
+
+def run_burst(burst_id: int):
+    sent = []
+    delivered = threading.Event()
+    final_value = None
+    
+    def send(value):
+        sent.append((time.monotonic(), value))
+        if value == final_value:
+            delivered.set()
+    
+    throttle = Throttle(send, INTERVAL)
+    
+    # Một đợt kéo slider: 5-200 lần cập nhật, cách nhau 0-20ms
+    updates = random.randint(5, 200)
+    values = [round(random.uniform(0, 3.3), 1) for _ in range(updates)]
+    final_value = (burst_id, values[-1])
+    for i, value in enumerate(values):
+        throttle((burst_id, value) if i < updates - 1 else final_value)
+        time.sleep(random.uniform(0, 0.02))
+    last_call = time.monotonic()
+    
+    ok = delivered.wait(INTERVAL * 2)
+    latency = (sent[-1][0] - last_call) if ok else float('inf')
+    return updates, len(sent), ok and latency <= INTERVAL + 0.01, latency
+
+
+def main():
+    random.seed(1)
+    failures = 0
+    total_updates = total_sent = 0
+    worst = 0.0
+    for burst_id in range(BURSTS):
+        updates, sent, ok, latency = run_burst(burst_id)
+        total_updates += updates
+        total_sent += sent
+        worst = max(worst, latency)
+        failures += 0 if ok else 1
+    
+    print(f"bursts: {BURSTS}, updates: {total_updates}, commands sent: {total_sent}")
+    print(f"worst final-value latency: {worst * 1000:.1f} ms (interval {INTERVAL * 1000:.0f} ms)")
+    print("PASS" if failures == 0 else f"FAIL: {failures} bursts lost or delayed the final value")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: time-series store với một giờ dữ liệu ADC
+Đo tốc độ ghi, range query, downsample trực tiếp, envelope từ pyramid và chi phí mở lại store
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import AppConfig
+from telemetry import AdcFrame
+from tsstore import TimeSeriesStore
+
+RATE_HZ = 500
+SECONDS = 3600
+PIXELS = 800
+
+
+def open_files():
+    """Số file descriptor đang mở của process (chỉ Linux)"""
+    try:
+        return len(os.listdir('/proc/self/fd'))
+    except OSError:
+        return 'n/a'
+
+
+def main():
+    config = AppConfig()
+    config.tsdb_dir = tempfile.mkdtemp(prefix="tsdb_bench_")
+    store = TimeSeriesStore(config)
+    ip = "192.168.0.43"
+    samples = RATE_HZ * SECONDS
+    t0 = time.time()
+    frames = [AdcFrame(i % 4096) for i in range(4096)]
+
+    try:
+        start = time.perf_counter()
+        for i in range(samples):
+            store.append_frame(ip, frames[i & 4095], t0 + i / RATE_HZ)
+        store.flush()
+        elapsed = time.perf_counter() - start
+        print(f"append: {samples:,} samples in {elapsed:.2f}s ({samples / elapsed:,.0f} samples/s)")
+
+        for window in (10, 60, 600, 3600):
+            t1 = t0 + SECONDS
+            start = time.perf_counter()
+            data = store.query(ip, 'adc', t1 - window, t1)
+            query_ms = (time.perf_counter() - start) * 1000
+            start = time.perf_counter()
+            store.downsample(ip, 'adc', t1 - window, t1, PIXELS)
+            down_ms = (time.perf_counter() - start) * 1000
+            series = store.series(ip, 'adc')
+            start = time.perf_counter()
+            series.envelope('value', t1 - window, t1, PIXELS)
+            pyramid_ms = (time.perf_counter() - start) * 1000
+            print(f"last {window:>5}s: query {len(data['t']):>9,} samples {query_ms:7.2f} ms, "
+                  f"downsample to {PIXELS} {down_ms:7.2f} ms, pyramid envelope {pyramid_ms:5.2f} ms")
+        print(f"open files: {open_files()}")
+
+        # Mở lại: packet đầu tiên của thiết bị tạo series trên thread ingest, pyramid dựng trong thread nền
+        store.close()
+        store = TimeSeriesStore(config)
+        start = time.perf_counter()
+        store.append_frame(ip, frames[0], t0 + SECONDS)
+        first_ms = (time.perf_counter() - start) * 1000
+        series = store.series(ip, 'adc')
+        while series.pyramids is None:
+            time.sleep(0.001)
+        ready_ms = (time.perf_counter() - start) * 1000
+        print(f"reopen: first append {first_ms:.1f} ms, pyramids ready after {ready_ms:.0f} ms, "
+              f"open files: {open_files()}")
+    finally:
+        store.close()
+        shutil.rmtree(config.tsdb_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
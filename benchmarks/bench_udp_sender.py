@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: số lệnh UDP gửi được mỗi giây
+So sánh cách cũ (tạo socket mới mỗi lệnh) với UDPSender dùng lại socket
+"""
+
+import os
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from communication import CommunicationHandler
+from config import AppConfig
+
+COMMANDS = 20000
+
+
+def send_per_call(command: str, address):
+    """Cách gửi cũ: mở, gửi, đóng socket cho mỗi lệnh"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.sendto(command.encode(), address)
+    sock.close()
+
+
+def run(label, send):
+    start = time.perf_counter()
+    for i in range(COMMANDS):
+        send(f"IRtransmitOut:{(i % 34) / 10:.1f}")
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {COMMANDS / elapsed:>12,.0f} cmd/s")
+    return COMMANDS / elapsed
+
+
+def main():
+    # Socket nhận giả lập ESP32 (không cần đọc, kernel tự bỏ khi đầy)
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(("127.0.0.1", 0))
+    address = receiver.getsockname()
+    
+    config = AppConfig()
+    config.esp_ip, config.esp_port = address
+    handler = CommunicationHandler(config)
+    
+    def old_send_udp_command(command):
+        send_per_call(command, address)
+        handler.total_packets_sent += 1
+        handler.add_log(f"Sent command: {command}")
+    
+    before = run("socket per command", lambda cmd: send_per_call(cmd, address))
+    after = run("pooled UDPSender", lambda cmd: handler.udp_sender.send(cmd.encode(), address))
+    old_full = run("send_udp_command (old)", old_send_udp_command)
+    new_full = run("send_udp_command (pooled)", handler.send_udp_command)
+    print(f"speedup: raw send {after / before:.1f}x, send_udp_command {new_full / old_full:.1f}x")
+    
+    handler.close()
+    receiver.close()
+
+
+if __name__ == "__main__":
+    main()
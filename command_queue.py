@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Command queue module for Cube Touch Monitor
+Hàng đợi lệnh gửi đi, gộp lệnh cũ và giới hạn tốc độ gửi theo thiết bị
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+# Các lệnh dạng "giá trị": lệnh mới thay thế lệnh cũ cùng khóa còn trong hàng đợi
+COALESCE_PREFIXES = ('IRtransmitOut', 'IRRecieveOut', 'THRESHOLD', 'LEDCTRL')
+
+def coalesce_key(command: str) -> Optional[str]:
+    """Lấy khóa gộp của lệnh, None nếu lệnh không được gộp"""
+    prefix, sep, rest = command.partition(':')
+    if sep:
+        if prefix == 'LEDCTRL':
+            # "LEDCTRL:ALL,r,g,b" -> "LEDCTRL:ALL", "LEDCTRL:5,r,g,b" -> "LEDCTRL:5"
+            return f"LEDCTRL:{rest.split(',', 1)[0]}"
+        if prefix in COALESCE_PREFIXES:
+            return prefix
+        return None
+    
+    # Lệnh màu thường: "r g b"
+    parts = command.split()
+    if len(parts) == 3 and all(part.isdigit() for part in parts):
+        return 'COLOR'
+    return None
+
+class CommandQueue:
+    """Hàng đợi lệnh UDP được xả bởi một thread nền"""
+    
+    def __init__(self, comm_handler, min_interval: float = 0.02):
+        self.comm_handler = comm_handler
+        self.min_interval = min_interval  # Khoảng cách tối thiểu giữa 2 lệnh tới cùng thiết bị
+        
+        self._pending: "OrderedDict[Tuple, Tuple[str, Tuple[str, int]]]" = OrderedDict()
+        self._next_send: Dict[Tuple[str, int], float] = {}
+        self._cond = threading.Condition()
+        self._unique_id = 0
+        
+        self.is_running = False
+        self.sender_thread = None
+        
+        # Callback khi có lệnh mới, dùng khi hàng đợi được xả bởi vòng lặp bên ngoài
+        self.on_enqueue: Optional[Callable] = None
+        
+        # Thống kê
+        self.total_enqueued = 0
+        self.total_coalesced = 0
+        self.total_sent = 0
+    
+    def start(self):
+        """Bắt đầu thread gửi lệnh"""
+        if self.is_running:
+            return
+        
+        self.is_running = True
+        self.sender_thread = threading.Thread(target=self._sender_loop, daemon=True)
+        self.sender_thread.start()
+    
+    def start_external(self, waker: Callable):
+        """Để vòng lặp bên ngoài (AsyncNetworkCore) xả hàng đợi thay cho thread"""
+        self.on_enqueue = waker
+        self.is_running = True
+    
+    def stop(self):
+        """Dừng thread gửi lệnh"""
+        with self._cond:
+            self.is_running = False
+            self.on_enqueue = None
+            self._cond.notify_all()
+        
+        if self.sender_thread:
+            self.sender_thread.join(timeout=1.0)
+            self.sender_thread = None
+    
+    def put(self, command: str, address: Optional[Tuple[str, int]] = None) -> bool:
+        """Đưa lệnh vào hàng đợi, lệnh cũ cùng khóa bị thay thế"""
+        if address is None:
+            address = (self.comm_handler.config.esp_ip, self.comm_handler.config.esp_port)
+        
+        if not self.is_running:
+            # Chưa có thread gửi: gửi trực tiếp
+            return self.comm_handler.send_udp_command(command, address)
+        
+        key = coalesce_key(command)
+        with self._cond:
+            if key is None:
+                self._unique_id += 1
+                queue_key = (address, None, self._unique_id)
+            else:
+                queue_key = (address, key)
+                if self._pending.pop(queue_key, None) is not None:
+                    self.total_coalesced += 1
+            
+            # Lệnh mới luôn nằm cuối hàng đợi để giữ thứ tự so với các lệnh khác
+            self._pending[queue_key] = (command, address)
+            self.total_enqueued += 1
+            self._cond.notify()
+            waker = self.on_enqueue
+        
+        if waker:
+            waker()
+        return True
+    
+    def _take_ready(self, now: float):
+        """Lấy lệnh đầu tiên có thể gửi, trả về (lệnh, thời gian chờ)"""
+        wait = None
+        blocked = set()
+        for queue_key, (command, address) in self._pending.items():
+            if address in blocked:
+                continue
+            ready_at = self._next_send.get(address, 0.0)
+            if ready_at <= now:
+                del self._pending[queue_key]
+                self._next_send[address] = now + self.min_interval
+                return (command, address), None
+            
+            # Giữ thứ tự lệnh của cùng thiết bị
+            blocked.add(address)
+            delay = ready_at - now
+            if wait is None or delay < wait:
+                wait = delay
+        return None, wait
+    
+    def take_ready(self):
+        """Lấy lệnh kế tiếp có thể gửi: (lệnh hoặc None, thời gian chờ hoặc None)"""
+        with self._cond:
+            return self._take_ready(time.monotonic())
+    
+    def dispatch(self, item):
+        """Gửi một lệnh đã lấy ra khỏi hàng đợi"""
+        command, address = item
+        if self.comm_handler.send_udp_command(command, address):
+            self.total_sent += 1
+    
+    def _sender_loop(self):
+        """Thread xả hàng đợi"""
+        while True:
+            with self._cond:
+                item = None
+                while self.is_running:
+                    item, wait = self._take_ready(time.monotonic())
+                    if item is not None:
+                        break
+                    self._cond.wait(wait)
+                
+                if not self.is_running:
+                    return
+            
+            self.dispatch(item)
+    
+    def pending_count(self) -> int:
+        """Số lệnh đang chờ gửi"""
+        with self._cond:
+            return len(self._pending)
+    
+    def get_statistics(self) -> dict:
+        """Lấy thống kê hàng đợi"""
+        return {
+            'commands_enqueued': self.total_enqueued,
+            'commands_coalesced': self.total_coalesced,
+            'commands_sent': self.total_sent,
+            'commands_pending': self.pending_count()
+        }
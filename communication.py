@@ -6,18 +6,83 @@ Xử lý tất cả giao tiếp UDP, OSC và logging
 
 import socket
 import datetime
-from typing import Optional, Callable
+import threading
+from typing import Dict, Optional, Callable, Tuple
+from command_queue import CommandQueue
+from logstore import LogStore
+from archive import Archiver
+from tsstore import TimeSeriesStore
+from shmbridge import MonitorBridge
+from telemetry import AdcFrame, TouchFrame, parse_frame
+
+class UDPSender:
+    """Giữ socket UDP lâu dài cho từng đích (esp_ip, esp_port)"""
+    
+    def __init__(self):
+        self._sockets: Dict[Tuple[str, int], socket.socket] = {}
+        self._lock = threading.Lock()
+    
+    def _get_socket(self, address: Tuple[str, int]) -> socket.socket:
+        """Lấy socket cho đích, tạo mới nếu chưa có"""
+        sock = self._sockets.get(address)
+        if sock is None:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._sockets[address] = sock
+        return sock
+    
+    def send(self, message: bytes, address: Tuple[str, int]):
+        """Gửi datagram, socket lỗi sẽ bị bỏ để lần sau tạo lại"""
+        with self._lock:
+            sock = self._get_socket(address)
+            try:
+                sock.sendto(message, address)
+            except OSError:
+                self._discard(address)
+                raise
+    
+    def release(self, ip: str, port: int):
+        """Đóng socket của một đích (khi đổi thiết bị)"""
+        with self._lock:
+            self._discard((ip, port))
+    
+    def _discard(self, address: Tuple[str, int]):
+        sock = self._sockets.pop(address, None)
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+    
+    def close(self):
+        """Đóng tất cả socket"""
+        with self._lock:
+            for address in list(self._sockets):
+                self._discard(address)
+    
+    def __len__(self):
+        return len(self._sockets)
 
 class CommunicationHandler:
     """Xử lý giao tiếp và logging"""
     
     def __init__(self, config):
         self.config = config
-        self.log_messages = []
+        self.logs = LogStore(config.max_log_entries)
+        self.archiver = Archiver(config) if config.archive_enabled else None
+        self.history = TimeSeriesStore(config) if config.tsdb_enabled else None
+        self.monitor_bridge = MonitorBridge(config) if config.monitor_bridge_enabled else None
+        self.ingest_server = None  # TelemetryIngestServer tự gắn vào khi được tạo
         self.total_packets_sent = 0
         self.total_packets_received = 0
+        self.parse_errors = 0
         self.connection_status = "Disconnected"
         
+        # Socket gửi lệnh dùng lại giữa các lần gửi
+        self.udp_sender = UDPSender()
+        
+        # Hàng đợi lệnh không chặn cho các controller
+        self.command_queue = CommandQueue(self, config.command_min_interval)
+        
         # Callback functions
         self.on_data_update: Optional[Callable] = None
         
@@ -35,18 +100,22 @@ class CommunicationHandler:
         """Thêm log message"""
         timestamp = datetime.datetime.now().strftime("%H:%M:%S")
         log_entry = f"[{timestamp}] {message}"
-        self.log_messages.append(log_entry)
+        self.logs.append(log_entry)
         
-        if len(self.log_messages) > self.config.max_log_entries:
-            self.log_messages.pop(0)
+        if self.archiver:
+            self.archiver.log(log_entry)
     
     def get_logs(self) -> list:
         """Lấy danh sách logs"""
-        return self.log_messages.copy()
+        return self.logs.get_all()
+    
+    def get_logs_since(self, seq: int) -> Tuple[int, list]:
+        """Lấy logs mới từ số thứ tự seq, trả về (seq kế tiếp, logs)"""
+        return self.logs.get_since(seq)
     
     def clear_logs(self):
         """Xóa logs"""
-        self.log_messages = []
+        self.logs.clear()
         self.add_log("Logs cleared")
     
     def export_logs(self, filename: str = None) -> str:
@@ -56,21 +125,26 @@ class CommunicationHandler:
             filename = f"cube_touch_logs_{timestamp}.txt"
         
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                f.write('\n'.join(self.log_messages))
+            if self.archiver and self.archiver.is_running:
+                # Nối các segment đã ghi: có toàn bộ lịch sử, không gom chuỗi trong bộ nhớ
+                self.archiver.export(filename, 'logs')
+            else:
+                with open(filename, 'w', encoding='utf-8') as f:
+                    f.write('\n'.join(self.logs.get_all()))
             self.add_log(f"Logs exported to {filename}")
             return filename
         except Exception as e:
             self.add_log(f"Failed to export logs: {str(e)}")
             raise
     
-    def send_udp_command(self, command: str) -> bool:
+    def send_udp_command(self, command: str, address: Optional[Tuple[str, int]] = None) -> bool:
         """Gửi lệnh UDP đến ESP32"""
+        if address is None:
+            address = (self.config.esp_ip, self.config.esp_port)
+        
         try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
             message = command.encode()
-            sock.sendto(message, (self.config.esp_ip, self.config.esp_port))
-            sock.close()
+            self.udp_sender.send(message, address)
             
             self.total_packets_sent += 1
             self.add_log(f"Sent command: {command}")
@@ -80,84 +154,88 @@ class CommunicationHandler:
             self.add_log(f"Error sending command '{command}': {str(e)}")
             return False
     
+    def queue_command(self, command: str) -> bool:
+        """Đưa lệnh vào hàng đợi gửi nền (không chặn GUI)"""
+        return self.command_queue.put(command)
+    
+    def set_target(self, esp_ip: str, esp_port: int):
+        """Đổi thiết bị đích, đóng socket của đích cũ"""
+        if (esp_ip, esp_port) != (self.config.esp_ip, self.config.esp_port):
+            self.udp_sender.release(self.config.esp_ip, self.config.esp_port)
+        self.config.esp_ip = esp_ip
+        self.config.esp_port = esp_port
+    
+    def close(self):
+        """Giải phóng tài nguyên mạng"""
+        self.command_queue.stop()
+        self.udp_sender.close()
+        if self.archiver:
+            self.archiver.stop()
+        if self.history:
+            self.history.close()
+        if self.monitor_bridge:
+            self.monitor_bridge.stop()
+    
     def handle_osc_data(self, address, *args):
         """Xử lý dữ liệu OSC từ ESP32"""
         if not args:
             return
         
-        self.total_packets_received += 1
-        self.connection_status = "Connected"
-        data_line = args[0]
-        
-        # Kiểm tra nếu là IR_ADC frame
-        if data_line.startswith("IR_ADC:"):
-            self._parse_ir_adc_frame(data_line)
-        else:
-            # Parse dữ liệu format: "Val:22046 Thr:21649 Stt:0"
-            self._parse_data_line(data_line)
+        self.handle_datagram(str(args[0]).encode())
     
     def handle_raw_udp_data(self, data_line):
-        """Xử lý dữ liệu UDP thô từ ESP32"""
+        """Xử lý dữ liệu UDP thô từ ESP32 (dạng chuỗi)"""
+        self.handle_datagram(data_line.encode())
+    
+    def handle_datagram(self, data):
+        """Xử lý datagram nhận từ ESP32 (bytes/memoryview, không decode)"""
+        self.handle_frame(parse_frame(data))
+    
+    def handle_frame(self, frame):
+        """Cập nhật trạng thái từ frame đã giải mã (None nếu datagram sai format)"""
         self.total_packets_received += 1
         self.connection_status = "Connected"
         
-        # Kiểm tra nếu là IR_ADC frame
-        if data_line.startswith("IR_ADC:"):
-            self._parse_ir_adc_frame(data_line)
-        else:
-            # Parse dữ liệu format: "Val:22046 Thr:21649 Stt:0"
-            self._parse_data_line(data_line)
-    
-    def _parse_data_line(self, data_line):
-        """Parse dữ liệu chung cho OSC và UDP"""
-        try:
-            # Xử lý format: "Val: 21677 Thr: 21649 Stt: 0"
-            if "Val:" in data_line:
-                val_part = data_line.split("Val:")[1].split()[0]
-                self.current_state['value'] = val_part
-            
-            if "Thr:" in data_line:
-                thr_part = data_line.split("Thr:")[1].split()[0]
-                self.current_state['threshold'] = thr_part
-            
-            if "Stt:" in data_line:
-                stt_part = data_line.split("Stt:")[1].strip()
-                self.current_state['raw_touch'] = stt_part
+        if frame is None:
+            self.parse_errors += 1
+        
+        elif isinstance(frame, TouchFrame):
+            # Trường thiếu trong datagram giữ giá trị cũ
+            if frame.value is not None:
+                self.current_state['value'] = frame.value
+            if frame.threshold is not None:
+                self.current_state['threshold'] = frame.threshold
+            if frame.stt is not None:
+                self.current_state['raw_touch'] = frame.stt
             
             # Callback để cập nhật GUI
             if self.on_data_update:
                 self.on_data_update(self.current_state)
-                
-        except Exception as e:
-            self.add_log(f"Error parsing: {str(e)}")
-    
-    def _parse_ir_adc_frame(self, data_line):
-        """Xử lý frame IR_ADC riêng"""
-        try:
-            # Parse format: "IR_ADC:2342"
-            if "IR_ADC:" in data_line:
-                adc_value_str = data_line.split("IR_ADC:")[1].strip()
-                self.ir_adc_value = int(adc_value_str)
-                
-                self.add_log(f"IR ADC: {self.ir_adc_value}")
-                
-                # Callback với raw string để GUI xử lý
-                if self.on_data_update:
-                    self.on_data_update(data_line)
-                    
-        except Exception as e:
-            self.add_log(f"Error parsing IR_ADC frame: {str(e)}")
+        
+        elif isinstance(frame, AdcFrame):
+            self.ir_adc_value = frame.value
+            self.add_log(f"IR ADC: {self.ir_adc_value}")
+            
+            # Callback với frame đã giải mã để GUI xử lý
+            if self.on_data_update:
+                self.on_data_update(frame)
     
     def get_statistics(self) -> dict:
         """Lấy thống kê"""
         return {
+            **self.command_queue.get_statistics(),
             'packets_sent': self.total_packets_sent,
             'packets_received': self.total_packets_received,
             'connection_status': self.connection_status,
+            'parse_errors': self.parse_errors,
             'raw_touch': self.current_state['raw_touch'],
             'value': self.current_state['value'],
             'threshold': self.current_state['threshold'],
-            'ir_adc': self.ir_adc_value
+            'ir_adc': self.ir_adc_value,
+            **(self.archiver.get_statistics() if self.archiver else {}),
+            **(self.history.get_statistics() if self.history else {}),
+            **(self.monitor_bridge.get_statistics() if self.monitor_bridge else {}),
+            **(self.ingest_server.get_statistics() if self.ingest_server else {})
         }
     
     def reset_statistics(self):
@@ -12,11 +12,53 @@ class AppConfig:
         self.esp_ip = '192.168.0.43'
         self.esp_port = 8001
         self.osc_port = 7043  # Port ESP32 đang gửi đến
+        self.command_min_interval = 0.02  # Tối đa 50 lệnh/giây cho mỗi thiết bị
+        self.udp_rcvbuf = 4 * 1024 * 1024  # Buffer nhận của kernel cho telemetry
+        self.ingest_ring_slots = 64  # Số datagram tối đa đọc mỗi lần wakeup
+        self.ingest_slot_size = 2048
+        self.use_asyncio_core = False  # True: telemetry/heartbeat/lệnh chạy trên một asyncio loop
+        self.headless_status_interval = 60  # Giây giữa các dòng log trạng thái khi chạy --headless
+        
+        # Web API (HTTP/WebSocket) cho dashboard từ xa
+        self.api_enabled = False  # Bật bằng --api hoặc đặt True; tắt mặc định để không mở port lệnh ngoài ý muốn
+        self.api_host = "127.0.0.1"  # "0.0.0.0" để máy khác trong mạng truy cập được
+        self.api_port = 8080
+        self.api_token = None  # Đặt chuỗi để bắt buộc "Authorization: Bearer <token>" khi gửi lệnh
+        self.api_allowed_origins = ()  # Origin của trang dashboard được gọi API từ trình duyệt, vd "http://kiosk.local:3000"
+        self.api_devices_interval = 1.0  # Giây giữa các lần gửi /ws/devices
+        self.api_stats_interval = 1.0  # Giây giữa các lần gửi /ws/stats
+        self.api_telemetry_rate = 20  # Số lần gửi /ws/telemetry tối đa mỗi giây
+        self.api_max_clients = 64  # Số kết nối WebSocket tối đa
+        self.api_client_buffer = 256 * 1024  # Byte chờ gửi tối đa của một client trước khi bỏ frame
+        
+        # Shared memory cho cửa sổ monitor.py
+        self.monitor_bridge_enabled = True
+        self.monitor_shm_name = "cube_touch_monitor"
+        self.monitor_ring_records = 65536  # 32 byte mỗi record (2 MB), ~13 giây ở 5000 datagram/s
+        self.monitor_clients = 4  # Số cửa sổ monitor mở cùng lúc (mỗi cửa sổ một slot lệnh)
+        self.monitor_command_poll = 0.05  # Giây giữa các lần app đọc lệnh từ monitor
+        self.monitor_refresh_ms = 50  # Chu kỳ monitor đọc ring và cập nhật giao diện
         
         # GUI settings
         self.window_title = "Cube Touch Monitor"
         self.window_size = "1000x700"
         self.min_size = (800, 600)
+        self.gui_frame_rate = 30  # Tần số cập nhật giao diện (Hz)
+        self.gui_adc_backlog = 4096  # Số mẫu ADC tối đa chờ vẽ
+        self.adc_plot_window = 2000  # Số mẫu hiển thị trên đồ thị IR_ADC
+        self.gui_view_switch_budget_ms = 50  # Chuyển tab (view đã dựng) chậm hơn mức này thì ghi cảnh báo
+        
+        # Chu kỳ gửi heartbeat của ESP32 (để tính tỉ lệ mất heartbeat)
+        self.heartbeat_interval = 1.0
+        
+        # Đo ping tới các ESP32 online
+        self.ping_interval = 10  # Giây giữa các vòng ping
+        self.ping_timeout = 2.0  # Giây chờ reply trong mỗi vòng (mọi device song song)
+        
+        # Logging
+        self.log_level = "INFO"  # DEBUG / INFO / WARNING / ERROR
+        self.log_hot_path = False  # Log mỗi packet/mẫu (đổi được trong admin window)
+        self.log_sample_every = 100  # Khi bật, chỉ in 1/N log hot path
         
         # Colors
         self.colors = {
@@ -36,4 +78,28 @@ class AppConfig:
         self.default_brightness = 128
         
         # Logging
-        self.max_log_entries = 100
\ No newline at end of file
+        self.max_log_entries = 100000  # Số dòng log giữ trong ring buffer
+        self.admin_log_lines = 5000  # Số dòng tối đa hiển thị trong admin window
+        
+        # Archive log/telemetry ra đĩa
+        self.archive_enabled = True
+        self.archive_dir = "archive"
+        self.archive_segment_bytes = 16 * 1024 * 1024  # Xoay segment khi đạt kích thước
+        self.archive_segment_seconds = 3600  # hoặc khi segment đủ tuổi
+        self.archive_compress = None  # None / "gzip" / "zstd" cho segment đã đóng
+        self.archive_keep_segments = 500  # Mỗi stream, 0 = giữ tất cả
+        self.archive_flush_interval = 1.0  # Giây giữa các lần flush xuống đĩa
+        
+        # Lịch sử telemetry theo thiết bị (time-series store)
+        self.tsdb_enabled = True
+        self.tsdb_dir = "tsdb"
+        self.tsdb_chunk_size = 65536  # Số mẫu mỗi file segment mmap
+        self.tsdb_flush_size = 256  # Số mẫu gom trong bộ nhớ trước khi ghi vào segment
+        self.tsdb_keep_chunks = 2000  # Mỗi series, 0 = giữ tất cả
+    
+    def port_for_ip(self, ip: str) -> int:
+        """Port telemetry của ESP32: octet cuối + "00" (192.168.0.43 -> 4300)"""
+        ip_parts = ip.split('.')
+        if len(ip_parts) != 4:
+            raise ValueError("Invalid IP format")
+        return int(str(int(ip_parts[3])) + "00")
\ No newline at end of file
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Device table module for Cube Touch Monitor
+Bảng ESP32 devices dựa trên ttk.Treeview: chỉ vẽ các dòng đang hiển thị, sắp xếp và lọc theo trạng thái/ping/tên
+"""
+
+import bisect
+import math
+import tkinter as tk
+from tkinter import ttk
+from typing import Callable, Dict, Optional
+
+# (tên cột, tiêu đề, độ rộng)
+COLUMNS = (
+    ('status', "Status", 100),
+    ('name', "Name", 120),
+    ('ip', "IP", 120),
+    ('last', "Last", 80),
+    ('count', "Count", 70),
+    ('uptime', "Uptime", 80),
+    ('ping', "Ping", 150),
+    ('loss', "Loss", 70),
+)
+
+STATUS_FILTERS = ("All", "Online", "Offline")
+
+def ping_text(device: dict) -> str:
+    if device['ping_ms'] > 0:
+        return f"{device['ping_icon']} {device['ping_ms']:.0f}ms ({device['ping_status']})"
+    return f"{device['ping_icon']} {device['ping_status']}"
+
+def _ip_key(ip: str):
+    try:
+        return tuple(int(part) for part in ip.split('.'))
+    except ValueError:
+        return (math.inf,)
+
+# Khóa sắp xếp của từng cột (từ dict get_status_info)
+SORT_KEYS: Dict[str, Callable] = {
+    'status': lambda d: (not d['is_online'], d['name'].lower()),
+    'name': lambda d: d['name'].lower(),
+    'ip': lambda d: _ip_key(d['ip']),
+    'last': lambda d: d['last_heartbeat'],
+    'count': lambda d: d['heartbeat_count'],
+    'uptime': lambda d: d['uptime'],
+    # Chưa có ping / timeout xếp cuối
+    'ping': lambda d: d['ping_ms'] if d['ping_ms'] > 0 else math.inf,
+    'loss': lambda d: d.get('heartbeat_loss_pct', 0.0),
+}
+
+class DeviceTable:
+    """Bảng devices, mỗi device một item Treeview (iid = tên device)
+
+    Cập nhật một device là một lệnh item() (và move() nếu vị trí sắp xếp đổi),
+    không phụ thuộc số device. Treeview chỉ vẽ các dòng nằm trong vùng nhìn thấy.
+    """
+
+    def __init__(self, parent, on_activate: Optional[Callable] = None, height: int = 12):
+        self.on_activate = on_activate  # on_activate(ip) khi double-click / Enter / nút Access
+        self._devices: Dict[str, dict] = {}  # Tất cả devices (kể cả đang bị lọc)
+        self._values: Dict[str, tuple] = {}  # Giá trị đang hiển thị của từng dòng
+        self._order = []  # (khóa sắp xếp, tên) của các dòng hiển thị, đã sắp xếp
+        self._keys: Dict[str, tuple] = {}  # Tên -> khóa trong _order
+        self.sort_column = 'status'
+        self.sort_reverse = False
+
+        self.frame = tk.Frame(parent, bg="white")
+        self.frame.grid_columnconfigure(0, weight=1)
+        self.frame.grid_rowconfigure(1, weight=1)
+
+        # Thanh lọc
+        toolbar = tk.Frame(self.frame, bg="white")
+        toolbar.grid(row=0, column=0, columnspan=2, sticky="ew", pady=(0, 4))
+        tk.Label(toolbar, text="Status:", font=("Segoe UI", 9), bg="white").pack(side=tk.LEFT)
+        self.status_var = tk.StringVar(value=STATUS_FILTERS[0])
+        tk.OptionMenu(toolbar, self.status_var, *STATUS_FILTERS,
+                      command=lambda _: self.refilter()).pack(side=tk.LEFT, padx=(2, 10))
+        tk.Label(toolbar, text="Search:", font=("Segoe UI", 9), bg="white").pack(side=tk.LEFT)
+        self.search_var = tk.StringVar()
+        self.search_var.trace_add('write', lambda *_: self.refilter())
+        tk.Entry(toolbar, textvariable=self.search_var, font=("Segoe UI", 9),
+                 width=18).pack(side=tk.LEFT, padx=2)
+        tk.Button(toolbar, text="🔗 Access", command=self._activate_selection,
+                  font=("Segoe UI", 8, "bold"), bg="#3498db", fg="white",
+                  relief=tk.FLAT, cursor="hand2", padx=8, pady=2).pack(side=tk.RIGHT)
+
+        # Bảng
+        self.tree = ttk.Treeview(self.frame, columns=[c[0] for c in COLUMNS], show="headings",
+                                 height=height, selectmode="browse")
+        for column, title, width in COLUMNS:
+            self.tree.heading(column, text=title, command=lambda c=column: self.sort_by(c))
+            self.tree.column(column, width=width, minwidth=40, anchor="w", stretch=column == 'ping')
+        self.tree.tag_configure('online', background="#e8f5e8")
+        self.tree.tag_configure('offline', background="#ffe6e6")
+        self.tree.grid(row=1, column=0, sticky="nsew")
+        scrollbar = ttk.Scrollbar(self.frame, orient="vertical", command=self.tree.yview)
+        scrollbar.grid(row=1, column=1, sticky="ns")
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.bind("<Double-1>", lambda e: self._activate_selection())
+        self.tree.bind("<Return>", lambda e: self._activate_selection())
+
+        self.empty_label = tk.Label(self.tree,
+                                    text="⏳ Waiting for ESP32 devices...\nDevices will appear here when they send heartbeat signals.",
+                                    font=("Segoe UI", 11), bg="white", fg="#7f8c8d", justify="center")
+        self._update_empty_state()
+        self._update_headings()
+
+    def grid(self, **kwargs):
+        self.frame.grid(**kwargs)
+
+    def __len__(self):
+        return len(self._devices)
+
+    def set_devices(self, devices: list):
+        """Thay toàn bộ nội dung bằng snapshot"""
+        self._devices = {device['name']: device for device in devices}
+        self.refilter()
+
+    def upsert(self, device: dict):
+        """Thêm hoặc cập nhật một device (dict từ get_status_info)"""
+        name = device['name']
+        self._devices[name] = device
+        if not self._matches(device):
+            self._detach(name)
+        else:
+            self._place(name, device)
+        self._update_empty_state()
+
+    def remove(self, name: str):
+        """Xóa một device khỏi bảng"""
+        if self._devices.pop(name, None) is None:
+            return
+        self._detach(name)
+        if self._values.pop(name, None) is not None:
+            self.tree.delete(name)
+        self._update_empty_state()
+
+    def sort_by(self, column: str):
+        """Sắp xếp theo cột (bấm lại cùng cột để đảo chiều)"""
+        if column == self.sort_column:
+            self.sort_reverse = not self.sort_reverse
+        else:
+            self.sort_column = column
+            self.sort_reverse = False
+        self._update_headings()
+        self.refilter()
+
+    def refilter(self):
+        """Dựng lại thứ tự các dòng hiển thị theo bộ lọc và cột sắp xếp hiện tại"""
+        key = SORT_KEYS[self.sort_column]
+        visible = [device for device in self._devices.values() if self._matches(device)]
+        self._order = sorted((key(device), device['name']) for device in visible)
+        if self.sort_reverse:
+            self._order.reverse()
+        self._keys = {name: sort_key for sort_key, name in self._order}
+
+        # Item bị lọc chỉ detach (không xóa), item không còn device thì xóa
+        shown = set(self._keys)
+        for name in self.tree.get_children():
+            if name not in shown:
+                self.tree.detach(name)
+        for name in list(self._values):
+            if name not in self._devices and self.tree.exists(name):
+                self.tree.delete(name)
+                del self._values[name]
+        for index, (_, name) in enumerate(self._order):
+            self._set_values(name, self._devices[name])
+            self.tree.move(name, '', index)
+        self._update_empty_state()
+
+    def _matches(self, device: dict) -> bool:
+        status = self.status_var.get()
+        if status == "Online" and not device['is_online']:
+            return False
+        if status == "Offline" and device['is_online']:
+            return False
+        text = self.search_var.get().strip().lower()
+        return not text or text in device['name'].lower() or text in device['ip']
+
+    def _place(self, name: str, device: dict):
+        """Cập nhật giá trị và chuyển dòng đến vị trí đúng nếu khóa sắp xếp đổi"""
+        self._set_values(name, device)
+        sort_key = SORT_KEYS[self.sort_column](device)
+        old_key = self._keys.get(name)
+        if old_key == sort_key:
+            return
+        if old_key is not None:
+            self._order.pop(self._index(old_key, name))
+        index = self._index(sort_key, name)
+        self._order.insert(index, (sort_key, name))
+        self._keys[name] = sort_key
+        self.tree.move(name, '', index)
+
+    def _index(self, sort_key, name: str) -> int:
+        """Vị trí của (sort_key, name) trong _order (tìm nhị phân, _order có thể sắp giảm dần)"""
+        if self.sort_reverse:
+            return bisect.bisect_left(self._order, _Reversed((sort_key, name)), key=_Reversed)
+        return bisect.bisect_left(self._order, (sort_key, name))
+
+    def _detach(self, name: str):
+        old_key = self._keys.pop(name, None)
+        if old_key is not None:
+            self._order.pop(self._index(old_key, name))
+            self.tree.detach(name)
+
+    def _set_values(self, name: str, device: dict):
+        values = (
+            device['status_text'],
+            device['name'],
+            device['ip'],
+            device['last_heartbeat'],
+            device['heartbeat_count'],
+            device['uptime'],
+            ping_text(device),
+            f"{device.get('heartbeat_loss_pct', 0.0):.1f}%",
+        )
+        tag = 'online' if device['is_online'] else 'offline'
+        if name not in self._values:
+            self.tree.insert('', 'end', iid=name, values=values, tags=(tag,))
+        elif self._values[name] != values:
+            self.tree.item(name, values=values, tags=(tag,))
+        self._values[name] = values
+
+    def _update_headings(self):
+        for column, title, _ in COLUMNS:
+            if column == self.sort_column:
+                title += " ▼" if self.sort_reverse else " ▲"
+            self.tree.heading(column, text=title)
+
+    def _update_empty_state(self):
+        if self._devices:
+            self.empty_label.place_forget()
+        else:
+            self.empty_label.place(relx=0.5, rely=0.5, anchor="center")
+
+    def _activate_selection(self):
+        selection = self.tree.selection()
+        if selection and self.on_activate:
+            device = self._devices.get(selection[0])
+            if device:
+                self.on_activate(device['ip'])
+
+class _Reversed:
+    """Đảo thứ tự so sánh, để bisect trên list sắp giảm dần"""
+
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value < self.value
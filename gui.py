@@ -4,28 +4,50 @@ GUI module for Cube Touch Monitor
 Giao diện người dùng được tối ưu hóa
 """
 
+import logging
 import tkinter as tk
 from tkinter import colorchooser, ttk, messagebox, scrolledtext
 import customtkinter as ctk
-from PIL import Image, ImageTk
 from led import LEDController
 from touch import TouchController
 from xilanh import XilanhController
 from IR import IRController
 from heartbeat import HeartbeatManager
+from telemetry import AdcFrame
 import threading
+import time
 import customtkinter as ctk
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from matplotlib.figure import Figure
-import numpy as np
+from plotting import RealtimePlot, SampleRing
+from device_table import DeviceTable
 from collections import deque
-import re
+import applog
+
+log = applog.get_logger('gui')
+hot_log = applog.get_logger('gui', hot=True)
+
+# Hàm dựng nội dung của từng view (gọi một lần, lần đầu mở view)
+VIEW_BUILDERS = {
+    "home": "create_home_content",
+    "config": "create_config_content",
+    "monitor": "create_monitor_content",
+    "resolume": "create_resolume_content",
+    "motion": "create_motion_content",
+    "map": "create_map_content"
+}
+
+# Khoảng thời gian hiển thị của đồ thị ADC (None = realtime từ ring buffer)
+ADC_HISTORY_WINDOWS = {
+    "Live": None,
+    "1 min": 60,
+    "10 min": 600,
+    "1 h": 3600,
+    "6 h": 6 * 3600
+}
 
 class CubeTouchGUI:
     """Giao diện chính của ứng dụng"""
     
-    def __init__(self, root, comm_handler, config, app=None):
+    def __init__(self, root, comm_handler, config, app=None, heartbeat_manager=None):
         # Setup CustomTkinter theme
         ctk.set_appearance_mode("light")  # "light" or "dark"
         ctk.set_default_color_theme("blue")  # "blue", "green", "dark-blue"
@@ -33,35 +55,62 @@ class CubeTouchGUI:
         self.root = root
         self.comm_handler = comm_handler
         self.config = config
-        self.app = app  # Tham chiếu đến app để có thể restart UDP server
-        
-        # Controllers
-        self.led_controller = LEDController(comm_handler)
-        self.touch_controller = TouchController(comm_handler)
-        self.xilanh_controller = XilanhController(comm_handler)
-        self.ir_controller = IRController(comm_handler, config)
-        self.heartbeat_manager = HeartbeatManager(config)
+        self.app = app  # Tham chiếu đến app để có thể chuyển thiết bị
+        
+        # Controllers của app (dùng chung với headless/API), hoặc GUI tự tạo khi chạy độc lập
+        if app is not None:
+            self.led_controller = app.led_controller
+            self.touch_controller = app.touch_controller
+            self.xilanh_controller = app.xilanh_controller
+            self.ir_controller = app.ir_controller
+        else:
+            self.led_controller = LEDController(comm_handler)
+            self.touch_controller = TouchController(comm_handler)
+            self.xilanh_controller = XilanhController(comm_handler)
+            self.ir_controller = IRController(comm_handler, config)
+        # Heartbeat manager do app quản lý, hoặc GUI tự tạo khi chạy độc lập
+        self._owns_heartbeat_manager = heartbeat_manager is None
+        self.heartbeat_manager = heartbeat_manager or HeartbeatManager(config)
         
         # GUI components
         self.admin_window = None
-        self.esp_devices_status = []
-        self.esp_device_widgets = {}  # Cache widgets để tránh recreate
+        self.device_table = None  # Bảng devices của HOME view
+        self._monitor_processes = {}  # Slot lệnh của shared memory bridge -> process monitor.py
+        # Thay đổi device từ thread mạng, gom theo tên device đến tick kế tiếp
+        self._device_changes = {}
+        self._device_changes_lock = threading.Lock()
         self.last_device_count = 0
         
         # Setup callbacks
         self.comm_handler.on_data_update = self.update_realtime_data
-        self.heartbeat_manager.on_device_status_update = self.update_esp_devices_status
+        self.heartbeat_manager.on_device_changes = self.queue_device_changes
         
         # Start heartbeat manager
-        self.heartbeat_manager.start()
+        if self._owns_heartbeat_manager:
+            self.heartbeat_manager.start()
         
         # ADC data storage for plotting
-        self.adc_data = deque(maxlen=100)  # Store last 100 ADC values
-        self.adc_times = deque(maxlen=100)  # Store corresponding timestamps
+        self.adc_data = SampleRing(self.config.adc_plot_window)  # Ring buffer NumPy cấp phát sẵn
+        self.adc_plot = None
         self.adc_current_value = 0
         
+        # Display pump: thread mạng chỉ ghi snapshot, GUI vẽ theo frame rate cố định
+        self._adc_backlog = deque(maxlen=self.config.gui_adc_backlog)
+        self._latest_state = ("N/A", "N/A", "N/A")
+        self._state_dirty = False
+        self._pump_job = None
+        self.display_ticks = 0
+        self.display_dropped_frames = 0
+        self.display_queue_depth = 0
+        self.display_max_queue_depth = 0
+        
+        # View đã dựng: tên view -> các widget cấp cao nhất (ẩn/hiện bằng grid_remove/grid)
+        self._views = {}
+        self.view_switch_ms = 0.0
+        
         self.setup_window()
         self.create_widgets()
+        self._start_display_pump()
     
     def create_modern_button(self, parent, text, command, bg_color, hover_color=None, **kwargs):
         """Tạo button CustomTkinter với rounded corners"""
@@ -157,12 +206,22 @@ class CubeTouchGUI:
     
     def on_closing(self):
         """Xử lý khi đóng ứng dụng"""
+        if self._pump_job is not None:
+            self.root.after_cancel(self._pump_job)
+            self._pump_job = None
+        
         try:
             # Stop heartbeat manager
-            self.heartbeat_manager.stop()
-            print("Heartbeat manager stopped")
+            if self._owns_heartbeat_manager:
+                self.heartbeat_manager.stop()
+                log.info("Heartbeat manager stopped")
         except Exception as e:
-            print(f"Error stopping heartbeat manager: {e}")
+            log.error("Error stopping heartbeat manager: %s", e)
+        
+        # Cửa sổ monitor không còn dữ liệu khi app đóng shared memory
+        for process in self._monitor_processes.values():
+            if process.poll() is None:
+                process.terminate()
         
         # Close main window
         self.root.destroy()
@@ -174,18 +233,7 @@ class CubeTouchGUI:
         
         # Create sections based on current view
         self.create_header()
-        if self.current_view == "home":
-            self.create_home_content()
-        elif self.current_view == "config":
-            self.create_config_content()
-        elif self.current_view == "monitor":
-            self.create_monitor_content()
-        elif self.current_view == "resolume":
-            self.create_resolume_content()
-        elif self.current_view == "motion":
-            self.create_motion_content()
-        elif self.current_view == "map":
-            self.create_map_content()
+        self._show_view(self.current_view)
     
     def create_scrollable_frame(self):
         """Tạo frame chính không có scrollbar"""
@@ -232,6 +280,9 @@ class CubeTouchGUI:
         
         # Load and display logo
         try:
+            # PIL chỉ dùng cho logo, import tại đây để không làm chậm import gui
+            from PIL import Image, ImageTk
+            
             # Load logo image
             logo_image = Image.open("logo.png")
             # Resize logo to fit header (60px height, maintain aspect ratio)
@@ -246,7 +297,7 @@ class CubeTouchGUI:
             logo_label.grid(row=0, column=0, rowspan=2, sticky="w", padx=(0, 15))
             
         except Exception as e:
-            print(f"Could not load logo.png: {e}")
+            log.warning("Could not load logo.png: %s", e)
             # Fallback to text logo if image fails
             logo_label = tk.Label(left_frame, text="🎨", font=("Segoe UI", 24), 
                                  bg="#2c3e50", fg="#ecf0f1")
@@ -382,40 +433,51 @@ class CubeTouchGUI:
         
         return container    
     def switch_view(self, view):
-        """Chuyển đổi giữa các views khác nhau"""
-        self.current_view = view
+        """Chuyển đổi giữa các views khác nhau (ẩn view cũ, hiện view mới, không dựng lại)"""
+        if view == self.current_view:
+            return
         
-        # Clear current content (keep header)
-        for widget in self.scrollable_frame.winfo_children():
-            if widget.grid_info().get('row', 0) > 0:  # Keep row 0 (header)
-                widget.destroy()
+        start = time.perf_counter()
+        cached = view in self._views
         
-        # Clear widget cache when switching views
-        if hasattr(self, 'esp_device_widgets'):
-            self.esp_device_widgets.clear()
+        # Ẩn view hiện tại, grid_remove giữ nguyên vị trí để hiện lại
+        for widget in self._views.get(self.current_view, ()):
+            widget.grid_remove()
         
-        # Update tab appearance
+        self.current_view = view
         self.update_nav_buttons()
+        self._show_view(view)
         
-        # Show appropriate content
-        if view == "home":
-            self.create_home_content()
-            # Trigger heartbeat update to restore device list
-            if hasattr(self, 'heartbeat_manager') and self.heartbeat_manager.is_running:
-                devices_status = self.heartbeat_manager.get_all_devices_status()
-                if devices_status:
-                    self.update_esp_devices_status(devices_status)
-        elif view == "config":
-            self.create_config_content()
-        elif view == "monitor":
-            self.create_monitor_content()
-        elif view == "resolume":
-            self.create_resolume_content()
-        elif view == "motion":
-            self.create_motion_content()
-        elif view == "map":
-            self.create_map_content()
-            
+        self.root.update_idletasks()
+        self.view_switch_ms = (time.perf_counter() - start) * 1000
+        if not cached:
+            log.info("Built view %s in %.1f ms", view, self.view_switch_ms)
+        elif self.view_switch_ms > self.config.gui_view_switch_budget_ms:
+            log.warning("Switching to view %s took %.1f ms (budget %d ms)",
+                        view, self.view_switch_ms, self.config.gui_view_switch_budget_ms)
+        else:
+            log.debug("Switched to view %s in %.1f ms", view, self.view_switch_ms)
+    
+    def _show_view(self, view):
+        """Hiện view (dựng lần đầu) và cập nhật phần đã bỏ qua trong lúc ẩn"""
+        if view in self._views:
+            for widget in self._views[view]:
+                widget.grid()
+        else:
+            # Widget cấp cao nhất mới xuất hiện sau khi dựng là của view này (header ở row 0)
+            existing = set(self.scrollable_frame.winfo_children())
+            getattr(self, VIEW_BUILDERS[view])()
+            self._views[view] = [widget for widget in self.scrollable_frame.winfo_children()
+                                 if widget not in existing]
+            if view == "home" and self.heartbeat_manager.is_running:
+                self.update_esp_devices_status(self.heartbeat_manager.get_all_devices_status())
+        
+        if view == "monitor":
+            # Lúc ẩn không vẽ: áp dụng snapshot mới nhất và vẽ lại đồ thị
+            self._state_dirty = True
+            if self.adc_plot is not None:
+                self.adc_plot.redraw(force=True)
+    
     def update_nav_buttons(self):
         """Cập nhật trạng thái của navigation buttons"""
         tabs = {
@@ -660,24 +722,37 @@ class CubeTouchGUI:
                                    bg="white", fg="#27ae60", padx=6, pady=4)
         graph_frame.grid(row=0, column=1, sticky="nsew", padx=(10, 0))
         
-        # Setup matplotlib figure
-        self.fig = Figure(figsize=(6, 3), dpi=80, facecolor='white')
-        self.ax = self.fig.add_subplot(111)
-        self.ax.set_ylim(0, 4095)
-        self.ax.set_xlim(0, 100)
-        self.ax.set_xlabel('Time (samples)', fontsize=8)
-        self.ax.set_ylabel('IR ADC Value', fontsize=8)
-        self.ax.grid(True, alpha=0.3)
-        self.ax.tick_params(labelsize=7)
-        
-        # Create empty line plot
-        self.line, = self.ax.plot([], [], 'b-', linewidth=2)
-        self.fig.tight_layout()
-        
-        # Embed plot in tkinter
-        self.canvas = FigureCanvasTkAgg(self.fig, graph_frame)
-        self.canvas.draw()
-        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        # Chọn khoảng thời gian: Live hoặc lịch sử từ time-series store
+        if self.comm_handler.history:
+            range_frame = tk.Frame(graph_frame, bg="white")
+            range_frame.pack(side=tk.TOP, fill=tk.X)
+            tk.Label(range_frame, text="Range:", font=("Segoe UI", 9),
+                    bg="white", fg="#7f8c8d").pack(side=tk.LEFT)
+            self.adc_range_var = tk.StringVar(value="Live")
+            tk.OptionMenu(range_frame, self.adc_range_var, *ADC_HISTORY_WINDOWS,
+                         command=self.set_adc_range).pack(side=tk.LEFT, padx=(5, 0))
+        
+        # Đồ thị realtime dùng blitting, vẽ tối đa theo frame rate của display pump
+        self.adc_plot = RealtimePlot(graph_frame, self.adc_data, self.config.adc_plot_window,
+                                     ylim=(0, 4095), max_fps=self.config.gui_frame_rate)
+        self.adc_plot.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+    
+    def set_adc_range(self, label):
+        """Đổi khoảng thời gian của đồ thị ADC"""
+        window = ADC_HISTORY_WINDOWS[label]
+        if self.adc_plot is None:
+            return
+        if window is None:
+            self.adc_plot.set_live()
+        else:
+            self.adc_plot.set_history(self._adc_history, window)
+    
+    def _adc_history(self, t0, t1, columns):
+        """Envelope ADC của thiết bị đang chọn, số điểm bằng số cột pixel"""
+        series = self.comm_handler.history.series(self.config.esp_ip, 'adc')
+        if series is None:
+            return None
+        return series.envelope('value', t0, t1, columns)
 
     def create_monitor_command_section(self):
         """Tạo CUSTOM COMMAND section cho MONITOR view"""
@@ -723,10 +798,10 @@ class CubeTouchGUI:
         """Gửi custom command"""
         try:
             command = self.command_entry.get()
-            print(f"Sending command: {command}")
+            log.debug("Sending command: %s", command)
             self.command_status_label.config(text=f"Đã gửi: {command}")
         except Exception as e:
-            print(f"Error sending command: {e}")
+            log.error("Error sending command: %s", e)
             self.command_status_label.config(text="Lỗi gửi command")
 
     def create_home_content(self):
@@ -766,358 +841,86 @@ class CubeTouchGUI:
         esp_content_frame.grid(row=1, column=0, sticky="nsew")
         esp_content_frame.grid_columnconfigure(0, weight=1)
         
-        # Scrollable frame for devices
-        self.esp_devices_frame = tk.Frame(esp_content_frame, bg="white")
-        self.esp_devices_frame.grid(row=0, column=0, sticky="nsew")
-        self.esp_devices_frame.grid_columnconfigure(0, weight=1)
-        
-        # Initial empty state
-        self.empty_state_label = tk.Label(self.esp_devices_frame, 
-                                         text="⏳ Waiting for ESP32 devices...\nDevices will appear here when they send heartbeat signals.",
-                                         font=("Segoe UI", 11), bg="white", fg="#7f8c8d",
-                                         justify="center")
-        self.empty_state_label.grid(row=0, column=0, pady=30)
+        # Bảng devices: Treeview chỉ vẽ các dòng đang nhìn thấy, sắp xếp/lọc được
+        self.device_table = DeviceTable(esp_content_frame, on_activate=self.access_device)
+        self.device_table.grid(row=0, column=0, sticky="nsew")
+        esp_content_frame.grid_rowconfigure(0, weight=1)
     
-    def update_esp_devices_status(self, devices_status):
-        """Cập nhật trạng thái các ESP devices"""
-        def update():
-            try:
-                # Chỉ update khi đang ở tab HOME và có esp_devices_frame
-                if self.current_view != "home" or not hasattr(self, 'esp_devices_frame'):
-                    return
-                
-                # Kiểm tra esp_devices_frame có tồn tại không
-                try:
-                    self.esp_devices_frame.winfo_exists()
-                except tk.TclError:
-                    # Widget đã bị destroy, không cần update
-                    return
-                
-                # Kiểm tra xem có thay đổi thực sự không
-                if self._devices_status_unchanged(devices_status):
-                    return
-                
-                # Update devices list
-                self.esp_devices_status = devices_status
-                
-                # Update count in header
-                total_devices = len(devices_status)
-                online_devices = sum(1 for device in devices_status if device['is_online'])
-                
-                # Kiểm tra esp_count_label có tồn tại không
-                if hasattr(self, 'esp_count_label'):
-                    try:
-                        self.esp_count_label.configure(
-                            text=f"📡 ESP32 DEVICES STATUS ({online_devices} Online / {total_devices} Total)"
-                        )
-                    except tk.TclError:
-                        return
-                
-                if not devices_status:
-                    # Clear widgets cache
-                    self.esp_device_widgets.clear()
-                    
-                    # Clear current display
-                    for widget in self.esp_devices_frame.winfo_children():
-                        widget.destroy()
-                    
-                    # Show empty state
-                    self.empty_state_label = tk.Label(self.esp_devices_frame, 
-                                                     text="⏳ Waiting for ESP32 devices...\nDevices will appear here when they send heartbeat signals.",
-                                                     font=("Segoe UI", 11), bg="white", fg="#7f8c8d",
-                                                     justify="center")
-                    self.empty_state_label.grid(row=0, column=0, pady=30)
-                else:
-                    # Remove empty state if exists
-                    if hasattr(self, 'empty_state_label') and self.empty_state_label.winfo_exists():
-                        self.empty_state_label.destroy()
-                    
-                    # Update or create device widgets
-                    self._update_device_widgets(devices_status)
-                        
-            except Exception as e:
-                print(f"Error updating ESP devices status: {e}")
-        
-        self.root.after(0, update)
-    
-    def _devices_status_unchanged(self, new_devices_status):
-        """Kiểm tra xem devices status có thay đổi không"""
-        if len(new_devices_status) != len(self.esp_devices_status):
-            return False
-        
-        # Tạo dict để so sánh nhanh
-        old_status = {f"{d['name']}_{d['ip']}": d for d in self.esp_devices_status}
-        new_status = {f"{d['name']}_{d['ip']}": d for d in new_devices_status}
-        
-        # Kiểm tra devices khác nhau
-        if set(old_status.keys()) != set(new_status.keys()):
-            return False
+    def queue_device_changes(self, changes):
+        """Nhận thay đổi device từ thread mạng, gom theo device để display pump áp dụng mỗi tick"""
+        with self._device_changes_lock:
+            pending = self._device_changes
+            for change in changes:
+                previous = pending.get(change.name)
+                pending[change.name] = previous.merge(change) if previous else change
+    
+    def _apply_device_changes(self):
+        """Áp dụng các thay đổi đã gom, chỉ cập nhật dòng của device bị ảnh hưởng"""
+        # HOME đang ẩn: giữ thay đổi lại (tối đa một entry mỗi device) đến khi hiện
+        if self.current_view != "home" or self.device_table is None:
+            return
         
-        # Kiểm tra status thay đổi (chỉ cần kiểm tra trường quan trọng)
-        for key in old_status:
-            if (old_status[key]['is_online'] != new_status[key]['is_online'] or
-                old_status[key]['heartbeat_count'] != new_status[key]['heartbeat_count'] or
-                old_status[key]['last_heartbeat'] != new_status[key]['last_heartbeat'] or
-                old_status[key].get('ping_ms', 0) != new_status[key].get('ping_ms', 0) or
-                old_status[key].get('ping_status', 'Unknown') != new_status[key].get('ping_status', 'Unknown')):
-                return False
-        
-        return True
-    
-    def _update_device_widgets(self, devices_status):
-        """Cập nhật widgets của devices mà không recreate toàn bộ"""
-        current_device_keys = {f"{d['name']}_{d['ip']}" for d in devices_status}
-        existing_keys = set(self.esp_device_widgets.keys())
-        
-        # Xóa devices không còn tồn tại
-        for key in existing_keys - current_device_keys:
-            if key in self.esp_device_widgets:
-                self.esp_device_widgets[key]['frame'].destroy()
-                del self.esp_device_widgets[key]
-        
-        # Cập nhật hoặc tạo mới devices
-        for i, device in enumerate(devices_status):
-            device_key = f"{device['name']}_{device['ip']}"
+        with self._device_changes_lock:
+            if not self._device_changes:
+                return
+            changes, self._device_changes = self._device_changes, {}
+        
+        counts_changed = False
+        for name, change in changes.items():
+            if change.kind == 'removed':
+                self.device_table.remove(name)
+                counts_changed = True
+                continue
             
-            if device_key in self.esp_device_widgets:
-                # Cập nhật widget hiện có
-                self._update_existing_device_widget(device, i)
-            else:
-                # Tạo widget mới
-                self._create_new_device_widget(device, i)
+            device = self.heartbeat_manager.get_device_by_name(name)
+            if device is None:
+                continue  # Đã bị xóa sau khi gửi thay đổi
+            self.device_table.upsert(device.get_status_info())
+            counts_changed = counts_changed or change.kind == 'added' or 'is_online' in change.fields
+        
+        if counts_changed:
+            self._update_devices_header()
     
-    def _update_existing_device_widget(self, device, row_index):
-        """Cập nhật widget device hiện có"""
-        device_key = f"{device['name']}_{device['ip']}"
-        
-        # Kiểm tra widget có tồn tại trong cache không
-        if device_key not in self.esp_device_widgets:
+    def update_esp_devices_status(self, devices_status):
+        """Dựng lại toàn bộ bảng devices từ snapshot (lần đầu mở HOME)"""
+        if self.device_table is None:
             return
-            
-        widgets = self.esp_device_widgets[device_key]
         
         try:
-            # Kiểm tra widget có tồn tại không
-            widgets['frame'].winfo_exists()
-        except tk.TclError:
-            # Widget đã bị destroy, remove from cache
-            del self.esp_device_widgets[device_key]
-            return
-        
-        # Update background color
-        bg_color = "#e8f5e8" if device['is_online'] else "#ffe6e6"
-        widgets['frame'].config(bg=bg_color)
-        
-        # Update status badge
-        if device['is_online']:
-            status_bg = "#27ae60"
-            status_text = "ONLINE"
-            status_icon = "🟢"
-        else:
-            status_bg = "#e74c3c"
-            status_text = "OFFLINE"
-            status_icon = "🔴"
-        
-        widgets['status_badge'].config(bg=status_bg)
-        widgets['status_icon'].config(bg=status_bg, text=status_icon)
-        widgets['status_text'].config(bg=status_bg, text=status_text)
-        
-        # Update info labels
-        widgets['info_frame'].config(bg=bg_color)
-        widgets['name_label'].config(bg=bg_color)
-        widgets['ip_label'].config(bg=bg_color)
-        widgets['stats_frame'].config(bg=bg_color)
-        
-        # Update statistics
-        widgets['last_hb_label'].config(text=f"⏰ Last: {device['last_heartbeat']}", bg=bg_color)
-        widgets['count_label'].config(text=f"📊 Count: {device['heartbeat_count']}", bg=bg_color)
-        widgets['uptime_label'].config(text=f"🕐 Uptime: {device['uptime']}", bg=bg_color)
-        
-        # Update ping info
-        if device['ping_ms'] > 0:
-            ping_text = f"{device['ping_icon']} Ping: {device['ping_ms']:.0f}ms ({device['ping_status']})"
-        else:
-            ping_text = f"{device['ping_icon']} Ping: {device['ping_status']}"
-        widgets['ping_label'].config(text=ping_text, bg=bg_color, fg=device['ping_color'])
-        
-        # Update access button
-        if device['is_online']:
-            if widgets['access_button'] is None:
-                # Create access button
-                access_button = tk.Button(widgets['stats_frame'], text="🔗 Access", 
-                                         command=lambda ip=device['ip']: self.access_device(ip),
-                                         font=("Segoe UI", 8, "bold"), bg="#3498db", fg="white",
-                                         relief=tk.FLAT, cursor="hand2", padx=8, pady=2)
-                access_button.grid(row=4, column=0, sticky="e", pady=2)
-                widgets['access_button'] = access_button
-        else:
-            if widgets['access_button'] is not None:
-                widgets['access_button'].destroy()
-                widgets['access_button'] = None
-        
-        # Update grid position if changed
-        widgets['frame'].grid(row=row_index, column=0, sticky="ew", padx=2, pady=2)
+            self.device_table.set_devices(devices_status)
+            self._update_devices_header()
+        except Exception as e:
+            log.error("Error updating ESP devices status: %s", e)
+    
+    def _update_devices_header(self):
+        """Cập nhật số device trong header"""
+        counts = self.heartbeat_manager.get_device_count()
+        self.esp_count_label.configure(
+            text=f"📡 ESP32 DEVICES STATUS ({counts['online']} Online / {counts['total']} Total)"
+        )
     
     def access_device(self, ip):
         """Kết nối với device được chọn"""
         try:
-            print(f"[DEBUG] Access device called for IP: {ip}")
-            
-            # Parse IP để lấy octet cuối
-            ip_parts = ip.split('.')
-            if len(ip_parts) != 4:
-                raise ValueError("Invalid IP format")
+            # Port từ octet cuối + "00"
+            port = self.config.port_for_ip(ip)
             
-            last_octet = int(ip_parts[3])
-            # Tạo port từ octet cuối + "00"
-            port = int(str(last_octet) + "00")
-            
-            print(f"[DEBUG] Calculated port: {port}")
-            
-            # Cập nhật config
-            old_port = self.config.osc_port
-            self.config.esp_ip = ip
-            self.config.esp_port = port
-            self.config.osc_port = port
-            
-            print(f"[DEBUG] Config updated: ESP_IP={ip}, ESP_PORT={port}, OSC_PORT={port}")
-            print(f"[DEBUG] Old port: {old_port}, New port: {port}, App available: {self.app is not None}")
-
-            # Restart UDP server nếu port thay đổi và app có sẵn
-            if old_port != port and self.app:
-                print(f"[DEBUG] Starting UDP server restart from {old_port} to {port}")
-                try:
-                    self.app.restart_udp_server()
-                    restart_msg = f"\n✓ UDP Server restarted: {old_port} → {port}"
-                    print(f"[DEBUG] UDP restart successful")
-                except Exception as restart_error:
-                    restart_msg = f"\n✗ UDP restart failed: {str(restart_error)}"
-                    print(f"[DEBUG] UDP restart error: {restart_error}")
+            # Chuyển thiết bị: ingest server đã nhận từ mọi ESP32, chỉ đổi thiết bị đang chọn
+            if self.app:
+                self.app.switch_device(ip, port)
             else:
-                restart_msg = ""
-                if old_port == port:
-                    print(f"[DEBUG] Port unchanged, no restart needed")
-                if not self.app:
-                    print(f"[DEBUG] App reference not available for restart")
+                self.comm_handler.set_target(ip, port)
+                self.config.osc_port = port
+            
+            log.info("Active device: ESP_IP=%s, ESP_PORT=%d, OSC_PORT=%d", ip, port, port)
             
             # Hiển thị thông báo
-            messagebox.showinfo("Device Access", f"Đã kết nối với {ip} trên port {port}{restart_msg}\n\nESP32 giờ có thể gửi data tới port {port}")
+            messagebox.showinfo("Device Access", f"Đã kết nối với {ip} trên port {port}\n\nESP32 giờ có thể gửi data tới port {port}")
             
         except Exception as e:
-            print(f"[DEBUG] Error in access_device: {e}")
+            log.error("Error in access_device: %s", e)
             messagebox.showerror("Lỗi", f"Không thể kết nối với device: {str(e)}")
     
-    def _create_new_device_widget(self, device, row_index):
-        """Tạo widget mới cho device"""
-        device_key = f"{device['name']}_{device['ip']}"
-        
-        # Create device frame
-        bg_color = "#e8f5e8" if device['is_online'] else "#ffe6e6"
-        device_frame = tk.Frame(self.esp_devices_frame, bg=bg_color, relief=tk.SOLID, bd=1)
-        device_frame.grid(row=row_index, column=0, sticky="ew", padx=2, pady=2)
-        device_frame.grid_columnconfigure(1, weight=1)
-        
-        # Status frame
-        status_frame = tk.Frame(device_frame, bg=bg_color)
-        status_frame.grid(row=0, column=0, padx=8, pady=8, sticky="ns")
-        
-        # Status badge
-        if device['is_online']:
-            status_bg = "#27ae60"
-            status_text = "ONLINE"
-            status_icon = "🟢"
-        else:
-            status_bg = "#e74c3c"
-            status_text = "OFFLINE"
-            status_icon = "🔴"
-        
-        status_badge = tk.Frame(status_frame, bg=status_bg, padx=8, pady=4)
-        status_badge.pack()
-        
-        status_icon_label = tk.Label(status_badge, text=status_icon, font=("Segoe UI", 12),
-                                    bg=status_bg, fg="white")
-        status_icon_label.pack()
-        
-        status_text_label = tk.Label(status_badge, text=status_text, 
-                                    font=("Segoe UI", 8, "bold"),
-                                    bg=status_bg, fg="white")
-        status_text_label.pack()
-        
-        # Device info
-        info_frame = tk.Frame(device_frame, bg=bg_color)
-        info_frame.grid(row=0, column=1, sticky="ew", padx=10, pady=8)
-        info_frame.grid_columnconfigure(1, weight=1)
-        
-        # Device name and IP
-        name_label = tk.Label(info_frame, text=f"📱 {device['name']}", 
-                             font=("Segoe UI", 12, "bold"),
-                             bg=bg_color, fg="#2c3e50")
-        name_label.grid(row=0, column=0, sticky="w")
-        
-        ip_label = tk.Label(info_frame, text=f"🌐 {device['ip']}", 
-                           font=("Segoe UI", 10),
-                           bg=bg_color, fg="#7f8c8d")
-        ip_label.grid(row=1, column=0, sticky="w", pady=(2, 0))
-        
-        # Statistics
-        stats_frame = tk.Frame(info_frame, bg=bg_color)
-        stats_frame.grid(row=0, column=2, rowspan=2, padx=(15, 8), pady=2, sticky="e")
-        
-        # Statistics labels
-        last_hb_label = tk.Label(stats_frame, text=f"⏰ Last: {device['last_heartbeat']}", 
-                                font=("Segoe UI", 9),
-                                bg=bg_color, fg="#34495e")
-        last_hb_label.grid(row=0, column=0, sticky="e", pady=1)
-        
-        count_label = tk.Label(stats_frame, text=f"📊 Count: {device['heartbeat_count']}", 
-                              font=("Segoe UI", 9),
-                              bg=bg_color, fg="#34495e")
-        count_label.grid(row=1, column=0, sticky="e", pady=1)
-        
-        uptime_label = tk.Label(stats_frame, text=f"🕐 Uptime: {device['uptime']}", 
-                               font=("Segoe UI", 9),
-                               bg=bg_color, fg="#34495e")
-        uptime_label.grid(row=2, column=0, sticky="e", pady=1)
-        
-        # Ping information
-        if device['ping_ms'] > 0:
-            ping_text = f"{device['ping_icon']} Ping: {device['ping_ms']:.0f}ms ({device['ping_status']})"
-        else:
-            ping_text = f"{device['ping_icon']} Ping: {device['ping_status']}"
-        
-        ping_label = tk.Label(stats_frame, text=ping_text, 
-                             font=("Segoe UI", 9, "bold"),
-                             bg=bg_color, fg=device['ping_color'])
-        ping_label.grid(row=3, column=0, sticky="e", pady=1)
-        
-        # Access button for online devices
-        if device['is_online']:
-            access_button = tk.Button(stats_frame, text="🔗 Access", 
-                                     command=lambda ip=device['ip']: self.access_device(ip),
-                                     font=("Segoe UI", 8, "bold"), bg="#3498db", fg="white",
-                                     relief=tk.FLAT, cursor="hand2", padx=8, pady=2)
-            access_button.grid(row=4, column=0, sticky="e", pady=2)
-        else:
-            access_button = None
-        
-        # Cache widgets for later updates
-        self.esp_device_widgets[device_key] = {
-            'frame': device_frame,
-            'status_frame': status_frame,
-            'status_badge': status_badge,
-            'status_icon': status_icon_label,
-            'status_text': status_text_label,
-            'info_frame': info_frame,
-            'name_label': name_label,
-            'ip_label': ip_label,
-            'stats_frame': stats_frame,
-            'last_hb_label': last_hb_label,
-            'count_label': count_label,
-            'uptime_label': uptime_label,
-            'ping_label': ping_label,
-            'access_button': access_button
-        }
-
     def create_resolume_content(self):
         """Tạo nội dung RESOLUME view"""
         # Resolume card
@@ -1532,13 +1335,27 @@ class CubeTouchGUI:
         btn_monitor.grid(row=0, column=0, pady=10)
         
     def open_monitor_window(self):
-        """Mở cửa sổ Monitor"""
+        """Mở cửa sổ Monitor, nhận telemetry và gửi lệnh qua shared memory của app"""
         try:
             import subprocess
             import sys
-            subprocess.Popen([sys.executable, "monitor.py"])
+            bridge = self.comm_handler.monitor_bridge
+            args = [sys.executable, "monitor.py"]
+            slot = None
+            if bridge and bridge.is_running:
+                # Mỗi cửa sổ một slot lệnh riêng, dùng lại slot của cửa sổ đã đóng
+                slot = next((s for s in range(bridge.client_slots)
+                             if s not in self._monitor_processes or self._monitor_processes[s].poll() is not None),
+                            None)
+                if slot is None:
+                    log.warning("Cannot open more than %d monitor windows", bridge.client_slots)
+                    return
+                args += ["--shm", bridge.name, "--slot", str(slot)]
+            process = subprocess.Popen(args)
+            if slot is not None:
+                self._monitor_processes[slot] = process
         except Exception as e:
-            print(f"Error opening monitor window: {e}")
+            log.error("Error opening monitor window: %s", e)
     
     def create_status_section(self):
         """Tạo footer status với modern design"""
@@ -1833,7 +1650,7 @@ class CubeTouchGUI:
             
             if success:
                 self.threshold_status_label.config(
-                    text=f"✅ Đã gửi ngưỡng: {threshold_value}",
+                    text=f"✅ Đã đặt ngưỡng: {threshold_value}",
                     fg=self.config.colors['success']
                 )
             else:
@@ -1863,7 +1680,7 @@ class CubeTouchGUI:
                 )
                 return
             
-            success = self.comm_handler.send_udp_command(command)
+            success = self.comm_handler.queue_command(command)
             
             if success:
                 self.command_status_label.config(
@@ -1909,111 +1726,112 @@ class CubeTouchGUI:
             )
     
     def update_realtime_data(self, data):
-        """Cập nhật dữ liệu realtime"""
-        def update():
-            try:
-                # Process IR_ADC data from ESP32 frame "IR_ADC:2342"
-                if isinstance(data, str):
-                    print(f"Received string data: {data}")  # Debug log
-                    # Parse IR_ADC frame
-                    adc_match = re.search(r'IR_ADC:(\d+)', data)
-                    if adc_match:
-                        adc_value = int(adc_match.group(1))
-                        print(f"Parsed IR_ADC value: {adc_value}")  # Debug log
-                        self.process_adc_data(adc_value)
-                        
-                elif isinstance(data, dict):
-                    print(f"Received dict data: {data}")  # Debug log
-                    # Handle dictionary data - only update if widgets exist
-                    if 'raw_touch' in data and hasattr(self, 'metric_labels') and 'raw_touch' in self.metric_labels:
-                        try:
-                            self.metric_labels['raw_touch'].config(text=data['raw_touch'])
-                        except tk.TclError:
-                            pass  # Widget destroyed
-                    if 'value' in data and hasattr(self, 'metric_labels') and 'value' in self.metric_labels:
-                        try:
-                            self.metric_labels['value'].config(text=data['value'])
-                        except tk.TclError:
-                            pass  # Widget destroyed
-                    if 'threshold' in data and hasattr(self, 'metric_labels') and 'threshold' in self.metric_labels:
+        """Nhận dữ liệu realtime từ thread mạng, chỉ lưu snapshot cho display pump"""
+        if isinstance(data, AdcFrame):
+            # deque.append thread-safe, không cần lock
+            if len(self._adc_backlog) == self._adc_backlog.maxlen:
+                self.display_dropped_frames += 1
+            self._adc_backlog.append(data.value)
+            
+        elif isinstance(data, dict):
+            # Snapshot mới thay snapshot chưa được vẽ
+            if self._state_dirty:
+                self.display_dropped_frames += 1
+            self._latest_state = (data.get('raw_touch'), data.get('value'), data.get('threshold'))
+            self._state_dirty = True
+    
+    def _start_display_pump(self):
+        """Bắt đầu display pump với frame rate cố định"""
+        self._pump_interval_ms = max(1, int(1000 / self.config.gui_frame_rate))
+        self._pump_job = self.root.after(self._pump_interval_ms, self._display_pump)
+    
+    def _display_pump(self):
+        """Mỗi tick: áp dụng snapshot mới nhất bằng một lần cập nhật widget"""
+        try:
+            self._apply_display_updates()
+        except Exception as e:
+            log.error("Error in display pump: %s", e)
+        
+        self._pump_job = self.root.after(self._pump_interval_ms, self._display_pump)
+    
+    def _apply_display_updates(self):
+        """Cập nhật labels, đồ thị ADC và admin window một lần mỗi tick"""
+        self.display_ticks += 1
+        depth = len(self._adc_backlog)
+        self.display_queue_depth = depth
+        self.display_max_queue_depth = max(self.display_max_queue_depth, depth)
+        
+        # Touch state: chỉ vẽ snapshot mới nhất (MONITOR đang ẩn thì vẽ khi hiện lại)
+        if self._state_dirty:
+            self._state_dirty = False
+            raw_touch, value, threshold = self._latest_state
+            if hasattr(self, 'metric_labels') and self.current_view == "monitor":
+                for key, text in (('raw_touch', raw_touch), ('value', value), ('threshold', threshold)):
+                    if key in self.metric_labels:
                         try:
-                            self.metric_labels['threshold'].config(text=data['threshold'])
+                            self.metric_labels[key].config(text=text)
                         except tk.TclError:
                             pass  # Widget destroyed
-                            
-                    # Check for IR_ADC data in dictionary
-                    if 'ir_adc' in data:
-                        print(f"Found ir_adc in dict: {data['ir_adc']}")  # Debug log
-                        self.process_adc_data(data['ir_adc'])
-                
-                if self.admin_window and hasattr(self.admin_window, 'update_stats'):
-                    self.admin_window.update_stats()
-                    
-            except Exception as e:
-                print(f"Error in update_realtime_data: {e}")
         
-        self.root.after(0, update)
+        # Device status: chỉ các dòng có thay đổi từ tick trước
+        self._apply_device_changes()
+        
+        # ADC: lấy hết mẫu đang chờ và vẽ một lần
+        if depth:
+            popleft = self._adc_backlog.popleft
+            self.process_adc_data([popleft() for _ in range(depth)])
+        
+        # Đồ thị được hỏi mỗi tick, kể cả tick không có mẫu mới: mẫu cuối của một burst
+        # bị bỏ qua vì giới hạn fps sẽ được vẽ ở tick sau (MONITOR đang ẩn thì vẽ khi hiện lại)
+        if self.adc_plot is not None and self.current_view == "monitor":
+            self.update_adc_graph()
+        
+        if self.admin_window and hasattr(self.admin_window, 'update_stats'):
+            try:
+                if self.admin_window.winfo_exists():
+                    self.admin_window.update_stats()
+            except tk.TclError:
+                pass
+    
+    def get_display_statistics(self) -> dict:
+        """Thống kê display pump cho admin panel"""
+        return {
+            'display_ticks': self.display_ticks,
+            'dropped_frames': self.display_dropped_frames,
+            'queue_depth': self.display_queue_depth,
+            'max_queue_depth': self.display_max_queue_depth,
+            'view_switch_ms': self.view_switch_ms
+        }
     
-    def process_adc_data(self, adc_value):
-        """Xử lý dữ liệu ADC và cập nhật đồ thị"""
+    def process_adc_data(self, adc_values):
+        """Xử lý một lô dữ liệu ADC và cập nhật đồ thị một lần"""
         try:
-            print(f"Processing ADC data: {adc_value}")  # Debug log
-            
-            # Clamp ADC value to valid range
-            adc_value = max(0, min(4095, adc_value))
+            # Clamp ADC value to valid range và ghi vào ring buffer
+            self.adc_data.extend([max(0, min(4095, adc_value)) for adc_value in adc_values])
             
             # Store current value
-            self.adc_current_value = adc_value
-            
-            # Add to data history
-            self.adc_data.append(adc_value)
-            self.adc_times.append(len(self.adc_data))
+            self.adc_current_value = int(self.adc_data.latest())
             
-            print(f"ADC data length: {len(self.adc_data)}, latest value: {adc_value}")  # Debug log
+            if hot_log.isEnabledFor(logging.DEBUG):
+                hot_log.debug("Processed %d ADC samples, buffered %d, latest value: %d",
+                              len(adc_values), len(self.adc_data), self.adc_current_value)
             
             # Update current value display
-            if hasattr(self, 'adc_current_label'):
+            if hasattr(self, 'adc_current_label') and self.current_view == "monitor":
                 try:
-                    self.adc_current_label.config(text=f"IR_ADC: {adc_value}")
-                    print("Updated ADC current label")  # Debug log
+                    self.adc_current_label.config(text=f"IR_ADC: {self.adc_current_value}")
                 except tk.TclError:
-                    print("ADC label widget destroyed")  # Debug log
                     pass
-            
-            # Update graph
-            if hasattr(self, 'line') and hasattr(self, 'canvas'):
-                print("Updating ADC graph...")  # Debug log
-                self.update_adc_graph()
-            else:
-                print("Graph widgets not available")  # Debug log
                 
         except Exception as e:
-            print(f"Error processing ADC data: {e}")
+            log.error("Error processing ADC data: %s", e)
     
     def update_adc_graph(self):
-        """Cập nhật đồ thị ADC"""
+        """Cập nhật đồ thị ADC nếu có mẫu chưa vẽ (chỉ vẽ lại line bằng blitting)"""
         try:
-            if len(self.adc_data) > 0:
-                print(f"Updating graph with {len(self.adc_data)} data points")  # Debug log
-                
-                # Update line data
-                x_data = list(range(len(self.adc_data)))
-                y_data = list(self.adc_data)
-                
-                self.line.set_data(x_data, y_data)
-                
-                # Update x-axis limits to show recent data
-                if len(x_data) > 100:
-                    self.ax.set_xlim(len(x_data) - 100, len(x_data))
-                else:
-                    self.ax.set_xlim(0, max(100, len(x_data)))
-                
-                # Redraw canvas
-                self.canvas.draw_idle()
-                print("Graph updated successfully")  # Debug log
-                
+            self.adc_plot.redraw()
         except Exception as e:
-            print(f"Error updating ADC graph: {e}")
+            log.error("Error updating ADC graph: %s", e)
     
     def open_admin_window(self):
         """Mở cửa sổ admin"""
@@ -2026,14 +1844,16 @@ class CubeTouchGUI:
             except tk.TclError:
                 pass
         
-        self.admin_window = AdminWindow(self.root, self.comm_handler, self.config)
+        self.admin_window = AdminWindow(self.root, self.comm_handler, self.config,
+                                        display_stats=self.get_display_statistics)
 
 class AdminWindow:
     """Cửa sổ quản trị"""
     
-    def __init__(self, parent, comm_handler, config):
+    def __init__(self, parent, comm_handler, config, display_stats=None):
         self.comm_handler = comm_handler
         self.config = config
+        self.display_stats = display_stats  # Callable trả về thống kê display pump
         
         self.window = tk.Toplevel(parent)
         self.window.title("🔧 Administrator Panel")
@@ -2093,7 +1913,12 @@ class AdminWindow:
             ('connection_status', "Status: Disconnected"),
             ('raw_touch', "Raw Touch: N/A"),
             ('value', "Value: N/A"),
-            ('threshold', "Threshold: N/A")
+            ('threshold', "Threshold: N/A"),
+            ('kernel_drops', "Kernel Drops: N/A"),
+            ('bursts', "Bursts: N/A"),
+            ('dropped_frames', "Dropped Frames: 0"),
+            ('queue_depth', "Display Queue: 0"),
+            ('view_switch', "View Switch: 0.0 ms")
         ]
         
         for i, (key, text) in enumerate(stats_data):
@@ -2124,6 +1949,25 @@ class AdminWindow:
                  fg="white", font=("Segoe UI", 10), relief=tk.FLAT,
                  cursor="hand2", pady=5).grid(row=2, column=0, pady=5, sticky="ew")
         
+        # Logging: đổi level và bật log hot path lúc đang chạy
+        log_settings = applog.get_log_settings()
+        log_level_frame = tk.Frame(control_frame, bg=self.config.colors['dark'])
+        log_level_frame.grid(row=3, column=0, pady=5, sticky="ew")
+        
+        tk.Label(log_level_frame, text="Log Level:", font=("Segoe UI", 10),
+                bg=self.config.colors['dark'], fg="white").pack(side=tk.LEFT)
+        
+        self.log_level_var = tk.StringVar(value=log_settings['level'])
+        tk.OptionMenu(log_level_frame, self.log_level_var, *applog.LEVELS,
+                     command=self.set_log_level).pack(side=tk.LEFT, padx=(10, 0))
+        
+        self.hot_path_var = tk.BooleanVar(value=log_settings['hot_path'])
+        tk.Checkbutton(control_frame, text=f"Packet Debug Log (1/{log_settings['sample_every']})",
+                      variable=self.hot_path_var, command=self.toggle_hot_path_logging,
+                      font=("Segoe UI", 10), bg=self.config.colors['dark'], fg="white",
+                      selectcolor=self.config.colors['dark'],
+                      activebackground=self.config.colors['dark']).grid(row=4, column=0, pady=5, sticky="w")
+        
         # Log display
         log_frame = tk.LabelFrame(content_frame, text="📝 System Logs",
                                  font=("Segoe UI", 12, "bold"), bg=self.config.colors['dark'],
@@ -2142,9 +1986,9 @@ class AdminWindow:
         self.log_display.grid(row=0, column=0, sticky="nsew")
         
         # Populate initial log
-        logs = self.comm_handler.get_logs()
-        self.log_display.insert(tk.END, '\\n'.join(logs))
-        self.log_display.see(tk.END)
+        # Số thứ tự log kế tiếp cần hiển thị, bắt đầu từ các dòng cuối
+        self._log_seq = max(0, self.comm_handler.logs.next_seq - self.config.admin_log_lines)
+        self.append_new_logs()
     
     def update_stats(self):
         """Cập nhật thống kê"""
@@ -2157,10 +2001,41 @@ class AdminWindow:
         self.stats_labels['value'].config(text=f"Value: {stats['value']}")
         self.stats_labels['threshold'].config(text=f"Threshold: {stats['threshold']}")
         
-        # Update log display
-        self.log_display.delete(1.0, tk.END)
-        logs = self.comm_handler.get_logs()
-        self.log_display.insert(tk.END, '\\n'.join(logs))
+        # Thống kê ingest, None khi socket do asyncio core quản lý (hoặc OS không có bộ đếm drop)
+        drops = stats.get('kernel_drops')
+        self.stats_labels['kernel_drops'].config(text=f"Kernel Drops: {'N/A' if drops is None else drops}")
+        histogram = stats.get('burst_histogram')
+        if histogram is None:
+            self.stats_labels['bursts'].config(text="Bursts: N/A")
+        else:
+            buckets = ' '.join(f"{label}:{count}" for label, count in histogram.items())
+            self.stats_labels['bursts'].config(
+                text=f"Bursts: max {stats['max_burst']}, avg {stats['avg_burst']:.1f} ({buckets})")
+        
+        if self.display_stats:
+            display = self.display_stats()
+            self.stats_labels['dropped_frames'].config(text=f"Dropped Frames: {display['dropped_frames']}")
+            self.stats_labels['queue_depth'].config(
+                text=f"Display Queue: {display['queue_depth']} (max {display['max_queue_depth']})")
+            self.stats_labels['view_switch'].config(text=f"View Switch: {display['view_switch_ms']:.1f} ms")
+        
+        # Chỉ thêm các dòng log mới
+        self.append_new_logs()
+    
+    def append_new_logs(self):
+        """Thêm các log mới kể từ lần hiển thị trước, giới hạn số dòng trong text widget"""
+        self._log_seq, logs = self.comm_handler.get_logs_since(self._log_seq)
+        if not logs:
+            return
+        
+        self.log_display.insert(tk.END, ''.join(f"{line}\n" for line in logs))
+        
+        # Bỏ các dòng cũ nhất khi vượt giới hạn hiển thị
+        line_count = int(self.log_display.index('end-1c').split('.')[0]) - 1
+        excess = line_count - self.config.admin_log_lines
+        if excess > 0:
+            self.log_display.delete('1.0', f'{excess + 1}.0')
+        
         self.log_display.see(tk.END)
     
     def reset_statistics(self):
@@ -2171,8 +2046,20 @@ class AdminWindow:
     def clear_logs(self):
         """Xóa logs"""
         self.comm_handler.clear_logs()
+        self.log_display.delete('1.0', tk.END)
         self.update_stats()
     
+    def set_log_level(self, level):
+        """Đổi log level lúc đang chạy"""
+        applog.set_level(level)
+        self.config.log_level = level
+    
+    def toggle_hot_path_logging(self):
+        """Bật/tắt log mỗi packet (có lấy mẫu)"""
+        enabled = self.hot_path_var.get()
+        applog.set_hot_path(enabled)
+        self.config.log_hot_path = enabled
+    
     def export_logs(self):
         """Xuất logs"""
         try:
@@ -4,14 +4,109 @@ Heartbeat Manager for Multiple ESP32 devices
 Quản lý heartbeat từ nhiều ESP32 và theo dõi trạng thái online/offline
 """
 
+import array
+import heapq
+import logging
 import socket
 import threading
 import time
-import re
-import subprocess
-import platform
 from datetime import datetime
-from typing import Dict, Optional, Callable
+from typing import Dict, NamedTuple, Optional, Callable
+from applog import get_logger
+from prober import Prober
+
+log = get_logger('heartbeat')
+hot_log = get_logger('heartbeat', hot=True)
+
+# Các trường (key của get_status_info) thay đổi theo từng loại sự kiện
+HEARTBEAT_FIELDS = frozenset({'last_heartbeat', 'heartbeat_count', 'heartbeat_loss_pct'})
+PING_FIELDS = frozenset({'ping_ms', 'ping_status', 'ping_color', 'ping_icon', 'rtt_ewma_ms', 'jitter_ms',
+                         'rtt_p50_ms', 'rtt_p95_ms', 'rtt_p99_ms', 'ping_loss_pct'})
+ONLINE_FIELDS = frozenset({'is_online', 'status_text'})
+UPTIME_FIELDS = frozenset({'uptime'})
+
+class DeviceChange(NamedTuple):
+    """Thay đổi của một device: kind là 'added', 'updated' hoặc 'removed'"""
+    kind: str
+    name: str
+    fields: frozenset = frozenset()
+
+    def merge(self, later: 'DeviceChange') -> 'DeviceChange':
+        """Gộp với thay đổi đến sau của cùng device (dùng khi gom theo tick)"""
+        if later.kind == 'removed':
+            return later
+        kind = 'added' if 'added' in (self.kind, later.kind) else 'updated'
+        return DeviceChange(kind, self.name, self.fields | later.fields)
+
+class LinkStats:
+    """Chất lượng kết nối của một device, kích thước cố định dù chạy bao lâu"""
+    
+    __slots__ = ('rtt_ewma', 'jitter', '_last_rtt', '_samples', '_next', '_filled',
+                 'pings_sent', 'pings_lost', 'heartbeats_expected', 'heartbeats_received')
+    
+    EWMA_ALPHA = 0.125  # Như SRTT của TCP (RFC 6298)
+    
+    def __init__(self, window: int = 64):
+        self.rtt_ewma: Optional[float] = None
+        self.jitter = 0.0
+        self._last_rtt: Optional[float] = None
+        self._samples = array.array('f', bytes(4 * window))  # Ring RTT gần nhất cho percentile
+        self._next = 0
+        self._filled = 0
+        self.pings_sent = 0
+        self.pings_lost = 0
+        self.heartbeats_expected = 0
+        self.heartbeats_received = 0
+    
+    def add_rtt(self, rtt_ms: float):
+        """Ghi một kết quả ping (âm = mất gói)"""
+        self.pings_sent += 1
+        if rtt_ms < 0:
+            self.pings_lost += 1
+            return
+        
+        if self.rtt_ewma is None:
+            self.rtt_ewma = rtt_ms
+        else:
+            self.rtt_ewma += self.EWMA_ALPHA * (rtt_ms - self.rtt_ewma)
+        # Jitter theo RFC 3550: trung bình trượt của chênh lệch giữa hai RTT liên tiếp
+        if self._last_rtt is not None:
+            self.jitter += (abs(rtt_ms - self._last_rtt) - self.jitter) / 16
+        self._last_rtt = rtt_ms
+        
+        self._samples[self._next] = rtt_ms
+        self._next = (self._next + 1) % len(self._samples)
+        self._filled = min(self._filled + 1, len(self._samples))
+    
+    def add_heartbeat(self, gap: Optional[float], interval: float):
+        """Ghi một heartbeat; gap = thời gian từ heartbeat trước (None nếu device vừa online)"""
+        self.heartbeats_received += 1
+        if gap is None:
+            self.heartbeats_expected += 1
+        else:
+            # Khoảng trống dài bao nhiêu chu kỳ thì ESP32 đã gửi bấy nhiêu heartbeat
+            self.heartbeats_expected += max(1, round(gap / interval))
+    
+    def percentiles(self, *ranks: float) -> list:
+        """Percentile RTT (ms) trong cửa sổ gần nhất, None nếu chưa có mẫu"""
+        if not self._filled:
+            return [None] * len(ranks)
+        samples = sorted(self._samples[:self._filled])
+        last = self._filled - 1
+        return [samples[min(last, int(round(rank / 100 * last)))] for rank in ranks]
+    
+    def get_info(self) -> dict:
+        p50, p95, p99 = self.percentiles(50, 95, 99)
+        return {
+            'rtt_ewma_ms': self.rtt_ewma,
+            'jitter_ms': self.jitter,
+            'rtt_p50_ms': p50,
+            'rtt_p95_ms': p95,
+            'rtt_p99_ms': p99,
+            'ping_loss_pct': 100.0 * self.pings_lost / self.pings_sent if self.pings_sent else 0.0,
+            'heartbeat_loss_pct': (100.0 * (1 - self.heartbeats_received / self.heartbeats_expected)
+                                   if self.heartbeats_expected else 0.0)
+        }
 
 class ESP32Device:
     """Thông tin một ESP32 device"""
@@ -20,21 +115,30 @@ class ESP32Device:
         self.name = name
         self.ip = ip
         self.last_heartbeat = datetime.now()
+        self.last_seen = time.monotonic()  # Dùng cho timeout, không bị ảnh hưởng khi đổi giờ hệ thống
         self.is_online = False
         self.heartbeat_count = 0
         self.first_seen = datetime.now()
         self.ping_ms = 0  # Ping time in milliseconds
         self.ping_status = "Unknown"  # "Good", "Fair", "Poor", "Timeout"
+        self.timeout_seconds: Optional[float] = None  # None = dùng timeout chung của manager
+        self.expiry_deadline: Optional[float] = None  # Hạn của entry đang có trong heap timeout
+        self.link = LinkStats()
     
-    def update_heartbeat(self):
-        """Cập nhật heartbeat"""
+    def update_heartbeat(self, interval: float = 1.0):
+        """Cập nhật heartbeat (interval: chu kỳ gửi heartbeat của ESP32)"""
+        now = time.monotonic()
+        # Chỉ tính mất gói trong lúc online, không tính thời gian offline
+        self.link.add_heartbeat(now - self.last_seen if self.is_online else None, interval)
         self.last_heartbeat = datetime.now()
+        self.last_seen = now
         self.is_online = True
         self.heartbeat_count += 1
     
     def update_ping(self, ping_ms: float):
         """Cập nhật ping time"""
         self.ping_ms = ping_ms
+        self.link.add_rtt(ping_ms)
         
         if ping_ms < 0:
             self.ping_status = "Timeout"
@@ -96,7 +200,8 @@ class ESP32Device:
             'ping_ms': self.ping_ms,
             'ping_status': self.ping_status,
             'ping_color': self.get_ping_color(),
-            'ping_icon': self.get_ping_icon()
+            'ping_icon': self.get_ping_icon(),
+            **self.link.get_info()
         }
 
 class HeartbeatManager:
@@ -105,59 +210,82 @@ class HeartbeatManager:
     def __init__(self, config, listen_port: int = 1509):
         self.config = config
         self.listen_port = listen_port
-        self.devices: Dict[str, ESP32Device] = {}
+        self.devices: Dict[str, ESP32Device] = {}  # Theo tên (index chính)
+        self.devices_by_ip: Dict[str, ESP32Device] = {}  # Index phụ theo IP
+        self._lock = threading.RLock()
+        # Min-heap (hạn timeout, tên) của các device online, mỗi device tối đa một entry
+        self._expiry_heap = []
         self.is_running = False
         self.server_socket = None
         self.timeout_seconds = 3  # Timeout sau 3 giây
+        self.status_refresh_interval = 5  # Giây giữa các lần gửi lại status để cập nhật thời gian
+        self._next_refresh: Optional[float] = None
+        
+        # Đánh thức timeout checker khi có hạn sớm hơn hạn đang chờ
+        self._expiry_event = threading.Event()
+        self._expiry_waker: Optional[Callable] = None
         
         # Callback functions
-        self.on_device_status_update: Optional[Callable] = None
+        # on_device_changes(changes): list DeviceChange, chỉ gồm device và trường đã thay đổi
+        self.on_device_changes: Optional[Callable] = None
         self.on_new_device_found: Optional[Callable] = None
         self.on_device_offline: Optional[Callable] = None
+        self.on_device_ip_changed: Optional[Callable] = None
         
         # Threading
         self.heartbeat_thread = None
         self.timeout_check_thread = None
         self.ping_thread = None
     
-    def start(self):
-        """Bắt đầu heartbeat manager"""
+    def start(self, listen: bool = True, expiry_waker: Optional[Callable] = None):
+        """
+        Bắt đầu heartbeat manager
+        
+        Args:
+            listen (bool): Tự mở socket và chạy thread listener/timeout.
+                False khi AsyncNetworkCore đảm nhận phần này.
+            expiry_waker (Callable): Khi listen=False, được gọi khi có hạn timeout
+                sớm hơn để event loop gọi lại check_timeouts.
+        """
         if self.is_running:
             return
         
         self.is_running = True
+        self._expiry_waker = None if listen else expiry_waker
         
         try:
-            # Tạo UDP socket
-            self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            self.server_socket.bind(('0.0.0.0', self.listen_port))
-            self.server_socket.settimeout(1.0)  # 1 second timeout
-            
-            print(f"[HEARTBEAT] Listening for heartbeats on port {self.listen_port}")
+            if listen:
+                # Tạo UDP socket
+                self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                self.server_socket.bind(('0.0.0.0', self.listen_port))
+                self.server_socket.settimeout(1.0)  # 1 second timeout
+                
+                log.info("Listening for heartbeats on port %d", self.listen_port)
+                
+                self.heartbeat_thread = threading.Thread(target=self._heartbeat_listener, daemon=True)
+                self.timeout_check_thread = threading.Thread(target=self._timeout_checker, daemon=True)
+                self.heartbeat_thread.start()
+                self.timeout_check_thread.start()
             
-            # Start threads
-            self.heartbeat_thread = threading.Thread(target=self._heartbeat_listener, daemon=True)
-            self.timeout_check_thread = threading.Thread(target=self._timeout_checker, daemon=True)
+            # Start ping thread
             self.ping_thread = threading.Thread(target=self._ping_checker, daemon=True)
-            
-            self.heartbeat_thread.start()
-            self.timeout_check_thread.start()
             self.ping_thread.start()
             
         except Exception as e:
-            print(f"[HEARTBEAT] Error starting heartbeat manager: {e}")
+            log.error("Error starting heartbeat manager: %s", e)
             self.is_running = False
     
     def stop(self):
         """Dừng heartbeat manager"""
         self.is_running = False
+        self._expiry_event.set()
         
         if self.server_socket:
             self.server_socket.close()
             self.server_socket = None
         
-        print("[HEARTBEAT] Heartbeat manager stopped")
+        log.info("Heartbeat manager stopped")
     
     def _heartbeat_listener(self):
         """Thread lắng nghe heartbeat"""
@@ -165,16 +293,20 @@ class HeartbeatManager:
             try:
                 # Nhận dữ liệu UDP
                 data, addr = self.server_socket.recvfrom(1024)
-                message = data.decode('utf-8').strip()
-                
-                # Parse heartbeat message: "HEARTBEAT:Cube43,IP:192.168.0.43,HELLO"
-                self._process_heartbeat(message, addr[0])
+                self.handle_datagram(data, addr)
                 
             except socket.timeout:
                 continue
             except Exception as e:
                 if self.is_running:
-                    print(f"[HEARTBEAT] Error in heartbeat listener: {e}")
+                    log.error("Error in heartbeat listener: %s", e)
+    
+    def handle_datagram(self, data: bytes, addr):
+        """Xử lý một datagram heartbeat"""
+        message = data.decode('utf-8', errors='replace').strip()
+        
+        # Parse heartbeat message: "HEARTBEAT:Cube43,IP:192.168.0.43,HELLO"
+        self._process_heartbeat(message, addr[0])
     
     def _process_heartbeat(self, message: str, sender_ip: str):
         """Xử lý heartbeat message"""
@@ -201,133 +333,186 @@ class HeartbeatManager:
                 # Update or create device
                 self._update_device(device_name, device_ip)
                 
-                print(f"[HEARTBEAT] Received from {device_name} ({device_ip})")
+                if hot_log.isEnabledFor(logging.DEBUG):
+                    hot_log.debug("Received from %s (%s)", device_name, device_ip)
                 
         except Exception as e:
-            print(f"[HEARTBEAT] Error processing heartbeat '{message}': {e}")
+            log.warning("Error processing heartbeat %r: %s", message, e)
     
     def _update_device(self, name: str, ip: str):
         """Cập nhật hoặc tạo mới device"""
-        device_key = f"{name}_{ip}"
+        new_device = None
+        old_ip = None
+        fields = HEARTBEAT_FIELDS
         
-        if device_key not in self.devices:
-            # Device mới
-            self.devices[device_key] = ESP32Device(name, ip)
-            print(f"[HEARTBEAT] New device found: {name} ({ip})")
+        with self._lock:
+            device = self.devices.get(name)
             
+            if device is None:
+                # Device mới
+                device = new_device = ESP32Device(name, ip)
+                self.devices[name] = device
+                self._index_ip(device, ip)
+            elif device.ip != ip:
+                # Cùng tên, IP mới (DHCP cấp lại): cập nhật index thay vì tạo device khác
+                old_ip = device.ip
+                if self.devices_by_ip.get(old_ip) is device:
+                    del self.devices_by_ip[old_ip]
+                device.ip = ip
+                self._index_ip(device, ip)
+            
+            was_online = device.is_online
+            device.update_heartbeat(self.config.heartbeat_interval)
+            if not was_online:
+                # Device vừa online: đưa vào heap timeout
+                self._schedule_expiry(device)
+                fields = fields | ONLINE_FIELDS
+        
+        if new_device:
+            log.info("New device found: %s (%s)", name, ip)
             if self.on_new_device_found:
-                self.on_new_device_found(self.devices[device_key])
+                self.on_new_device_found(new_device)
+            self._emit_changes([DeviceChange('added', name)])
+            return
+        if old_ip:
+            log.info("Device %s changed IP: %s -> %s", name, old_ip, ip)
+            if self.on_device_ip_changed:
+                self.on_device_ip_changed(device, old_ip)
+            fields = fields | {'ip'}
         
-        # Cập nhật heartbeat
-        self.devices[device_key].update_heartbeat()
+        self._emit_changes([DeviceChange('updated', name, fields)])
+    
+    def _emit_changes(self, changes: list):
+        """Gửi các thay đổi cho callback (không gọi khi list rỗng)"""
+        if changes and self.on_device_changes:
+            self.on_device_changes(changes)
+    
+    def _index_ip(self, device: ESP32Device, ip: str):
+        """Cập nhật index IP (IP có thể đã được cấp cho device khác trước đó)"""
+        self.devices_by_ip[ip] = device
+    
+    def get_timeout(self, device: ESP32Device) -> float:
+        """Timeout của device (riêng nếu có, không thì timeout chung)"""
+        return device.timeout_seconds if device.timeout_seconds is not None else self.timeout_seconds
+    
+    def set_device_timeout(self, name: str, timeout_seconds: Optional[float]):
+        """Đặt timeout riêng cho một device (None = dùng timeout chung)"""
+        with self._lock:
+            device = self.devices.get(name)
+            if device is None:
+                return False
+            device.timeout_seconds = timeout_seconds
+            if device.is_online:
+                self._schedule_expiry(device)
+        return True
+    
+    def _schedule_expiry(self, device: ESP32Device):
+        """Đưa hạn timeout của device vào heap, thay entry cũ (nếu có)"""
+        deadline = device.last_seen + self.get_timeout(device)
+        device.expiry_deadline = deadline
+        heapq.heappush(self._expiry_heap, (deadline, device.name))
         
-        # Callback status update
-        if self.on_device_status_update:
-            self.on_device_status_update(self.get_all_devices_status())
+        # Hạn mới sớm nhất: đánh thức checker để chờ theo hạn này
+        if self._expiry_heap[0][0] == deadline:
+            self._wake_timeout_checker()
+    
+    def _wake_timeout_checker(self):
+        if self._expiry_waker:
+            self._expiry_waker()
+        else:
+            self._expiry_event.set()
+    
+    def next_timeout(self) -> float:
+        """Số giây đến lần check_timeouts kế tiếp (hạn gần nhất hoặc lần refresh status)"""
+        now = time.monotonic()
+        due = self._next_refresh if self._next_refresh is not None else now + self.status_refresh_interval
+        with self._lock:
+            if self._expiry_heap:
+                due = min(due, self._expiry_heap[0][0])
+        return max(0.0, due - now)
     
     def _timeout_checker(self):
-        """Thread kiểm tra timeout"""
+        """Thread đánh dấu offline đúng lúc hết hạn (ngủ đến hạn gần nhất)"""
         while self.is_running:
             try:
-                time.sleep(1)  # Check every second
-                
-                status_changed = False
-                for device in self.devices.values():
-                    was_online = device.is_online
-                    device.check_timeout(self.timeout_seconds)
-                    
-                    if was_online and not device.is_online:
-                        print(f"[HEARTBEAT] Device {device.name} ({device.ip}) went OFFLINE")
-                        status_changed = True
-                        
-                        if self.on_device_offline:
-                            self.on_device_offline(device)
-                
-                # Callback if any status changed
-                if status_changed and self.on_device_status_update:
-                    self.on_device_status_update(self.get_all_devices_status())
-                elif self.on_device_status_update:
-                    # Chỉ gửi callback mỗi 5 giây để update thời gian, tránh nhấp nháy
-                    if hasattr(self, '_last_update_time'):
-                        if (datetime.now() - self._last_update_time).total_seconds() >= 5:
-                            self._last_update_time = datetime.now()
-                            self.on_device_status_update(self.get_all_devices_status())
-                    else:
-                        self._last_update_time = datetime.now()
+                self._expiry_event.wait(self.next_timeout())
+                self._expiry_event.clear()
+                if self.is_running:
+                    self.check_timeouts()
                     
             except Exception as e:
                 if self.is_running:
-                    print(f"[HEARTBEAT] Error in timeout checker: {e}")
+                    log.error("Error in timeout checker: %s", e)
     
-    def _ping_checker(self):
-        """Thread đo ping đến các devices online"""
-        while self.is_running:
-            try:
-                time.sleep(10)  # Ping every 10 seconds
-                
-                # Ping all online devices
-                for device in self.devices.values():
-                    if device.is_online:
-                        ping_time = self._ping_device(device.ip)
-                        device.update_ping(ping_time)
+    def check_timeouts(self):
+        """Đánh dấu offline các devices quá timeout, chỉ xét các device đến hạn trong heap"""
+        now = time.monotonic()
+        expired = []
+        
+        with self._lock:
+            heap = self._expiry_heap
+            while heap and heap[0][0] <= now:
+                popped, name = heapq.heappop(heap)
+                device = self.devices.get(name)
+                if device is None or not device.is_online or device.expiry_deadline != popped:
+                    continue  # Device đã bị xóa, đã offline hoặc entry đã được thay
                 
-                # Update GUI if any device is online
-                online_devices = [d for d in self.devices.values() if d.is_online]
-                if online_devices and self.on_device_status_update:
-                    self.on_device_status_update(self.get_all_devices_status())
-                    
-            except Exception as e:
-                if self.is_running:
-                    print(f"[HEARTBEAT] Error in ping checker: {e}")
+                deadline = device.last_seen + self.get_timeout(device)
+                if deadline > now:
+                    # Có heartbeat mới từ lúc vào heap: dời hạn
+                    device.expiry_deadline = deadline
+                    heapq.heappush(heap, (deadline, name))
+                else:
+                    device.expiry_deadline = None
+                    device.is_online = False
+                    expired.append(device)
+        
+        for device in expired:
+            log.warning("Device %s (%s) went OFFLINE", device.name, device.ip)
+            if self.on_device_offline:
+                self.on_device_offline(device)
+        self._emit_changes([DeviceChange('updated', device.name, ONLINE_FIELDS) for device in expired])
+        
+        if self._next_refresh is None:
+            self._next_refresh = now + self.status_refresh_interval
+        elif now >= self._next_refresh:
+            # Mỗi 5 giây báo uptime thay đổi để cập nhật thời gian, tránh nhấp nháy
+            self._next_refresh = now + self.status_refresh_interval
+            self._emit_changes([DeviceChange('updated', name, UPTIME_FIELDS) for name in list(self.devices)])
     
-    def _ping_device(self, ip: str) -> float:
-        """Ping một device và trả về thời gian response (ms)"""
+    def _ping_checker(self):
+        """Thread đo ping đến các devices online (tất cả song song trong một vòng)"""
+        prober = Prober(self.config.ping_timeout)
         try:
-            # Determine ping command based on OS
-            if platform.system().lower() == "windows":
-                cmd = ["ping", "-n", "1", "-w", "3000", ip]  # Windows
-            else:
-                cmd = ["ping", "-c", "1", "-W", "3", ip]  # Linux/Mac
-            
-            # Run ping command
-            start_time = time.time()
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=5)
-            end_time = time.time()
-            
-            if result.returncode == 0:
-                # Parse ping output for response time
-                if platform.system().lower() == "windows":
-                    # Windows: look for "time=XXXms" or "time<1ms"
-                    import re
-                    match = re.search(r'time[=<](\d+)ms', result.stdout)
-                    if match:
-                        return float(match.group(1))
-                    elif "time<1ms" in result.stdout:
-                        return 0.5
-                else:
-                    # Linux/Mac: look for "time=XX.X ms"
-                    match = re.search(r'time=(\d+\.?\d*)[ ]?ms', result.stdout)
-                    if match:
-                        return float(match.group(1))
-                
-                # Fallback: calculate total time
-                return (end_time - start_time) * 1000
-            else:
-                return -1  # Timeout or unreachable
-                
-        except subprocess.TimeoutExpired:
-            return -1  # Timeout
-        except Exception as e:
-            print(f"[PING] Error pinging {ip}: {e}")
-            return -1
+            while self.is_running:
+                try:
+                    time.sleep(self.config.ping_interval)
+                    
+                    # Ping all online devices
+                    online_devices = [d for d in list(self.devices.values()) if d.is_online]
+                    if not online_devices:
+                        continue
+                    
+                    results = prober.probe_all(device.ip for device in online_devices)
+                    for device in online_devices:
+                        device.update_ping(results.get(device.ip, -1))
+                    
+                    self._emit_changes([DeviceChange('updated', device.name, PING_FIELDS)
+                                        for device in online_devices])
+                        
+                except Exception as e:
+                    if self.is_running:
+                        log.error("Error in ping checker: %s", e)
+        finally:
+            prober.close()
     
     def get_all_devices_status(self) -> list:
         """Lấy trạng thái tất cả devices"""
-        return [device.get_status_info() for device in self.devices.values()]
+        return [device.get_status_info() for device in list(self.devices.values())]
     
     def get_device_count(self) -> dict:
         """Lấy số lượng devices"""
-        online_count = sum(1 for device in self.devices.values() if device.is_online)
+        online_count = sum(1 for device in list(self.devices.values()) if device.is_online)
         total_count = len(self.devices)
         
         return {
@@ -338,29 +523,27 @@ class HeartbeatManager:
     
     def get_device_by_name(self, name: str) -> Optional[ESP32Device]:
         """Tìm device theo tên"""
-        for device in self.devices.values():
-            if device.name == name:
-                return device
-        return None
+        return self.devices.get(name)
     
     def get_device_by_ip(self, ip: str) -> Optional[ESP32Device]:
         """Tìm device theo IP"""
-        for device in self.devices.values():
-            if device.ip == ip:
-                return device
-        return None
+        return self.devices_by_ip.get(ip)
     
     def clear_offline_devices(self):
         """Xóa các devices offline"""
-        offline_devices = [key for key, device in self.devices.items() if not device.is_online]
+        with self._lock:
+            offline_devices = [device for device in self.devices.values() if not device.is_online]
+            
+            for device in offline_devices:
+                del self.devices[device.name]
+                if self.devices_by_ip.get(device.ip) is device:
+                    del self.devices_by_ip[device.ip]
+                # Entry trong heap (nếu còn) bị bỏ qua khi đến hạn
         
-        for key in offline_devices:
-            device = self.devices[key]
-            print(f"[HEARTBEAT] Removing offline device: {device.name} ({device.ip})")
-            del self.devices[key]
+        for device in offline_devices:
+            log.info("Removing offline device: %s (%s)", device.name, device.ip)
         
-        if offline_devices and self.on_device_status_update:
-            self.on_device_status_update(self.get_all_devices_status())
+        self._emit_changes([DeviceChange('removed', device.name) for device in offline_devices])
     
     def get_statistics(self) -> dict:
         """Lấy thống kê tổng quan"""
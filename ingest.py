@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+"""
+Telemetry ingest module for Cube Touch Monitor
+Một thread nhận telemetry từ tất cả ESP32 cùng lúc và định tuyến theo thiết bị
+"""
+
+import logging
+import selectors
+import socket
+import struct
+import sys
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+from telemetry import AdcFrame, TouchFrame, parse_frame
+from applog import get_logger
+
+hot_log = get_logger('ingest', hot=True)
+
+# Linux: kernel gắn số datagram bị bỏ (cộng dồn) vào mỗi recvmsg khi bật SO_RXQ_OVFL
+SO_RXQ_OVFL = getattr(socket, 'SO_RXQ_OVFL', 40 if sys.platform.startswith('linux') else None)
+_DROP_COUNTER = struct.Struct('I')
+
+# Nhóm kích thước burst (số datagram đọc được mỗi lần wakeup)
+BURST_BUCKETS = (1, 4, 16, 64)
+BURST_LABELS = ('1', '2-4', '5-16', '17-64', '65+')
+
+def configure_receive_socket(sock: socket.socket, rcvbuf: int) -> bool:
+    """Tăng SO_RCVBUF và bật bộ đếm drop của kernel, trả về True nếu có bộ đếm"""
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+    except OSError:
+        pass
+    
+    if SO_RXQ_OVFL is None or not hasattr(sock, 'recvmsg_into'):
+        return False
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, SO_RXQ_OVFL, 1)
+        return True
+    except OSError:
+        return False
+
+class DeviceTelemetry:
+    """Trạng thái telemetry của một ESP32"""
+    
+    def __init__(self, ip: str):
+        self.ip = ip
+        self.name: Optional[str] = None
+        self.value: Optional[int] = None
+        self.threshold: Optional[int] = None
+        self.raw_touch: Optional[int] = None
+        self.ir_adc: Optional[int] = None
+        self.last_touch: Optional[TouchFrame] = None
+        self.packets_received = 0
+        self.parse_errors = 0
+        self.last_seen = 0.0
+    
+    def apply(self, frame):
+        """Cập nhật trạng thái từ frame đã giải mã, trả về frame với trường thiếu lấy từ frame trước"""
+        self.packets_received += 1
+        self.last_seen = time.time()
+        
+        if isinstance(frame, TouchFrame):
+            frame = frame.merge(self.last_touch)
+            self.last_touch = frame
+            self.value = frame.value
+            self.threshold = frame.threshold
+            self.raw_touch = frame.stt
+        elif isinstance(frame, AdcFrame):
+            self.ir_adc = frame.value
+        else:
+            self.parse_errors += 1
+        return frame
+    
+    def get_state(self) -> dict:
+        """Lấy trạng thái hiện tại"""
+        return {
+            'name': self.name,
+            'ip': self.ip,
+            'raw_touch': self.raw_touch,
+            'value': self.value,
+            'threshold': self.threshold,
+            'ir_adc': self.ir_adc,
+            'packets_received': self.packets_received,
+            'parse_errors': self.parse_errors,
+            'last_seen': self.last_seen
+        }
+
+class TelemetryIngestServer:
+    """Nhận UDP trên nhiều port bằng một selector, định tuyến datagram theo IP nguồn"""
+    
+    def __init__(self, comm_handler, config):
+        self.comm_handler = comm_handler
+        self.archiver = comm_handler.archiver  # Lưu mọi telemetry record (None nếu tắt)
+        self.history = comm_handler.history  # Lịch sử time-series theo thiết bị (None nếu tắt)
+        self.monitor_bridge = comm_handler.monitor_bridge  # Ring shared memory cho monitor.py (None nếu tắt)
+        
+        # Nơi lưu mỗi frame đã giải mã: sink(ip, frame)
+        self._sinks = []
+        if self.archiver:
+            self._sinks.append(self.archiver.record)
+        if self.history:
+            self._sinks.append(self.history.append_frame)
+        if self.monitor_bridge:
+            self._sinks.append(self.monitor_bridge.publish)
+        self.config = config
+        comm_handler.ingest_server = self  # Thống kê ingest đi cùng comm_handler.get_statistics()
+        
+        # Trạng thái theo thiết bị
+        self.devices: Dict[str, DeviceTelemetry] = {}
+        self.device_names: Dict[str, str] = {}  # name -> ip
+        
+        # Thiết bị đang được chọn trong GUI: dữ liệu của nó đi vào comm_handler
+        self.active_ip = config.esp_ip
+        self.active_port = config.osc_port
+        
+        self.is_running = False
+        self.ingest_thread = None
+        self.total_datagrams = 0
+        self.first_datagram_at: Optional[float] = None  # time.perf_counter() của datagram đầu tiên
+        
+        # Callback khi nhận datagram đầu tiên (đo thời gian khởi động)
+        self.on_first_datagram: Optional[Callable] = None
+        
+        # Callback mở port mới, dùng khi socket do AsyncNetworkCore quản lý
+        self.on_port_added: Optional[Callable] = None
+        # True khi socket do AsyncNetworkCore quản lý: asyncio không trả ancillary data nên không có
+        # bộ đếm drop của kernel, mỗi datagram được giao riêng nên cũng không có thống kê burst
+        self.external_sockets = False
+        
+        self._sockets: Dict[int, socket.socket] = {}
+        self._drop_counters: Dict[int, int] = {}  # port -> drop cộng dồn của kernel (None nếu không hỗ trợ)
+        
+        # Vòng buffer cấp phát sẵn cho chế độ drain
+        self._ring = [bytearray(config.ingest_slot_size) for _ in range(config.ingest_ring_slots)]
+        self._ring_views = [memoryview(buf) for buf in self._ring]
+        self._ring_index = 0
+        self._ancillary_size = socket.CMSG_SPACE(_DROP_COUNTER.size) if hasattr(socket, 'CMSG_SPACE') else 0
+        
+        # Thống kê burst
+        self.total_bursts = 0
+        self.max_burst = 0
+        self.truncated_datagrams = 0
+        self.burst_histogram = [0] * (len(BURST_BUCKETS) + 1)
+        self._ports = {config.osc_port}
+        self._pending_ports = []
+        self._lock = threading.Lock()
+        self._selector = None
+        self._wakeup_recv = None
+        self._wakeup_send = None
+    
+    def start(self):
+        """Bắt đầu thread nhận dữ liệu"""
+        if self.is_running:
+            return
+        
+        self._selector = selectors.DefaultSelector()
+        self._wakeup_recv, self._wakeup_send = socket.socketpair()
+        self._wakeup_recv.setblocking(False)
+        self._selector.register(self._wakeup_recv, selectors.EVENT_READ)
+        
+        with self._lock:
+            ports = sorted(self._ports)
+        for port in ports:
+            self._bind_port(port)
+        
+        self.is_running = True
+        self.ingest_thread = threading.Thread(target=self._ingest_loop, daemon=True)
+        self.ingest_thread.start()
+    
+    def stop(self):
+        """Dừng thread nhận dữ liệu ngay lập tức"""
+        if not self.is_running:
+            return
+        
+        self.is_running = False
+        self._wakeup()
+        
+        if self.ingest_thread:
+            self.ingest_thread.join(timeout=1.0)
+            self.ingest_thread = None
+        
+        for port in list(self._sockets):
+            self._close_port(port)
+        
+        self._selector.close()
+        self._wakeup_recv.close()
+        self._wakeup_send.close()
+        self._selector = None
+        self.comm_handler.add_log("UDP ingest server stopped")
+    
+    def add_port(self, port: int):
+        """Thêm port nhận (thread-safe, không restart server)"""
+        with self._lock:
+            if port in self._ports:
+                return
+            self._ports.add(port)
+            if self.on_port_added is None:
+                self._pending_ports.append(port)
+        
+        if self.on_port_added:
+            self.on_port_added(port)
+        else:
+            self._wakeup()
+    
+    def get_ports(self) -> list:
+        """Danh sách port telemetry đang được yêu cầu"""
+        with self._lock:
+            return sorted(self._ports)
+    
+    def discard_port(self, port: int):
+        """Bỏ port không mở được"""
+        with self._lock:
+            self._ports.discard(port)
+    
+    def register_device(self, name: str, ip: str):
+        """Ghi nhận thiết bị từ heartbeat và mở port telemetry của nó"""
+        with self._lock:
+            self.device_names[name] = ip
+        self._get_device(ip).name = name
+        self.add_port(self.config.port_for_ip(ip))
+    
+    def set_active_device(self, ip: str, port: int):
+        """Chọn thiết bị hiển thị trên GUI"""
+        self.add_port(port)
+        self.active_ip = ip
+        self.active_port = port
+        if self.monitor_bridge:
+            self.monitor_bridge.set_active_ip(ip)
+        self.comm_handler.add_log(f"Active device: {ip} (port {port})")
+    
+    def get_device_state(self, name_or_ip: str) -> Optional[dict]:
+        """Lấy trạng thái telemetry theo tên hoặc IP"""
+        ip = self.device_names.get(name_or_ip, name_or_ip)
+        device = self.devices.get(ip)
+        return device.get_state() if device else None
+    
+    def get_all_device_states(self) -> list:
+        """Lấy trạng thái telemetry của tất cả thiết bị"""
+        return [device.get_state() for device in list(self.devices.values())]
+    
+    def handle_datagram(self, data, addr: Tuple[str, int], port: int):
+        """Giải mã datagram một lần và định tuyến tới thiết bị"""
+        self.total_datagrams += 1
+        if self.first_datagram_at is None:
+            self.first_datagram_at = time.perf_counter()
+            if self.on_first_datagram:
+                self.on_first_datagram()
+        frame = parse_frame(data)
+        
+        ip = addr[0]
+        if hot_log.isEnabledFor(logging.DEBUG):
+            hot_log.debug("Received UDP data from %s:%d on port %d: %r", ip, addr[1], port, frame)
+        # Frame thiếu trường được điền từ frame trước của thiết bị trước khi lưu
+        frame = self._get_device(ip).apply(frame)
+        # Định tuyến theo IP nguồn: thiết bị khác gửi nhầm vào port của thiết bị đang chọn không được hiển thị
+        if ip == self.active_ip:
+            self.comm_handler.handle_frame(frame)
+        
+        # Lưu sau khi trạng thái và GUI đã cập nhật; lỗi của một nơi lưu không ảnh hưởng nơi khác
+        for sink in self._sinks:
+            try:
+                sink(ip, frame)
+            except Exception as e:
+                hot_log.error("Error storing telemetry from %s in %s: %s", ip, sink.__qualname__, e)
+    
+    def _get_device(self, ip: str) -> DeviceTelemetry:
+        device = self.devices.get(ip)
+        if device is None:
+            device = DeviceTelemetry(ip)
+            self.devices[ip] = device
+        return device
+    
+    def _wakeup(self):
+        try:
+            self._wakeup_send.send(b'\0')
+        except (AttributeError, OSError):
+            pass
+    
+    def _bind_port(self, port: int):
+        """Mở socket nhận trên port"""
+        try:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            has_drop_counter = configure_receive_socket(sock, self.config.udp_rcvbuf)
+            sock.bind(("0.0.0.0", port))
+            sock.setblocking(False)
+        except OSError as e:
+            if "[WinError 10048]" in str(e):
+                self.comm_handler.add_log(f"✗ Port {port} is already in use")
+            else:
+                self.comm_handler.add_log(f"✗ Error binding UDP port {port}: {str(e)}")
+            self.discard_port(port)
+            return
+        
+        self._sockets[port] = sock
+        self._drop_counters[port] = 0 if has_drop_counter else None
+        self._selector.register(sock, selectors.EVENT_READ, port)
+        self.comm_handler.add_log(f"✓ UDP ingest listening on port {port}")
+    
+    def _close_port(self, port: int):
+        sock = self._sockets.pop(port, None)
+        if sock is None:
+            return
+        try:
+            self._selector.unregister(sock)
+        except (KeyError, ValueError):
+            pass
+        sock.close()
+    
+    def _ingest_loop(self):
+        """Thread chờ dữ liệu trên tất cả port"""
+        while self.is_running:
+            try:
+                events = self._selector.select()
+            except OSError as e:
+                if self.is_running:
+                    self.comm_handler.add_log(f"Error in UDP ingest select: {str(e)}")
+                break
+            
+            for key, _ in events:
+                if key.fileobj is self._wakeup_recv:
+                    self._handle_wakeup()
+                    continue
+                
+                self._drain(key.fileobj, key.data)
+    
+    def _drain(self, sock: socket.socket, port: int):
+        """Đọc hết datagram đang chờ của socket vào vòng buffer"""
+        use_recvmsg = self._drop_counters.get(port) is not None
+        ring_size = len(self._ring_views)
+        burst = 0
+        
+        # Giới hạn một vòng buffer mỗi lần để các port khác không bị bỏ đói
+        while burst < ring_size:
+            view = self._ring_views[self._ring_index]
+            self._ring_index = (self._ring_index + 1) % ring_size
+            
+            try:
+                if use_recvmsg:
+                    nbytes, ancdata, flags, addr = sock.recvmsg_into([view], self._ancillary_size)
+                    self._update_drop_counter(port, ancdata)
+                    if flags & socket.MSG_TRUNC:
+                        self.truncated_datagrams += 1
+                else:
+                    nbytes, addr = sock.recvfrom_into(view)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError as e:
+                # Windows báo ConnectionResetError khi ICMP port unreachable
+                if self.is_running:
+                    self.comm_handler.add_log(f"Error receiving UDP data: {str(e)}")
+                break
+            
+            burst += 1
+            try:
+                self.handle_datagram(view[:nbytes], addr, port)
+            except Exception as e:
+                self.comm_handler.add_log(f"Error handling datagram from {addr[0]}: {str(e)}")
+        
+        if burst:
+            self._record_burst(burst)
+    
+    def _update_drop_counter(self, port: int, ancdata):
+        for level, kind, data in ancdata:
+            if level == socket.SOL_SOCKET and kind == SO_RXQ_OVFL and len(data) >= _DROP_COUNTER.size:
+                self._drop_counters[port] = _DROP_COUNTER.unpack_from(data)[0]
+    
+    def _record_burst(self, burst: int):
+        self.total_bursts += 1
+        if burst > self.max_burst:
+            self.max_burst = burst
+        for i, limit in enumerate(BURST_BUCKETS):
+            if burst <= limit:
+                self.burst_histogram[i] += 1
+                return
+        self.burst_histogram[-1] += 1
+    
+    def get_kernel_drops(self) -> Optional[int]:
+        """Tổng datagram bị kernel bỏ do đầy buffer (None nếu OS không hỗ trợ)"""
+        counters = [count for count in self._drop_counters.values() if count is not None]
+        return sum(counters) if counters else None
+    
+    def _handle_wakeup(self):
+        try:
+            while self._wakeup_recv.recv(64):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
+        
+        with self._lock:
+            pending, self._pending_ports = self._pending_ports, []
+        for port in pending:
+            if self.is_running:
+                self._bind_port(port)
+    
+    def get_statistics(self) -> dict:
+        """Lấy thống kê ingest (None: không đo được ở chế độ hiện tại)"""
+        stats = {
+            'ingest_ports': self.get_ports(),
+            'ingest_devices': len(self.devices),
+            'ingest_datagrams': self.total_datagrams,
+            'kernel_drops': None,
+            'max_burst': None,
+            'avg_burst': None,
+            'burst_histogram': None,
+            'truncated_datagrams': None,
+            'active_ip': self.active_ip,
+            'active_port': self.active_port
+        }
+        if not self.external_sockets:
+            stats.update({
+                'kernel_drops': self.get_kernel_drops(),
+                'max_burst': self.max_burst,
+                'avg_burst': self.total_datagrams / self.total_bursts if self.total_bursts else 0.0,
+                'burst_histogram': dict(zip(BURST_LABELS, self.burst_histogram)),
+                'truncated_datagrams': self.truncated_datagrams
+            })
+        return stats
@@ -4,10 +4,12 @@ LED Control module for Cube Touch Monitor
 Xử lý tất cả logic điều khiển LED
 """
 
+from throttle import Throttle
+
 class LEDController:
     """Điều khiển LED"""
     
-    def __init__(self, comm_handler):
+    def __init__(self, comm_handler, send_interval: float = 0.1):
         self.comm_handler = comm_handler
         
         # LED state
@@ -18,18 +20,21 @@ class LEDController:
         self.led_enabled = True
         self.direction = 0  # 0=down, 1=up
         self.config_mode = False
+        
+        # Gửi màu/độ sáng có throttle, giá trị cuối luôn được gửi
+        self._color_throttle = Throttle(self._send_color, send_interval)
     
     def set_color(self, r: int, g: int, b: int):
         """Thiết lập màu LED"""
         self.current_r = r
         self.current_g = g
         self.current_b = b
-        self._send_color()
+        self._color_throttle()
     
     def set_brightness(self, brightness: int):
         """Thiết lập độ sáng"""
         self.current_brightness = max(1, min(255, brightness))
-        self._send_color()
+        self._color_throttle()
     
     def _send_color(self):
         """Gửi màu với độ sáng đã điều chỉnh"""
@@ -42,13 +47,13 @@ class LEDController:
         else:
             command = f"{adj_r} {adj_g} {adj_b}"
             
-        self.comm_handler.send_udp_command(command)
+        self.comm_handler.queue_command(command)
     
     def toggle_led(self):
         """Bật/tắt LED"""
         self.led_enabled = not self.led_enabled
         command = f"LED:{1 if self.led_enabled else 0}"
-        self.comm_handler.send_udp_command(command)
+        self.comm_handler.queue_command(command)
         return self.led_enabled
     
     def set_direction(self, direction: int):
@@ -58,14 +63,14 @@ class LEDController:
             
         self.direction = 1 if direction == 1 else 0
         command = f"DIR:{self.direction}"
-        self.comm_handler.send_udp_command(command)
+        self.comm_handler.queue_command(command)
         return True
     
     def toggle_config_mode(self):
         """Bật/tắt config mode"""
         self.config_mode = not self.config_mode
         command = f"CONFIG:{1 if self.config_mode else 0}"
-        self.comm_handler.send_udp_command(command)
+        self.comm_handler.queue_command(command)
         return self.config_mode
     
     def send_rainbow_effect(self):
@@ -74,7 +79,7 @@ class LEDController:
             return False
             
         command = "RAINBOW:START"
-        self.comm_handler.send_udp_command(command)
+        self.comm_handler.queue_command(command)
         return True
     
     def send_led_test(self):
@@ -83,7 +88,7 @@ class LEDController:
             return False
             
         command = "LEDCTRL:ALL,255,255,255"
-        self.comm_handler.send_udp_command(command)
+        self.comm_handler.queue_command(command)
         return True
     
     def send_direct_control(self, r: int, g: int, b: int, led_index: int = -1):
@@ -96,7 +101,7 @@ class LEDController:
         else:
             command = f"LEDCTRL:ALL,{r},{g},{b}"
             
-        self.comm_handler.send_udp_command(command)
+        self.comm_handler.queue_command(command)
         return True
     
     def get_state(self) -> dict:
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Log store module for Cube Touch Monitor
+Ring buffer log có số thứ tự để người đọc chỉ lấy các dòng mới
+"""
+
+import threading
+from collections import deque
+from itertools import islice
+from typing import List, Tuple
+
+class LogStore:
+    """Ring buffer log giới hạn kích thước, append O(1)"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._entries = deque(maxlen=capacity)
+        self._next_seq = 0  # Số thứ tự của dòng ghi kế tiếp
+        self._lock = threading.Lock()
+
+    def append(self, entry: str) -> int:
+        """Thêm một dòng log, trả về số thứ tự của nó"""
+        with self._lock:
+            self._entries.append(entry)
+            seq = self._next_seq
+            self._next_seq += 1
+        return seq
+
+    def get_since(self, seq: int) -> Tuple[int, List[str]]:
+        """Các dòng có số thứ tự >= seq và số thứ tự kế tiếp cho lần đọc sau"""
+        with self._lock:
+            count = min(self._next_seq - seq, len(self._entries))
+            if count <= 0:
+                return self._next_seq, []
+            # Duyệt từ cuối nên chỉ tốn O(số dòng mới) dù store lớn
+            entries = list(islice(reversed(self._entries), count))
+            next_seq = self._next_seq
+        entries.reverse()
+        return next_seq, entries
+
+    def get_all(self) -> List[str]:
+        """Bản sao toàn bộ log còn giữ"""
+        with self._lock:
+            return list(self._entries)
+
+    def clear(self):
+        """Xóa log, số thứ tự vẫn tiếp tục tăng"""
+        with self._lock:
+            self._entries.clear()
+
+    @property
+    def first_seq(self) -> int:
+        """Số thứ tự của dòng cũ nhất còn giữ"""
+        return self._next_seq - len(self._entries)
+
+    @property
+    def next_seq(self) -> int:
+        return self._next_seq
+
+    def __len__(self):
+        return len(self._entries)
@@ -4,148 +4,153 @@ Main entry point for Cube Touch Monitor Application
 Khởi tạo và chạy ứng dụng chính
 """
 
+import argparse
+import signal
 import sys
-import os
 import threading
-import tkinter as tk
-import socket
-from pythonosc.dispatcher import Dispatcher
-from pythonosc.osc_server import BlockingOSCUDPServer
+import time
 
-# Import các module riêng
-from gui import CubeTouchGUI
+_STARTED = time.perf_counter()
+
+# Import các module riêng (gui, tkinter, customtkinter import trong run() sau khi mạng đã chạy)
 from communication import CommunicationHandler
 from config import AppConfig
+from heartbeat import HeartbeatManager
+from ingest import TelemetryIngestServer
+from netcore import AsyncNetworkCore
+from webapi import WebAPIServer
+from shmbridge import COMMAND_RAW, COMMAND_THRESHOLD
+from led import LEDController
+from touch import TouchController
+from xilanh import XilanhController
+from IR import IRController
+from applog import get_logger, setup_logging, shutdown_logging
+
+log = get_logger('main')
 
 class CubeTouchApp:
     def __init__(self):
         """Khởi tạo ứng dụng chính"""
+        # Các mốc thời gian khởi động (ms từ lúc import main)
+        self.startup_marks = {}
+        self._mark_startup("imports")
+        
         self.config = AppConfig()
+        setup_logging(self.config.log_level, self.config.log_hot_path, self.config.log_sample_every)
         self.comm_handler = CommunicationHandler(self.config)
+        self.heartbeat_manager = HeartbeatManager(self.config)
+        self.ingest_server = TelemetryIngestServer(self.comm_handler, self.config)
+        
+        # Controllers dùng chung cho GUI và chế độ headless
+        self.led_controller = LEDController(self.comm_handler)
+        self.touch_controller = TouchController(self.comm_handler)
+        self.xilanh_controller = XilanhController(self.comm_handler)
+        self.ir_controller = IRController(self.comm_handler, self.config)
+        
+        self.network_core = None
+        self.api_server = None  # Tạo trong start_network nếu config.api_enabled
+        self.stop_event = threading.Event()  # Dừng run_headless
         self.root = None
         self.gui = None
-        self.osc_thread = None
-        self.udp_socket = None
-        self.udp_running = False
         
-    def setup_osc_server(self):
-        """Thiết lập UDP server để nhận dữ liệu từ ESP32"""
-        def run_udp_server():
-            try:
-                self._current_port = self.config.osc_port  # Track current port
-                self.udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-                self.udp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-                # Thêm SO_REUSEPORT trên Windows để tránh xung đột
-                try:
-                    self.udp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
-                except (AttributeError, OSError):
-                    pass  # SO_REUSEPORT not available on Windows
-                
-                self.udp_socket.bind(("0.0.0.0", self.config.osc_port))
-                self.udp_socket.settimeout(1.0)  # Timeout để có thể kiểm tra running flag
-                self.udp_running = True
-                self.comm_handler.add_log(f"✓ UDP Server started successfully on port {self.config.osc_port}")
-                print(f"[DEBUG] UDP Server listening on 0.0.0.0:{self.config.osc_port}")
-                
-                while self.udp_running:
-                    try:
-                        data, addr = self.udp_socket.recvfrom(1024)
-                        raw_message = data.decode('utf-8').strip()
-                        print(f"[DEBUG] Received UDP data on port {self.config.osc_port}: {raw_message} from {addr}")
-                        self.comm_handler.handle_raw_udp_data(raw_message)
-                    except socket.timeout:
-                        continue  # Continue checking running flag
-                    except Exception as e:
-                        if self.udp_running:  # Only log if we're supposed to be running
-                            self.comm_handler.add_log(f"Error receiving UDP data: {str(e)}")
-                            print(f"[DEBUG] UDP receive error: {e}")
-                        break
-                        
-            except Exception as e:
-                if "[WinError 10048]" in str(e):
-                    self.comm_handler.add_log(f"✗ Port {self.config.osc_port} is already in use. Trying to cleanup...")
-                else:
-                    self.comm_handler.add_log(f"✗ Error in UDP server: {str(e)}")
-            finally:
-                if self.udp_socket:
-                    try:
-                        self.udp_socket.close()
-                    except:
-                        pass
-                    self.udp_socket = None
-                self.comm_handler.add_log(f"UDP Server stopped (port {getattr(self, '_current_port', 'unknown')})")
-        
-        self.osc_thread = threading.Thread(target=run_udp_server, daemon=True)
-        self.osc_thread.start()
+        # Thiết bị mới từ heartbeat -> mở port telemetry của nó
+        self.heartbeat_manager.on_new_device_found = self._on_new_device_found
+        self.heartbeat_manager.on_device_ip_changed = self._on_device_ip_changed
+        self.ingest_server.on_first_datagram = lambda: self._mark_startup("first packet")
+        if self.comm_handler.monitor_bridge:
+            self.comm_handler.monitor_bridge.on_command = self._on_monitor_command
     
-    def restart_udp_server(self):
-        """Khởi động lại UDP server với port mới"""
-        old_port = None
-        if hasattr(self, '_current_port'):
-            old_port = self._current_port
-        
-        print(f"[DEBUG] Starting UDP server restart: {old_port} → {self.config.osc_port}")
-        self.comm_handler.add_log(f"Restarting UDP server from port {old_port} to {self.config.osc_port}")
-        
-        # Dừng server hiện tại
-        print(f"[DEBUG] Stopping current UDP server...")
-        self.stop_udp_server()
-        
-        # Đợi một chút để socket được giải phóng hoàn toàn
-        import time
-        print(f"[DEBUG] Waiting for socket cleanup...")
-        time.sleep(1.0)  # Tăng thời gian chờ
+    def _mark_startup(self, name: str):
+        """Ghi một mốc khởi động"""
+        elapsed_ms = (time.perf_counter() - _STARTED) * 1000
+        self.startup_marks[name] = elapsed_ms
+        log.info("Startup: %s after %.0f ms", name, elapsed_ms)
+    
+    def _on_new_device_found(self, device):
+        """Callback khi heartbeat phát hiện ESP32 mới"""
+        self.ingest_server.register_device(device.name, device.ip)
+    
+    def _on_device_ip_changed(self, device, old_ip):
+        """Callback khi ESP32 đổi IP: mở port telemetry theo IP mới"""
+        self.ingest_server.register_device(device.name, device.ip)
+    
+    def _on_monitor_command(self, kind: int, text: str):
+        """Callback khi cửa sổ monitor.py gửi lệnh qua shared memory"""
+        if kind == COMMAND_THRESHOLD:
+            success = self.touch_controller.set_threshold(text)
+        elif kind == COMMAND_RAW:
+            success = self.comm_handler.queue_command(text)
+        else:
+            success = False
+        self.comm_handler.add_log(f"Monitor command {text!r}: {'sent' if success else 'rejected'}")
+    
+    def start_network(self):
+        """Khởi động heartbeat, nhận telemetry và gửi lệnh"""
+        if self.comm_handler.archiver:
+            self.comm_handler.archiver.start()
+        if self.comm_handler.monitor_bridge:
+            self.comm_handler.monitor_bridge.start()
         
-        # Khởi động server mới
-        print(f"[DEBUG] Starting new UDP server on port {self.config.osc_port}...")
-        self.setup_osc_server()
+        if self.config.use_asyncio_core:
+            # Một event loop cho tất cả I/O mạng
+            self.network_core = AsyncNetworkCore(self.comm_handler, self.heartbeat_manager,
+                                                 self.ingest_server, self.config)
+            self.network_core.start()
+        else:
+            self.heartbeat_manager.start()
+            self.setup_osc_server()
+            self.comm_handler.command_queue.start()
         
-        print(f"[DEBUG] UDP server restart completed")
-        self.comm_handler.add_log(f"UDP Server successfully restarted on port {self.config.osc_port}")
+        if self.config.api_enabled:
+            if self.api_server is None:
+                self.api_server = WebAPIServer(self)
+            self.api_server.start()
+        self._mark_startup("network")
+    
+    def stop_network(self):
+        """Dừng toàn bộ mạng"""
+        if self.api_server:
+            self.api_server.stop()
+        if self.network_core:
+            self.network_core.stop()
+        else:
+            self.stop_udp_server()
+        self.heartbeat_manager.stop()
+        self.comm_handler.close()
+    
+    def setup_osc_server(self):
+        """Thiết lập UDP ingest server nhận dữ liệu từ tất cả ESP32"""
+        self.ingest_server.start()
+        log.info("UDP ingest server listening on ports %s", self.ingest_server.get_ports())
+    
+    def switch_device(self, ip: str, port: int):
+        """Chuyển thiết bị đang chọn, không cần restart socket"""
+        self.comm_handler.set_target(ip, port)
+        self.config.osc_port = port
+        self.ingest_server.set_active_device(ip, port)
     
     def stop_udp_server(self):
-        """Dừng UDP server"""
-        print(f"[DEBUG] Stopping UDP server...")
-        if hasattr(self, 'udp_running'):
-            self.udp_running = False
-            print(f"[DEBUG] Set udp_running to False")
-        
-        if hasattr(self, 'udp_socket') and self.udp_socket:
-            print(f"[DEBUG] Closing UDP socket...")
-            try:
-                self.udp_socket.shutdown(socket.SHUT_RDWR)
-                print(f"[DEBUG] Socket shutdown complete")
-            except:
-                print(f"[DEBUG] Socket shutdown failed (normal if not connected)")
-                pass
-            try:
-                self.udp_socket.close()
-                print(f"[DEBUG] Socket close complete")
-            except:
-                print(f"[DEBUG] Socket close failed")
-                pass
-            self.udp_socket = None
-        
-        if hasattr(self, 'osc_thread') and self.osc_thread:
-            print(f"[DEBUG] Waiting for thread to stop...")
-            self.osc_thread.join(timeout=3.0)  # Tăng timeout
-            print(f"[DEBUG] Thread stopped")
-            self.osc_thread = None
-        
-        print(f"[DEBUG] UDP server cleanup completed")
-        self.comm_handler.add_log("UDP Server cleanup completed")
+        """Dừng UDP ingest server"""
+        self.ingest_server.stop()
     
     def run(self):
         """Chạy ứng dụng"""
         try:
+            # Mạng chạy trước khi import và dựng GUI để không bỏ lỡ thiết bị và telemetry
+            self.start_network()
+            
+            import tkinter as tk
+            from gui import CubeTouchGUI
+            self._mark_startup("gui imports")
+            
             # Tạo cửa sổ chính
             self.root = tk.Tk()
             
-            # Khởi tạo giao diện với tham chiếu đến app để có thể restart UDP server
-            self.gui = CubeTouchGUI(self.root, self.comm_handler, self.config, app=self)
-            
-            # Thiết lập OSC server
-            self.setup_osc_server()
+            # Khởi tạo giao diện với tham chiếu đến app để có thể chuyển thiết bị
+            self.gui = CubeTouchGUI(self.root, self.comm_handler, self.config, app=self,
+                                    heartbeat_manager=self.heartbeat_manager)
+            self.root.update_idletasks()
+            self._mark_startup("window")
             
             # Log khởi tạo
             self.comm_handler.add_log("Application started")
@@ -155,15 +160,56 @@ class CubeTouchApp:
             # Chạy giao diện
             self.root.mainloop()
         except Exception as e:
-            print(f"Error running application: {str(e)}")
+            log.exception("Error running application: %s", e)
         finally:
-            self.stop_udp_server()
+            self.stop_network()
+            shutdown_logging()
+    
+    def run_headless(self):
+        """Chạy toàn bộ mạng (ingest, heartbeat, lệnh, archive) không cần Tk, đến khi stop_event được set"""
+        # SIGTERM (systemd, docker stop) dừng như Ctrl+C; chỉ đăng ký được từ main thread
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, lambda signum, frame: self.stop_event.set())
+        
+        try:
+            self.start_network()
+            self.comm_handler.add_log("Application started (headless)")
+            
+            interval = self.config.headless_status_interval
+            while not self.stop_event.wait(interval):
+                self._log_status()
+        except KeyboardInterrupt:
+            log.info("Stopped by user")
+        finally:
+            self.stop_network()
+            shutdown_logging()
+    
+    def _log_status(self):
+        """Tóm tắt định kỳ thay cho giao diện"""
+        counts = self.heartbeat_manager.get_device_count()
+        stats = self.comm_handler.get_statistics()
+        drops = stats['kernel_drops']
+        log.info("Devices %d online / %d total, %d datagrams received, %s kernel drops, %d packets sent",
+                 counts['online'], counts['total'], stats['ingest_datagrams'],
+                 'n/a' if drops is None else drops, stats['packets_sent'])
 
 def main():
     """Entry point chính"""
+    parser = argparse.ArgumentParser(description="Cube Touch Monitor")
+    parser.add_argument("--headless", action="store_true",
+                        help="run ingest, heartbeat, commands and archiving without a window")
+    parser.add_argument("--api", action="store_true",
+                        help="serve the HTTP/WebSocket API (api_* settings in config.py)")
+    args = parser.parse_args()
+    
     try:
         app = CubeTouchApp()
-        app.run()
+        if args.api:
+            app.config.api_enabled = True
+        if args.headless:
+            app.run_headless()
+        else:
+            app.run()
     except KeyboardInterrupt:
         print("\nApplication stopped by user")
     except Exception as e:
@@ -171,4 +217,4 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,12 +1,16 @@
 """
 Monitor Window - Live Monitoring và các sections đo lường
 """
+import argparse
+import socket
+import time
 import tkinter as tk
 import customtkinter as ctk
 from config import AppConfig
+from shmbridge import COMMAND_RAW, COMMAND_THRESHOLD, KIND_TOUCH, MonitorClient
 
 class MonitorWindow:
-    def __init__(self):
+    def __init__(self, shm_name=None, slot=0):
         self.config = AppConfig()
         self.root = ctk.CTk()
         self.metric_labels = {}
@@ -14,10 +18,21 @@ class MonitorWindow:
         self.threshold_status_label = None
         self.command_entry = None
         self.command_status_label = None
+        self.bridge_status_label = None
+        
+        # Dữ liệu từ shared memory của app (không mở socket UDP riêng)
+        self.shm_name = shm_name or self.config.monitor_shm_name
+        self.slot = slot
+        self.client = None
+        self._rate_started = time.monotonic()
+        self._rate_count = 0
+        self._rate = 0.0
         
         self.setup_window()
         self.setup_scrollable_canvas()
         self.create_sections()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+        self.root.after(0, self.poll_bridge)
         
     def setup_window(self):
         """Thiết lập cửa sổ MONITOR"""
@@ -83,6 +98,11 @@ class MonitorWindow:
         self.create_realtime_section()
         self.create_command_section()
         
+        # Trạng thái kết nối với app
+        self.bridge_status_label = tk.Label(self.scrollable_frame, text="📡 Đang kết nối app...",
+                                            font=("Segoe UI", 9), bg="#f8f9fa", fg="#7f8c8d")
+        self.bridge_status_label.grid(row=2, column=0, columnspan=4, sticky="ew", pady=(0, 6))
+        
     def create_realtime_section(self):
         """Tạo section monitoring với dashboard design"""
         # Top row - 4 metric/control cards
@@ -271,25 +291,81 @@ class MonitorWindow:
         self.command_status_label.grid(row=1, column=0, columnspan=3, pady=(10, 0), sticky="ew")
         
     def send_threshold(self):
-        """Gửi threshold value"""
+        """Gửi threshold value cho app qua shared memory"""
         try:
-            threshold_value = self.threshold_entry.get()
-            print(f"Sending threshold: {threshold_value}")
+            threshold_value = int(self.threshold_entry.get())
+        except ValueError:
+            self.threshold_status_label.config(text="Ngưỡng phải là số")
+            return
+        if self.client is None:
+            self.threshold_status_label.config(text="Chưa kết nối app")
+        elif self.client.send_command(COMMAND_THRESHOLD, str(threshold_value)):
             self.threshold_status_label.config(text=f"Đã gửi: {threshold_value}")
-        except Exception as e:
-            print(f"Error sending threshold: {e}")
+        else:
             self.threshold_status_label.config(text="Lỗi gửi")
             
     def send_custom_command(self):
-        """Gửi custom command"""
-        try:
-            command = self.command_entry.get()
-            print(f"Sending command: {command}")
+        """Gửi custom command cho app qua shared memory"""
+        command = self.command_entry.get().strip()
+        if not command:
+            self.command_status_label.config(text="Vui lòng nhập command")
+        elif self.client is None:
+            self.command_status_label.config(text="Chưa kết nối app")
+        elif self.client.send_command(COMMAND_RAW, command):
             self.command_status_label.config(text=f"Đã gửi: {command}")
-        except Exception as e:
-            print(f"Error sending command: {e}")
+        else:
             self.command_status_label.config(text="Lỗi gửi command")
             
+    def connect_bridge(self):
+        """Mở shared memory của app, None nếu app chưa chạy"""
+        try:
+            self.client = MonitorClient(self.shm_name, self.slot)
+        except (OSError, ValueError) as e:
+            self.client = None
+            self.bridge_status_label.config(text=f"📡 Chưa kết nối app ({e})")
+            
+    def poll_bridge(self):
+        """Đọc các record mới từ ring và cập nhật metric của thiết bị đang chọn"""
+        delay = self.config.monitor_refresh_ms
+        if self.client is None:
+            self.connect_bridge()
+            if self.client is None:
+                delay = 1000  # Thử lại mỗi giây đến khi app chạy
+        
+        if self.client is not None:
+            records = self.client.read()
+            active_ip = self.client.active_ip
+            # Chỉ cần record touch mới nhất của thiết bị đang chọn
+            for record in reversed(records):
+                if record.kind == KIND_TOUCH and (record.ip == active_ip or not any(active_ip)):
+                    self.update_metric('raw_touch', record.stt)
+                    self.update_metric('value', record.value)
+                    self.update_metric('threshold', record.threshold)
+                    break
+            self.update_bridge_status(len(records), active_ip)
+        
+        self.root.after(delay, self.poll_bridge)
+            
+    def update_bridge_status(self, count, active_ip):
+        """Tốc độ record nhận được, cập nhật mỗi giây"""
+        self._rate_count += count
+        now = time.monotonic()
+        if now - self._rate_started < 1.0:
+            return
+        self._rate = self._rate_count / (now - self._rate_started)
+        self._rate_started = now
+        self._rate_count = 0
+        self.bridge_status_label.config(
+            text=f"📡 {socket.inet_ntoa(active_ip)} · {self._rate:.0f} records/s · "
+                 f"lost {self.client.records_lost}")
+            
+    def on_closing(self):
+        """Đóng shared memory trước khi đóng cửa sổ"""
+        if self.client is not None:
+            self.client.close()
+            self.client = None
+        self.root.destroy()
+            
     def create_modern_button(self, parent, text, command, bg_color="#3498db", hover_color=None, width=140, height=32):
         """Tạo button hiện đại với hiệu ứng hover"""
         if hover_color is None:
@@ -319,14 +395,20 @@ class MonitorWindow:
         return button
             
     def update_metric(self, key, value):
-        """Cập nhật giá trị metric"""
-        if key in self.metric_labels:
-            self.metric_labels[key].config(text=str(value))
+        """Cập nhật giá trị metric (bỏ qua nếu không đổi)"""
+        label = self.metric_labels.get(key)
+        if label is not None and label.cget('text') != str(value):
+            label.config(text=str(value))
             
     def run(self):
         """Chạy monitor window"""
         self.root.mainloop()
 
 if __name__ == "__main__":
-    monitor = MonitorWindow()
+    parser = argparse.ArgumentParser(description="Cube Touch Monitor - live data window")
+    parser.add_argument("--shm", help="shared memory name of the running app")
+    parser.add_argument("--slot", type=int, default=0, help="command slot of this window")
+    args = parser.parse_args()
+    
+    monitor = MonitorWindow(args.shm, args.slot)
     monitor.run()
\ No newline at end of file
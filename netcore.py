@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Asyncio network core for Cube Touch Monitor
+Một event loop trong một thread nền cho telemetry, heartbeat, timeout và gửi lệnh
+"""
+
+import asyncio
+import socket
+import threading
+from typing import Dict, Optional
+from ingest import configure_receive_socket
+from applog import get_logger
+
+log = get_logger('netcore')
+
+class _TelemetryProtocol(asyncio.DatagramProtocol):
+    """Nhận telemetry trên một port"""
+    
+    def __init__(self, ingest_server, port: int):
+        self.ingest_server = ingest_server
+        self.port = port
+    
+    def datagram_received(self, data, addr):
+        try:
+            self.ingest_server.handle_datagram(data, addr, self.port)
+        except Exception as e:
+            self.ingest_server.comm_handler.add_log(f"Error handling datagram from {addr[0]}: {str(e)}")
+    
+    def error_received(self, exc):
+        # Windows báo ConnectionResetError khi ICMP port unreachable
+        self.ingest_server.comm_handler.add_log(f"Error receiving UDP data: {str(exc)}")
+
+class _HeartbeatProtocol(asyncio.DatagramProtocol):
+    """Nhận heartbeat từ các ESP32"""
+    
+    def __init__(self, heartbeat_manager):
+        self.heartbeat_manager = heartbeat_manager
+    
+    def datagram_received(self, data, addr):
+        try:
+            self.heartbeat_manager.handle_datagram(data, addr)
+        except Exception as e:
+            log.error("Error in heartbeat listener: %s", e)
+
+class AsyncNetworkCore:
+    """Chạy toàn bộ I/O mạng trên một asyncio event loop"""
+    
+    def __init__(self, comm_handler, heartbeat_manager, ingest_server, config):
+        self.comm_handler = comm_handler
+        self.heartbeat_manager = heartbeat_manager
+        self.ingest_server = ingest_server
+        self.config = config
+        
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.is_running = False
+        self.core_thread = None
+        
+        self._transports: Dict[int, asyncio.DatagramTransport] = {}
+        self._heartbeat_transport = None
+        self._tasks = []
+        self._command_event = None
+        self._expiry_event = None
+        self._started = threading.Event()
+    
+    def start(self):
+        """Bắt đầu event loop trong thread nền"""
+        if self.is_running:
+            return
+        
+        self.is_running = True
+        self._started.clear()
+        self.core_thread = threading.Thread(target=self._run_loop, daemon=True)
+        self.core_thread.start()
+        self._started.wait(timeout=5.0)
+    
+    def stop(self):
+        """Dừng event loop ngay, không phải chờ socket timeout"""
+        if not self.is_running:
+            return
+        
+        self.is_running = False
+        self.ingest_server.on_port_added = None
+        self.ingest_server.external_sockets = False
+        self.comm_handler.command_queue.stop()
+        self.heartbeat_manager.stop()
+        
+        if self.loop:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        if self.core_thread:
+            self.core_thread.join(timeout=1.0)
+            self.core_thread = None
+        self.comm_handler.add_log("Asyncio network core stopped")
+    
+    def open_telemetry_port(self, port: int):
+        """Mở port telemetry (thread-safe)"""
+        if self.loop and self.is_running:
+            asyncio.run_coroutine_threadsafe(self._open_telemetry_port(port), self.loop)
+    
+    def _run_loop(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self._setup())
+            self._started.set()
+            self.loop.run_forever()
+        except Exception as e:
+            self.comm_handler.add_log(f"✗ Error in asyncio network core: {str(e)}")
+        finally:
+            self._started.set()
+            self._cleanup()
+            self.loop.close()
+            self.loop = None
+    
+    async def _setup(self):
+        """Mở các endpoint và tạo các task"""
+        loop = asyncio.get_running_loop()
+        
+        # Heartbeat listener (HeartbeatManager chỉ còn thread ping)
+        self._expiry_event = asyncio.Event()
+        self.heartbeat_manager.start(listen=False,
+                                     expiry_waker=lambda: loop.call_soon_threadsafe(self._expiry_event.set))
+        try:
+            sock = self._bind_udp(self.heartbeat_manager.listen_port)
+            self._heartbeat_transport, _ = await loop.create_datagram_endpoint(
+                lambda: _HeartbeatProtocol(self.heartbeat_manager), sock=sock)
+            log.info("Listening for heartbeats on port %d", self.heartbeat_manager.listen_port)
+        except OSError as e:
+            log.error("Error starting heartbeat listener: %s", e)
+        
+        # Telemetry: các port hiện có và port mới từ ingest server
+        # (asyncio không trả ancillary data nên không đọc được bộ đếm drop SO_RXQ_OVFL)
+        self.ingest_server.external_sockets = True
+        log.info("Kernel drop counter and burst statistics are unavailable with the asyncio core")
+        for port in self.ingest_server.get_ports():
+            await self._open_telemetry_port(port)
+        self.ingest_server.on_port_added = self.open_telemetry_port
+        
+        # Gửi lệnh: hàng đợi được xả bởi task thay cho thread
+        self._command_event = asyncio.Event()
+        self.comm_handler.command_queue.start_external(
+            lambda: loop.call_soon_threadsafe(self._command_event.set))
+        
+        self._tasks = [
+            loop.create_task(self._timeout_checker()),
+            loop.create_task(self._command_sender())
+        ]
+        self.comm_handler.add_log("✓ Asyncio network core started")
+    
+    def _bind_udp(self, port: int, rcvbuf: Optional[int] = None) -> socket.socket:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if rcvbuf:
+            configure_receive_socket(sock, rcvbuf)
+        try:
+            sock.bind(("0.0.0.0", port))
+        except OSError:
+            sock.close()
+            raise
+        sock.setblocking(False)
+        return sock
+    
+    async def _open_telemetry_port(self, port: int):
+        if port in self._transports:
+            return
+        
+        try:
+            sock = self._bind_udp(port, self.config.udp_rcvbuf)
+            transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+                lambda: _TelemetryProtocol(self.ingest_server, port), sock=sock)
+        except OSError as e:
+            self.comm_handler.add_log(f"✗ Error binding UDP port {port}: {str(e)}")
+            self.ingest_server.discard_port(port)
+            return
+        
+        self._transports[port] = transport
+        self.comm_handler.add_log(f"✓ UDP ingest listening on port {port}")
+    
+    async def _timeout_checker(self):
+        """Task đánh dấu offline đúng lúc hết hạn heartbeat"""
+        while True:
+            try:
+                await asyncio.wait_for(self._expiry_event.wait(), self.heartbeat_manager.next_timeout())
+            except asyncio.TimeoutError:
+                pass
+            self._expiry_event.clear()
+            try:
+                self.heartbeat_manager.check_timeouts()
+            except Exception as e:
+                log.error("Error in timeout checker: %s", e)
+    
+    async def _command_sender(self):
+        """Task xả hàng đợi lệnh"""
+        queue = self.comm_handler.command_queue
+        while True:
+            item, wait = queue.take_ready()
+            if item is None:
+                self._command_event.clear()
+                # Kiểm tra lại sau khi clear để không bỏ lỡ lệnh vừa đến
+                item, wait = queue.take_ready()
+            
+            if item is not None:
+                queue.dispatch(item)
+                continue
+            
+            try:
+                await asyncio.wait_for(self._command_event.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+    
+    def _cleanup(self):
+        for task in self._tasks:
+            task.cancel()
+        if self._tasks:
+            self.loop.run_until_complete(asyncio.gather(*self._tasks, return_exceptions=True))
+        self._tasks = []
+        
+        for transport in self._transports.values():
+            transport.close()
+        self._transports.clear()
+        
+        if self._heartbeat_transport:
+            self._heartbeat_transport.close()
+            self._heartbeat_transport = None
+    
+    def get_statistics(self) -> dict:
+        """Lấy thống kê network core"""
+        return {
+            'core': 'asyncio',
+            'is_running': self.is_running,
+            'telemetry_ports': sorted(self._transports)
+        }
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Realtime plotting module for Cube Touch Monitor
+Ring buffer NumPy cấp phát sẵn và đồ thị matplotlib dùng blitting
+"""
+
+import time
+import tkinter as tk
+import numpy as np
+
+class SampleRing:
+    """Ring buffer NumPy kích thước cố định, ghi O(1) mỗi mẫu"""
+    
+    def __init__(self, capacity: int, dtype=np.float32):
+        self.capacity = capacity
+        self.buffer = np.zeros(capacity, dtype=dtype)
+        self.head = 0  # Vị trí ghi kế tiếp
+        self.count = 0
+        self.total = 0  # Tổng số mẫu đã ghi (để biết có dữ liệu mới)
+    
+    def extend(self, values):
+        """Ghi một lô mẫu vào ring"""
+        values = np.asarray(values, dtype=self.buffer.dtype)
+        n = len(values)
+        if n == 0:
+            return
+        if n >= self.capacity:
+            values = values[-self.capacity:]
+            n = self.capacity
+        
+        end = self.head + n
+        if end <= self.capacity:
+            self.buffer[self.head:end] = values
+        else:
+            split = self.capacity - self.head
+            self.buffer[self.head:] = values[:split]
+            self.buffer[:n - split] = values[split:]
+        
+        self.head = end % self.capacity
+        self.count = min(self.capacity, self.count + n)
+        self.total += n
+    
+    def latest(self):
+        """Mẫu mới nhất (None nếu rỗng)"""
+        if self.count == 0:
+            return None
+        return self.buffer[self.head - 1].item()
+    
+    def ordered(self, n: int = None) -> np.ndarray:
+        """n mẫu mới nhất theo thứ tự thời gian"""
+        n = self.count if n is None else min(n, self.count)
+        start = self.head - n
+        if start >= 0:
+            return self.buffer[start:self.head]
+        return np.concatenate((self.buffer[start:], self.buffer[:self.head]))
+    
+    def __len__(self):
+        return self.count
+
+def minmax_decimate(y: np.ndarray, columns: int):
+    """Giảm mẫu thành cặp min/max cho mỗi cột pixel, giữ nguyên đỉnh nhọn"""
+    n = len(y)
+    bucket = -(-n // columns)  # ceil
+    if bucket <= 2:
+        return np.arange(n), y
+    
+    usable = (n // bucket) * bucket
+    blocks = y[n - usable:].reshape(-1, bucket)
+    envelope = np.empty(blocks.shape[0] * 2, dtype=y.dtype)
+    envelope[0::2] = blocks.min(axis=1)
+    envelope[1::2] = blocks.max(axis=1)
+    x = np.repeat(np.arange(n - usable, n, bucket) + bucket / 2, 2)
+    return x, envelope
+
+class RealtimePlot:
+    """Đồ thị realtime: chỉ vẽ lại line artist bằng blitting, giới hạn theo frame rate"""
+    
+    def __init__(self, parent, ring: SampleRing, window: int, ylim=(0, 4095),
+                 max_fps: float = 30, xlabel='Time (samples)', ylabel='IR ADC Value'):
+        self.ring = ring
+        self.window = min(window, ring.capacity)
+        self.xlabel = xlabel
+        # Chế độ lịch sử: source(t0, t1, columns) trả về envelope từ pyramid của time-series store
+        self.history_source = None
+        self.history_window = None
+        # Hơi ngắn hơn chu kỳ của display pump để tick đến sớm vài ms (after() làm tròn ms) không bị bỏ
+        self.min_interval = 0.9 / max_fps
+        self._last_draw = 0.0
+        self._drawn_total = -1
+        self._background = None
+        
+        # Import matplotlib khi tạo đồ thị đầu tiên (lần đầu mở MONITOR), không làm chậm lúc khởi động
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from matplotlib.figure import Figure
+        
+        self.fig = Figure(figsize=(6, 3), dpi=80, facecolor='white')
+        self.ax = self.fig.add_subplot(111)
+        self.ax.set_ylim(*ylim)
+        self.ax.set_xlim(0, self.window)
+        self.ax.set_xlabel(xlabel, fontsize=8)
+        self.ax.set_ylabel(ylabel, fontsize=8)
+        self.ax.grid(True, alpha=0.3)
+        self.ax.tick_params(labelsize=7)
+        
+        # Line animated: không vẽ trong lần draw đầy đủ, chỉ vẽ khi blit
+        self.line, = self.ax.plot([], [], 'b-', linewidth=2, animated=True)
+        self.fig.tight_layout()
+        
+        self.canvas = FigureCanvasTkAgg(self.fig, parent)
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+        self.canvas.draw()
+    
+    def get_tk_widget(self):
+        return self.canvas.get_tk_widget()
+    
+    def set_history(self, source, window_seconds: float):
+        """Vẽ `window_seconds` giây gần nhất từ lịch sử thay vì ring buffer"""
+        self.history_source = source
+        self.history_window = window_seconds
+        self.ax.set_xlim(-window_seconds, 0)
+        self.ax.set_xlabel('Time (s)', fontsize=8)
+        self.canvas.draw()  # Trục đổi nên vẽ lại đầy đủ (nền mới)
+    
+    def set_live(self):
+        """Quay lại vẽ ring buffer realtime"""
+        self.history_source = None
+        self.history_window = None
+        self.ax.set_xlim(0, self.window)
+        self.ax.set_xlabel(self.xlabel, fontsize=8)
+        self.canvas.draw()
+    
+    def _on_draw(self, event):
+        """Lưu nền (trục, lưới) sau mỗi lần vẽ đầy đủ (resize, lần đầu)"""
+        self._background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self._draw_line()
+    
+    def redraw(self, force: bool = False):
+        """Vẽ lại line nếu có dữ liệu mới, tối đa max_fps lần mỗi giây
+
+        Lần gọi bị bỏ qua vì giới hạn fps không tự hẹn giờ: người gọi (display pump của GUI)
+        gọi lại mỗi tick nên mẫu chưa vẽ được vẽ ở tick kế tiếp. Ở chế độ lịch sử đồ thị
+        được vẽ lại theo thời gian (một cột pixel mỗi lần) thay vì theo mẫu mới.
+        """
+        now = time.monotonic()
+        if not force:
+            if self.history_source is not None:
+                # Trục x là giây tính từ hiện tại nên trôi cả khi thiết bị ngừng gửi:
+                # vẽ lại mỗi khi thời gian trôi được một cột pixel, không phụ thuộc ring buffer
+                interval = max(self.min_interval, self.history_window / max(1.0, self.ax.bbox.width))
+                if now - self._last_draw < interval:
+                    return
+            elif self.ring.total == self._drawn_total or now - self._last_draw < self.min_interval:
+                return
+        self._last_draw = now
+        
+        if self._background is None:
+            self.canvas.draw()
+            return
+        
+        try:
+            self.canvas.restore_region(self._background)
+            self._draw_line()
+            self.canvas.blit(self.ax.bbox)
+        except tk.TclError:
+            pass  # Widget destroyed
+    
+    def _draw_line(self):
+        columns = max(1, int(self.ax.bbox.width))
+        if self.history_source is not None:
+            x, y = self._history_data(columns)
+        else:
+            x, y = minmax_decimate(self.ring.ordered(self.window), columns)
+        self.line.set_data(x, y)
+        self.ax.draw_artist(self.line)
+        self._drawn_total = self.ring.total
+    
+    def _history_data(self, columns: int):
+        """Một cặp min/max mỗi cột pixel, x là giây tính từ hiện tại"""
+        now = time.time()
+        envelope = self.history_source(now - self.history_window, now, columns)
+        if envelope is None or len(envelope['t']) == 0:
+            return [], []
+        x = np.repeat(envelope['t'] - now, 2)
+        y = np.empty(len(x))
+        y[0::2] = envelope['min']
+        y[1::2] = envelope['max']
+        return x, y
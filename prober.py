@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Prober module for Cube Touch Monitor
+Đo RTT tới nhiều ESP32 song song: ICMP echo trong process, dự phòng chạy lệnh ping song song
+"""
+
+import os
+import platform
+import re
+import select
+import socket
+import struct
+import subprocess
+import time
+from typing import Dict, Iterable
+from applog import get_logger
+
+log = get_logger('prober')
+
+_IS_WINDOWS = platform.system().lower() == "windows"
+
+# Output của lệnh ping: Windows "time=12ms" / "time<1ms", Linux/Mac "time=12.3 ms"
+_PING_TIME = re.compile(r'time[=<](\d+\.?\d*) ?ms')
+
+_ICMP_ECHO_REQUEST = 8
+_ICMP_ECHO_REPLY = 0
+_ICMP_HEADER = struct.Struct('!BBHHH')
+
+def _checksum(data: bytes) -> int:
+    if len(data) % 2:
+        data += b'\0'
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    total = (total >> 16) + (total & 0xffff)
+    total += total >> 16
+    return ~total & 0xffff
+
+class Prober:
+    """Ping nhiều IP cùng lúc, một vòng mất tối đa khoảng `timeout` giây"""
+
+    def __init__(self, timeout: float = 2.0):
+        self.timeout = timeout
+        self._identifier = os.getpid() & 0xffff
+        self._sequence = 0
+        self.sock, self.mode = self._open_icmp_socket()
+        log.info("Ping mode: %s", self.mode)
+
+    @staticmethod
+    def _open_icmp_socket():
+        """ICMP datagram (không cần quyền admin nếu OS cho phép), rồi raw, cuối cùng là lệnh ping"""
+        for kind, mode in ((socket.SOCK_DGRAM, 'icmp'), (socket.SOCK_RAW, 'icmp-raw')):
+            try:
+                sock = socket.socket(socket.AF_INET, kind, socket.IPPROTO_ICMP)
+                sock.setblocking(False)
+                return sock, mode
+            except (OSError, AttributeError):
+                continue
+        return None, 'subprocess'
+
+    def probe_all(self, ips: Iterable[str]) -> Dict[str, float]:
+        """RTT (ms) của mỗi IP, -1 nếu timeout hoặc lỗi"""
+        ips = list(dict.fromkeys(ips))
+        if not ips:
+            return {}
+        if self.sock is not None:
+            try:
+                return self._probe_icmp(ips)
+            except OSError as e:
+                log.warning("ICMP probe failed, falling back to ping command: %s", e)
+                self.close()
+                self.mode = 'subprocess'
+        return self._probe_subprocess(ips)
+
+    def _probe_icmp(self, ips) -> Dict[str, float]:
+        """Gửi echo request tới tất cả rồi chờ các reply trong một cửa sổ timeout"""
+        results = {ip: -1.0 for ip in ips}
+        pending = {}  # (ip, sequence) -> thời điểm gửi
+
+        for ip in ips:
+            self._sequence = (self._sequence + 1) & 0xffff
+            header = _ICMP_HEADER.pack(_ICMP_ECHO_REQUEST, 0, 0, self._identifier, self._sequence)
+            payload = b'cube-probe'
+            packet = _ICMP_HEADER.pack(_ICMP_ECHO_REQUEST, 0, _checksum(header + payload),
+                                       self._identifier, self._sequence) + payload
+            try:
+                self.sock.sendto(packet, (ip, 0))
+                pending[(ip, self._sequence)] = time.perf_counter()
+            except OSError as e:
+                log.debug("Error sending ping to %s: %s", ip, e)
+
+        deadline = time.perf_counter() + self.timeout
+        while pending:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            readable, _, _ = select.select([self.sock], [], [], remaining)
+            if not readable:
+                break
+            while True:
+                try:
+                    data, addr = self.sock.recvfrom(2048)
+                except (BlockingIOError, InterruptedError):
+                    break
+                received = time.perf_counter()
+
+                # Raw socket (và datagram trên macOS) trả về cả IP header
+                if data and data[0] >> 4 == 4 and len(data) >= 20 + _ICMP_HEADER.size:
+                    data = data[(data[0] & 0x0f) * 4:]
+                if len(data) < _ICMP_HEADER.size:
+                    continue
+                icmp_type, _, _, identifier, sequence = _ICMP_HEADER.unpack_from(data)
+                if icmp_type != _ICMP_ECHO_REPLY:
+                    continue
+                # Socket datagram: kernel tự đặt identifier nên chỉ so khớp với raw
+                if self.mode == 'icmp-raw' and identifier != self._identifier:
+                    continue
+                sent = pending.pop((addr[0], sequence), None)
+                if sent is not None:
+                    results[addr[0]] = (received - sent) * 1000
+        return results
+
+    def _probe_subprocess(self, ips) -> Dict[str, float]:
+        """Chạy lệnh ping cho tất cả IP cùng lúc thay vì lần lượt"""
+        wait_ms = max(1, int(self.timeout * 1000))
+        processes = {}
+        for ip in ips:
+            if _IS_WINDOWS:
+                cmd = ["ping", "-n", "1", "-w", str(wait_ms), ip]
+            else:
+                cmd = ["ping", "-c", "1", "-W", str(max(1, round(self.timeout))), ip]
+            try:
+                processes[ip] = (time.perf_counter(),
+                                 subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                                  text=True))
+            except OSError as e:
+                log.error("Error pinging %s: %s", ip, e)
+
+        results = {ip: -1.0 for ip in ips}
+        deadline = time.perf_counter() + self.timeout + 2
+        for ip, (started, process) in processes.items():
+            try:
+                output, _ = process.communicate(timeout=max(0.1, deadline - time.perf_counter()))
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.communicate()
+                continue
+            if process.returncode != 0:
+                continue
+            match = _PING_TIME.search(output)
+            # "time<1ms" trên Windows -> 0.5ms; không đọc được thì dùng thời gian chạy lệnh
+            if match:
+                results[ip] = 0.5 if '<' in match.group(0) else float(match.group(1))
+            else:
+                results[ip] = (time.perf_counter() - started) * 1000
+        return results
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
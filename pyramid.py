@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Downsampling pyramid module for Cube Touch Monitor
+Các mức gom min/max/mean cập nhật dần khi có mẫu mới, đọc đúng số điểm bằng số pixel ở mọi mức zoom
+"""
+
+from typing import Dict, Optional
+import numpy as np
+
+class _Level:
+    """Một mức của pyramid: mỗi bucket gom `size` mẫu liên tiếp"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.offset = 0  # Chỉ số (toàn cục) của bucket đầu tiên còn giữ
+        self.n = 0
+        self.t0 = np.empty(64, dtype=np.float64)  # Thời điểm mẫu đầu của bucket
+        self.mn = np.empty(64, dtype=np.float32)
+        self.mx = np.empty(64, dtype=np.float32)
+        self.sm = np.empty(64, dtype=np.float64)
+
+    @property
+    def end(self) -> int:
+        """Chỉ số bucket kế tiếp (số bucket đầy đủ đã gom)"""
+        return self.offset + self.n
+
+    def append(self, t0, mn, mx, sm):
+        k = len(t0)
+        if self.n + k > len(self.t0):
+            capacity = max(2 * len(self.t0), self.n + k)
+            for name in ('t0', 'mn', 'mx', 'sm'):
+                grown = np.empty(capacity, dtype=getattr(self, name).dtype)
+                grown[:self.n] = getattr(self, name)[:self.n]
+                setattr(self, name, grown)
+        end = self.n + k
+        self.t0[self.n:end] = t0
+        self.mn[self.n:end] = mn
+        self.mx[self.n:end] = mx
+        self.sm[self.n:end] = sm
+        self.n = end
+
+    def view(self, j0: int, j1: int):
+        """Các bucket [j0, j1) theo chỉ số toàn cục (cắt theo phần còn giữ)"""
+        a = max(j0, self.offset) - self.offset
+        b = max(a, min(j1, self.end) - self.offset)
+        return self.t0[a:b], self.mn[a:b], self.mx[a:b], self.sm[a:b], a + self.offset
+
+    def trim(self, first_bucket: int):
+        """Bỏ các bucket trước first_bucket"""
+        drop = first_bucket - self.offset
+        if drop <= 0:
+            return
+        if drop >= self.n:
+            self.offset = first_bucket
+            self.n = 0
+            return
+        keep = self.n - drop
+        for name in ('t0', 'mn', 'mx', 'sm'):
+            column = getattr(self, name)
+            column[:keep] = column[drop:self.n]
+        self.offset += drop
+        self.n = keep
+
+class Pyramid:
+    """Pyramid min/max/mean theo chỉ số mẫu: mức 0 gom `base` mẫu, mỗi mức sau gom `factor` bucket"""
+
+    def __init__(self, base: int = 16, factor: int = 4, levels: int = 10):
+        self.base = base
+        self.factor = factor
+        self.levels = [_Level(base * factor ** i) for i in range(levels)]
+        self.count = 0  # Tổng số mẫu đã nhận (chỉ số toàn cục của mẫu kế tiếp)
+        # Mẫu thô chưa đủ một bucket mức 0
+        self._carry_t = np.empty(0, dtype=np.float64)
+        self._carry_y = np.empty(0, dtype=np.float64)
+
+    def extend(self, t: np.ndarray, y: np.ndarray):
+        """Thêm một lô mẫu, gom dần lên các mức (chi phí khấu hao O(số mẫu))"""
+        if len(t) == 0:
+            return
+        self.count += len(t)
+        t = np.concatenate((self._carry_t, t))
+        y = np.concatenate((self._carry_y, np.asarray(y, dtype=np.float64)))
+
+        full = (len(y) // self.base) * self.base
+        if full:
+            blocks = y[:full].reshape(-1, self.base)
+            self.levels[0].append(t[:full:self.base], blocks.min(axis=1), blocks.max(axis=1),
+                                  blocks.sum(axis=1))
+        self._carry_t = t[full:]
+        self._carry_y = y[full:]
+
+        # Mức i+1 gom các bucket đầy đủ mới của mức i
+        f = self.factor
+        for lower, upper in zip(self.levels, self.levels[1:]):
+            start = upper.end * f
+            if start < lower.offset:
+                # Mức dưới đã bị cắt qua vị trí này (sau trim), bắt đầu lại ở bucket căn hàng kế tiếp
+                upper.offset = -(-lower.offset // f)
+                start = upper.end * f
+            ready = ((lower.end - start) // f) * f
+            if ready <= 0:
+                break
+            t0, mn, mx, sm, _ = lower.view(start, start + ready)
+            upper.append(t0[::f], mn.reshape(-1, f).min(axis=1), mx.reshape(-1, f).max(axis=1),
+                         sm.reshape(-1, f).sum(axis=1))
+
+    def trim(self, first_index: int):
+        """Bỏ các bucket nằm hoàn toàn trước mẫu first_index (khi xóa segment cũ)"""
+        for level in self.levels:
+            level.trim(first_index // level.size)
+
+    def envelope(self, lo: int, hi: int, columns: int) -> Optional[Dict[str, np.ndarray]]:
+        """Min/max/mean của các mẫu [lo, hi) gom thành tối đa `columns` điểm
+
+        Trả về None khi mỗi cột ít hơn `base` mẫu (đọc dữ liệu thô sẽ rẻ hơn).
+        Số bucket đọc không quá factor * columns, không phụ thuộc độ dài khoảng.
+        """
+        n = hi - lo
+        if n <= 0 or n < self.base * columns:
+            return None
+
+        # Mức thô nhất mà mỗi cột vẫn có ít nhất một bucket
+        per_column = n / columns
+        level_index = 0
+        while (level_index + 1 < len(self.levels) and
+               self.levels[level_index + 1].size <= per_column and
+               self.levels[level_index + 1].n):
+            level_index += 1
+
+        pieces = []
+        covered = lo
+        for level in reversed(self.levels[:level_index + 1]):
+            j0 = covered // level.size
+            t0, mn, mx, sm, first = level.view(j0, -(-hi // level.size))
+            if len(t0):
+                starts = (np.arange(len(t0)) + first) * level.size
+                pieces.append((starts, t0, mn, mx, sm, np.full(len(t0), level.size)))
+                covered = max(covered, (first + len(t0)) * level.size)
+
+        # Phần cuối chưa đủ một bucket mức 0
+        if covered < hi and len(self._carry_t):
+            carry_start = self.count - len(self._carry_t)
+            a = max(0, covered - carry_start)
+            b = max(a, min(len(self._carry_t), hi - carry_start))
+            y = self._carry_y[a:b]
+            pieces.append((np.arange(a, b) + carry_start, self._carry_t[a:b], y, y, y, np.ones(b - a)))
+
+        if not pieces:
+            return None
+        starts, t0, mn, mx, sm, counts = (np.concatenate(column) for column in zip(*pieces))
+        return reduce_columns(starts, t0, mn, mx, sm, counts, lo, n, columns)
+
+def reduce_columns(starts, t0, mn, mx, sm, counts, lo: int, n: int, columns: int) -> Dict[str, np.ndarray]:
+    """Gom các bucket (đã sắp theo chỉ số mẫu) vào các cột pixel"""
+    column = np.clip((starts - lo) * columns // n, 0, columns - 1)
+    edges = np.flatnonzero(np.diff(column, prepend=-1))
+    total = np.add.reduceat(counts, edges)
+    return {
+        't': t0[edges],
+        'min': np.minimum.reduceat(mn, edges),
+        'max': np.maximum.reduceat(mx, edges),
+        'mean': np.add.reduceat(sm, edges) / total
+    }
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Shared-memory bridge module for Cube Touch Monitor
+Ring telemetry record kích thước cố định trong multiprocessing.shared_memory cho các process monitor.py,
+cùng một kênh lệnh nhỏ theo chiều ngược lại
+"""
+
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import Callable, Dict, List, NamedTuple, Optional
+from telemetry import INT32_MAX, INT32_MIN, AdcFrame, TouchFrame
+from applog import get_logger
+
+log = get_logger('shmbridge')
+
+# Header: magic, version, kích thước record, dung lượng ring, số slot lệnh, write_seq, IP đang chọn, PID app
+# write_seq (số record đã ghi, cộng dồn) nằm ở offset 16 nên căn hàng 8 byte
+_HEADER = struct.Struct('<4sHHIIQ4sI')
+_MAGIC = b'CTSM'
+_VERSION = 2
+_SEQ = struct.Struct('<Q')
+_WRITE_SEQ_OFFSET = 16
+_ACTIVE_IP = struct.Struct('<4s')
+_ACTIVE_IP_OFFSET = 24
+
+# Record: thời gian (epoch), IPv4 dạng 4 byte, loại, value, threshold, stt
+_RECORD = struct.Struct('<d4sB3xiii4x')
+KIND_TOUCH = 1
+KIND_ADC = 2
+
+# Mỗi slot lệnh là một ring SPSC: monitor ghi write_seq, app ghi read_seq
+_SLOT_HEADER = struct.Struct('<QQ')
+_COMMAND = struct.Struct('<BB126s')
+COMMAND_SLOTS = 16  # Số lệnh chờ tối đa mỗi slot
+COMMAND_THRESHOLD = 1
+COMMAND_RAW = 2
+
+class TelemetryRecord(NamedTuple):
+    """Một record đọc từ ring (ip là IPv4 4 byte, so sánh với MonitorClient.active_ip)"""
+    time: float
+    ip: bytes
+    kind: int
+    value: int
+    threshold: int
+    stt: int
+
+def _layout(capacity: int, client_slots: int):
+    """(offset vùng lệnh, kích thước mỗi slot, offset vùng record, tổng kích thước)"""
+    slot_size = _SLOT_HEADER.size + COMMAND_SLOTS * _COMMAND.size
+    commands_offset = _HEADER.size
+    records_offset = commands_offset + client_slots * slot_size
+    return commands_offset, slot_size, records_offset, records_offset + capacity * _RECORD.size
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Mở segment có sẵn mà không để resource tracker của process này xóa nó khi thoát"""
+    shm = shared_memory.SharedMemory(name=name)
+    if sys.version_info < (3, 13) and sys.platform != 'win32':
+        # Python < 3.13 đăng ký cả segment chỉ attach, và unlink nó khi process monitor thoát
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm
+
+def _process_alive(pid: int) -> bool:
+    if sys.platform == 'win32':
+        return True  # Windows giải phóng segment khi process cuối cùng đóng nó: còn tồn tại là còn chủ
+    if pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+class MonitorBridge:
+    """Phía app: ghi telemetry vào ring (thread ingest) và nhận lệnh từ các cửa sổ monitor"""
+
+    def __init__(self, config):
+        self.config = config
+        self.name = config.monitor_shm_name
+        self.capacity = config.monitor_ring_records
+        self.client_slots = config.monitor_clients
+
+        # Callback khi monitor gửi lệnh: on_command(kind, text)
+        self.on_command: Optional[Callable] = None
+
+        self._shm = None
+        self._buf = None
+        self._commands_offset, self._slot_size, self._records_offset, self._size = \
+            _layout(self.capacity, self.client_slots)
+        self._write_seq = 0
+        self._ip_cache: Dict[str, bytes] = {}
+        self._active_ip = config.esp_ip
+
+        self.is_running = False
+        self.command_thread = None
+        self._stop_event = threading.Event()
+
+        # Thống kê
+        self.commands_received = 0
+        self.records_rejected = 0  # Giá trị ngoài int32 của record
+
+    def start(self):
+        """Tạo segment shared memory và thread đọc lệnh"""
+        if self.is_running:
+            return
+        try:
+            try:
+                self._shm = shared_memory.SharedMemory(name=self.name, create=True, size=self._size)
+            except FileExistsError:
+                owner = self._segment_owner()
+                if owner is not None and _process_alive(owner):
+                    log.error("Monitor bridge disabled, shared memory '%s' is used by process %d "
+                              "(set monitor_shm_name to run a second instance)", self.name, owner)
+                    return
+                # Segment còn lại sau lần chạy bị kill (Linux giữ trong /dev/shm). Resource tracker của
+                # process đó có thể xóa nó bất cứ lúc nào: không còn nữa nghĩa là đã được dọn
+                try:
+                    stale = _attach(self.name)
+                    stale.close()
+                    stale.unlink()
+                except FileNotFoundError:
+                    pass
+                self._shm = shared_memory.SharedMemory(name=self.name, create=True, size=self._size)
+        except OSError as e:
+            log.error("Monitor bridge disabled, cannot create shared memory '%s': %s", self.name, e)
+            return
+        self._buf = self._shm.buf
+        self._buf[:self._records_offset] = bytes(self._records_offset)
+        _HEADER.pack_into(self._buf, 0, _MAGIC, _VERSION, _RECORD.size, self.capacity,
+                          self.client_slots, 0, self._pack_ip(self._active_ip), os.getpid())
+
+        self.is_running = True
+        self._stop_event.clear()
+        self.command_thread = threading.Thread(target=self._command_loop, daemon=True)
+        self.command_thread.start()
+        log.info("Monitor bridge: shared memory '%s', %d records", self.name, self.capacity)
+
+    def stop(self):
+        """Dừng thread lệnh, đóng và xóa segment"""
+        if not self.is_running:
+            return
+        self.is_running = False
+        self._stop_event.set()
+        self.command_thread.join(timeout=1.0)
+        self._buf = None
+        self._shm.close()
+        self._shm.unlink()
+        self._shm = None
+
+    def _segment_owner(self) -> Optional[int]:
+        """PID của app đã tạo segment cùng tên (None nếu không đọc được header)"""
+        try:
+            shm = _attach(self.name)
+        except OSError:
+            return None
+        try:
+            if shm.size < _HEADER.size:
+                return None
+            magic, version, *_, pid = _HEADER.unpack_from(shm.buf, 0)
+            return pid if magic == _MAGIC and version == _VERSION else None
+        finally:
+            shm.close()
+
+    def publish(self, ip: str, frame):
+        """Ghi một frame đã giải mã vào ring (chỉ gọi từ thread ingest)"""
+        buf = self._buf
+        if buf is None:
+            return
+        if isinstance(frame, TouchFrame):
+            if None in frame:
+                return  # Thiết bị chưa gửi đủ Val/Thr/Stt lần nào
+            kind, value, threshold, stt = KIND_TOUCH, frame.value, frame.threshold, frame.stt
+        elif isinstance(frame, AdcFrame):
+            kind, value, threshold, stt = KIND_ADC, frame.value, 0, 0
+        else:
+            return
+        # Kiểm tra trước khi ghi: struct.error giữa chừng sẽ để lại record hỏng trong ring
+        if not (INT32_MIN <= value <= INT32_MAX and INT32_MIN <= threshold <= INT32_MAX
+                and INT32_MIN <= stt <= INT32_MAX):
+            self.records_rejected += 1
+            return
+
+        seq = self._write_seq
+        _RECORD.pack_into(buf, self._records_offset + (seq % self.capacity) * _RECORD.size,
+                          time.time(), self._pack_ip(ip), kind, value, threshold, stt)
+        # Tăng write_seq sau khi record đã ghi xong
+        self._write_seq = seq + 1
+        _SEQ.pack_into(buf, _WRITE_SEQ_OFFSET, seq + 1)
+
+    def set_active_ip(self, ip: str):
+        """Thiết bị đang chọn, monitor hiển thị thiết bị này"""
+        self._active_ip = ip
+        if self._buf is not None:
+            _ACTIVE_IP.pack_into(self._buf, _ACTIVE_IP_OFFSET, self._pack_ip(ip))
+
+    def _pack_ip(self, ip: str) -> bytes:
+        packed = self._ip_cache.get(ip)
+        if packed is None:
+            try:
+                packed = socket.inet_aton(ip)
+            except OSError:
+                packed = bytes(4)
+            self._ip_cache[ip] = packed
+        return packed
+
+    def _command_loop(self):
+        """Đọc lệnh mới từ các slot theo chu kỳ monitor_command_poll"""
+        while not self._stop_event.wait(self.config.monitor_command_poll):
+            for slot in range(self.client_slots):
+                try:
+                    self._drain_slot(slot)
+                except Exception as e:
+                    log.error("Error handling monitor command: %s", e)
+
+    def _drain_slot(self, slot: int):
+        base = self._commands_offset + slot * self._slot_size
+        write_seq, read_seq = _SLOT_HEADER.unpack_from(self._buf, base)
+        while read_seq < write_seq:
+            kind, length, payload = _COMMAND.unpack_from(
+                self._buf, base + _SLOT_HEADER.size + (read_seq % COMMAND_SLOTS) * _COMMAND.size)
+            read_seq += 1
+            _SEQ.pack_into(self._buf, base + 8, read_seq)
+            self.commands_received += 1
+            if self.on_command:
+                self.on_command(kind, payload[:length].decode('utf-8', 'replace'))
+
+    def get_statistics(self) -> dict:
+        """Thống kê bridge"""
+        return {
+            'monitor_records': self._write_seq,
+            'monitor_commands': self.commands_received,
+            'monitor_rejected': self.records_rejected
+        }
+
+class MonitorClient:
+    """Phía monitor.py: đọc record mới từ ring và gửi lệnh qua slot riêng"""
+
+    def __init__(self, name: str, slot: int = 0):
+        self._shm = _attach(name)
+        self._buf = self._shm.buf
+        magic, version, record_size, self.capacity, client_slots, write_seq, _, _ = \
+            _HEADER.unpack_from(self._buf, 0)
+        if magic != _MAGIC or version != _VERSION or record_size != _RECORD.size:
+            self.close()
+            raise ValueError(f"Not a monitor bridge segment: {name}")
+        if not 0 <= slot < client_slots:
+            self.close()
+            raise ValueError(f"Slot {slot} out of range (0-{client_slots - 1})")
+
+        self._commands_offset, slot_size, self._records_offset, _ = _layout(self.capacity, client_slots)
+        self._slot_base = self._commands_offset + slot * slot_size
+        self._read_seq = write_seq  # Chỉ đọc record mới từ lúc kết nối
+        self.records_read = 0
+        self.records_lost = 0  # Bị ghi đè trước khi kịp đọc
+
+    @property
+    def active_ip(self) -> bytes:
+        """IP (4 byte) của thiết bị đang chọn trong app"""
+        return _ACTIVE_IP.unpack_from(self._buf, _ACTIVE_IP_OFFSET)[0]
+
+    def read(self) -> List[TelemetryRecord]:
+        """Các record ghi thêm từ lần đọc trước"""
+        buf = self._buf
+        start = self._read_seq
+        end = _SEQ.unpack_from(buf, _WRITE_SEQ_OFFSET)[0]
+        if end - start > self.capacity:
+            self.records_lost += end - self.capacity - start
+            start = end - self.capacity
+        if end <= start:
+            return []
+
+        first = start % self.capacity
+        count = end - start
+        record_size = _RECORD.size
+        base = self._records_offset
+        if first + count <= self.capacity:
+            views = [buf[base + first * record_size:base + (first + count) * record_size]]
+        else:
+            views = [buf[base + first * record_size:base + self.capacity * record_size],
+                     buf[base:base + (first + count - self.capacity) * record_size]]
+        records = [TelemetryRecord._make(fields) for view in views for fields in _RECORD.iter_unpack(view)]
+        for view in views:
+            view.release()
+
+        # App có thể đã ghi đè đầu đoạn vừa đọc: record seq = write_seq mới đang được ghi (chưa tăng
+        # write_seq) nằm ở slot của seq - capacity, nên bỏ các record có seq <= write_seq mới - capacity
+        overwritten = _SEQ.unpack_from(buf, _WRITE_SEQ_OFFSET)[0] + 1 - self.capacity - start
+        if overwritten > 0:
+            overwritten = min(overwritten, len(records))
+            del records[:overwritten]
+            self.records_lost += overwritten
+        self._read_seq = end
+        self.records_read += len(records)
+        return records
+
+    def send_command(self, kind: int, text: str) -> bool:
+        """Gửi một lệnh cho app, False nếu slot đầy hoặc lệnh quá dài"""
+        payload = text.encode('utf-8')
+        if len(payload) > _COMMAND.size - 2:
+            return False
+        write_seq, read_seq = _SLOT_HEADER.unpack_from(self._buf, self._slot_base)
+        if write_seq - read_seq >= COMMAND_SLOTS:
+            return False
+        _COMMAND.pack_into(self._buf, self._slot_base + _SLOT_HEADER.size +
+                           (write_seq % COMMAND_SLOTS) * _COMMAND.size, kind, len(payload), payload)
+        _SEQ.pack_into(self._buf, self._slot_base, write_seq + 1)
+        return True
+
+    def close(self):
+        self._buf = None
+        self._shm.close()
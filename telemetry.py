@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Telemetry parser module for Cube Touch Monitor
+Giải mã datagram từ ESP32 một lần duy nhất thành bản ghi kiểu int
+"""
+
+import re
+from typing import NamedTuple, Optional, Union
+
+# Giá trị hợp lệ của mọi trường: int32 có dấu (kiểu cột của tsstore và record của shmbridge)
+INT32_MIN = -2 ** 31
+INT32_MAX = 2 ** 31 - 1
+
+# Đường nhanh, một lần match cho 2 format chuẩn:
+#   "Val:22046 Thr:21649 Stt:0" hoặc "Val: 21677 Thr: 21649 Stt: 0"
+#   "IR_ADC:2342"
+# Tối đa 9 chữ số nên luôn nằm trong int32; số dài hơn đi đường chậm để kiểm tra phạm vi
+_FRAME = re.compile(rb'\s*(?:Val:\s*(-?\d{1,9})\s*Thr:\s*(-?\d{1,9})\s*Stt:\s*(-?\d{1,9})(?!\d)'
+                    rb'|IR_ADC:\s*(-?\d{1,9})(?!\d))')
+_match_frame = _FRAME.match
+
+# Đường chậm: từng trường độc lập như parser cũ (thiếu trường, đổi thứ tự)
+_FIELD = re.compile(rb'(Val|Thr|Stt|IR_ADC):\s*(-?\d+)')
+
+class TouchFrame(NamedTuple):
+    """Frame cảm biến chạm (trường thiếu trong datagram là None)"""
+    value: Optional[int]
+    threshold: Optional[int]
+    stt: Optional[int]
+    
+    def merge(self, previous: Optional['TouchFrame']) -> 'TouchFrame':
+        """Điền trường thiếu bằng giá trị của frame trước (giữ None nếu không có)"""
+        if previous is None or None not in self:
+            return self
+        return TouchFrame(*(new if new is not None else old for new, old in zip(self, previous)))
+
+class AdcFrame(NamedTuple):
+    """Frame IR ADC"""
+    value: int
+
+TelemetryFrame = Union[TouchFrame, AdcFrame]
+
+def parse_frame(data) -> Optional[TelemetryFrame]:
+    """
+    Giải mã một datagram telemetry
+    
+    Args:
+        data: bytes, bytearray hoặc memoryview nhận từ socket
+    
+    Returns:
+        TouchFrame, AdcFrame hoặc None nếu không đúng format hoặc giá trị ngoài int32
+    """
+    match = _match_frame(data)
+    if match is None:
+        return _parse_fields(data)
+    
+    value, threshold, stt, adc = match.groups()
+    if adc is not None:
+        return AdcFrame(int(adc))
+    return TouchFrame(int(value), int(threshold), int(stt))
+
+def _parse_fields(data) -> Optional[TelemetryFrame]:
+    """Giải mã từng trường Val/Thr/Stt/IR_ADC độc lập, bỏ cả frame nếu có giá trị ngoài int32"""
+    fields = {}
+    for match in _FIELD.finditer(data):
+        number = int(match.group(2))
+        if not INT32_MIN <= number <= INT32_MAX:
+            return None
+        fields[match.group(1)] = number
+    
+    if b'Val' in fields or b'Thr' in fields or b'Stt' in fields:
+        return TouchFrame(fields.get(b'Val'), fields.get(b'Thr'), fields.get(b'Stt'))
+    if b'IR_ADC' in fields:
+        return AdcFrame(fields[b'IR_ADC'])
+    return None
@@ -0,0 +1,102 @@
+"""Test hàng đợi lệnh: gộp lệnh theo khóa, giữ thứ tự giữa các khóa và giới hạn tốc độ theo thiết bị"""
+
+import types
+
+import pytest
+
+import command_queue
+from command_queue import CommandQueue, coalesce_key
+
+DEVICE = ("10.0.0.1", 4210)
+OTHER = ("10.0.0.2", 4210)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(command_queue.time, "monotonic", clock)
+    return clock
+
+
+@pytest.fixture
+def queue(clock):
+    comm = types.SimpleNamespace(config=types.SimpleNamespace(esp_ip=DEVICE[0], esp_port=DEVICE[1]))
+    queue = CommandQueue(comm, min_interval=0.02)
+    # Không chạy thread gửi, test tự xả hàng đợi bằng take_ready()
+    queue.start_external(lambda: None)
+    return queue
+
+
+def drain(queue):
+    """Lấy hết lệnh sẵn sàng tại thời điểm hiện tại"""
+    sent = []
+    while True:
+        item, _ = queue.take_ready()
+        if item is None:
+            return sent
+        sent.append(item)
+
+
+@pytest.mark.parametrize("command, key", [
+    ("THRESHOLD:120", "THRESHOLD"),
+    ("IRtransmitOut:5", "IRtransmitOut"),
+    ("LEDCTRL:ALL,1,2,3", "LEDCTRL:ALL"),
+    ("LEDCTRL:5,1,2,3", "LEDCTRL:5"),
+    ("255 0 10", "COLOR"),
+    ("RESET", None),
+    ("PING:1", None),
+])
+def test_coalesce_key(command, key):
+    assert coalesce_key(command) == key
+
+
+def test_same_key_keeps_only_latest_value(queue):
+    for value in range(5):
+        queue.put(f"THRESHOLD:{value}")
+
+    assert drain(queue) == [("THRESHOLD:4", DEVICE)]
+    assert queue.total_coalesced == 4
+
+
+def test_order_is_kept_across_keys(queue, clock):
+    queue.put("THRESHOLD:1")
+    queue.put("RESET")
+    queue.put("LEDCTRL:ALL,1,2,3")
+    queue.put("RESET")
+    # Lệnh gộp mới chuyển xuống cuối hàng đợi, sau các lệnh đã vào trước nó
+    queue.put("THRESHOLD:2")
+
+    sent = []
+    while queue.pending_count():
+        sent += drain(queue)
+        clock.now += queue.min_interval
+    assert [command for command, _ in sent] == ["RESET", "LEDCTRL:ALL,1,2,3", "RESET", "THRESHOLD:2"]
+
+
+def test_rate_limit_per_device(queue, clock):
+    queue.put("THRESHOLD:1", DEVICE)
+    queue.put("RESET", DEVICE)
+    queue.put("THRESHOLD:1", OTHER)
+
+    # Mỗi thiết bị gửi được một lệnh, lệnh thứ hai của DEVICE phải chờ min_interval
+    assert drain(queue) == [("THRESHOLD:1", DEVICE), ("THRESHOLD:1", OTHER)]
+    item, wait = queue.take_ready()
+    assert item is None
+    assert wait == pytest.approx(queue.min_interval)
+
+    clock.now += queue.min_interval / 2
+    item, wait = queue.take_ready()
+    assert item is None
+    assert wait == pytest.approx(queue.min_interval / 2)
+
+    clock.now += queue.min_interval / 2
+    assert drain(queue) == [("RESET", DEVICE)]
+    assert queue.take_ready() == (None, None)
@@ -0,0 +1,109 @@
+"""Test shared-memory bridge: giá trị ngoài int32, record đang bị ghi đè, segment của instance khác"""
+
+import os
+import subprocess
+import sys
+import types
+
+import pytest
+
+from shmbridge import MonitorBridge, MonitorClient
+from telemetry import AdcFrame, TouchFrame
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_config(capacity=8):
+    return types.SimpleNamespace(monitor_shm_name=f"cube_touch_test_{os.getpid()}", monitor_ring_records=capacity,
+                                 monitor_clients=2, monitor_command_poll=0.05, esp_ip="10.0.0.1")
+
+
+@pytest.fixture
+def bridge():
+    bridge = MonitorBridge(make_config())
+    bridge.start()
+    assert bridge.is_running
+    yield bridge
+    bridge.stop()
+
+
+def read_in_process(name, code):
+    """Chạy MonitorClient trong process khác như monitor.py"""
+    script = f"import sys; sys.path.insert(0, {ROOT!r})\nfrom shmbridge import *\n" + code
+    return subprocess.run([sys.executable, "-c", script, name], capture_output=True, text=True,
+                          check=True).stdout.split()
+
+
+def test_out_of_range_values_are_not_published(bridge):
+    bridge.publish("10.0.0.1", TouchFrame(2 ** 31, 0, 0))
+    bridge.publish("10.0.0.1", AdcFrame(-(2 ** 31) - 1))
+    bridge.publish("10.0.0.1", AdcFrame(-5))
+    assert bridge.get_statistics()['monitor_records'] == 1
+    assert bridge.get_statistics()['monitor_rejected'] == 2
+
+
+def test_reader_drops_the_slot_being_overwritten(bridge, monkeypatch):
+    import shmbridge
+    client = MonitorClient(bridge.name)
+    try:
+        # Reader chậm đúng một vòng ring: slot đầu tiên cũng là slot app ghi kế tiếp
+        for i in range(bridge.capacity):
+            bridge.publish("10.0.0.1", AdcFrame(i))
+
+        # Mô phỏng app đang ghi record kế tiếp (chưa tăng write_seq) khi reader đọc lại write_seq
+        unpack_seq = shmbridge._SEQ.unpack_from
+
+        def unpack_during_write(buf, offset):
+            if len(calls) == 1:
+                shmbridge._RECORD.pack_into(bridge._buf, bridge._records_offset, 0.0, bytes(4), 2, 999, 0, 0)
+            calls.append(offset)
+            return unpack_seq(buf, offset)
+        calls = []
+        monkeypatch.setattr(shmbridge, "_SEQ", types.SimpleNamespace(unpack_from=unpack_during_write))
+
+        records = client.read()
+        assert [record.value for record in records] == list(range(1, bridge.capacity))
+        assert client.records_lost == 1
+    finally:
+        client.close()
+
+
+def test_second_instance_does_not_take_a_live_segment(bridge):
+    code = ("import types\n"
+            "config = types.SimpleNamespace(monitor_shm_name=sys.argv[1], monitor_ring_records=8, monitor_clients=2,\n"
+            "                               monitor_command_poll=0.05, esp_ip='10.0.0.2')\n"
+            "other = MonitorBridge(config); other.start(); print(other.is_running)\n")
+    assert read_in_process(bridge.name, code) == ["False"]
+    # Segment của instance đầu vẫn dùng được
+    bridge.publish("10.0.0.1", AdcFrame(7))
+    code = "client = MonitorClient(sys.argv[1]); print(client.capacity); client.close()\n"
+    assert read_in_process(bridge.name, code) == ["8"]
+
+
+@pytest.mark.parametrize("removed_before", ["attach", "unlink"])
+def test_stale_segment_removed_by_another_process(monkeypatch, removed_before):
+    import shmbridge
+    from multiprocessing import shared_memory
+    config = make_config()
+    # Segment của app bị kill: header rỗng, không có process sở hữu
+    stale = shared_memory.SharedMemory(name=config.monitor_shm_name, create=True, size=64)
+    attach = shmbridge._attach
+
+    def attach_while_tracker_cleans_up(name):
+        # Resource tracker của app bị kill xóa segment trước khi bridge kịp attach / unlink
+        if removed_before == "attach":
+            stale.unlink()
+            raise FileNotFoundError(name)
+        shm = attach(name)
+        stale.unlink()
+        return shm
+    monkeypatch.setattr(shmbridge, "_attach", attach_while_tracker_cleans_up)
+    monkeypatch.setattr(shmbridge.MonitorBridge, "_segment_owner", lambda self: None)
+
+    bridge = MonitorBridge(config)
+    try:
+        bridge.start()
+        assert bridge.is_running
+    finally:
+        bridge.stop()
+        stale.close()
@@ -0,0 +1,61 @@
+"""Test giải mã telemetry: format chuẩn, frame thiếu trường, đổi thứ tự và giá trị ngoài int32"""
+
+import pytest
+from telemetry import INT32_MAX, INT32_MIN, AdcFrame, TouchFrame, parse_frame
+
+
+@pytest.mark.parametrize("data, expected", [
+    (b"Val:22046 Thr:21649 Stt:0", TouchFrame(22046, 21649, 0)),
+    (b"Val: 21677 Thr: 21649 Stt: 0", TouchFrame(21677, 21649, 0)),
+    (b"Val:-3 Thr:5 Stt:1\r\n", TouchFrame(-3, 5, 1)),
+    (b"IR_ADC:2342", AdcFrame(2342)),
+    (memoryview(b"IR_ADC:7"), AdcFrame(7)),
+])
+def test_standard_frames(data, expected):
+    assert parse_frame(data) == expected
+
+
+@pytest.mark.parametrize("data, expected", [
+    (b"Val:1 Thr:2", TouchFrame(1, 2, None)),
+    (b"Thr:5", TouchFrame(None, 5, None)),
+    (b"Stt:1", TouchFrame(None, None, 1)),
+])
+def test_partial_frames(data, expected):
+    assert parse_frame(data) == expected
+
+
+@pytest.mark.parametrize("data", [b"Stt:1 Val:5 Thr:3", b"Thr:3 Stt:1 Val:5", b"Val:5  Stt:1 Thr:3"])
+def test_reordered_frames(data):
+    assert parse_frame(data) == TouchFrame(5, 3, 1)
+
+
+@pytest.mark.parametrize("data, expected", [
+    (b"IR_ADC:-5", AdcFrame(-5)),
+    (b"IR_ADC:70000", AdcFrame(70000)),
+    (b"IR_ADC:%d" % INT32_MAX, AdcFrame(INT32_MAX)),
+    (b"Val:%d Thr:0 Stt:0" % INT32_MIN, TouchFrame(INT32_MIN, 0, 0)),
+])
+def test_values_within_int32(data, expected):
+    assert parse_frame(data) == expected
+
+
+@pytest.mark.parametrize("data", [
+    b"IR_ADC:%d" % (INT32_MAX + 1),
+    b"Val:%d Thr:0 Stt:0" % (INT32_MIN - 1),
+    b"Val:1 Thr:99999999999999999999 Stt:0",
+    b"Stt:0 Val:1 Thr:-99999999999",
+])
+def test_values_outside_int32_are_invalid(data):
+    assert parse_frame(data) is None
+
+
+@pytest.mark.parametrize("data", [b"", b"hello", b"-123", b"Val: Thr: Stt:"])
+def test_invalid_frames(data):
+    assert parse_frame(data) is None
+
+
+def test_merge_fills_missing_fields_from_previous_frame():
+    previous = TouchFrame(10, 20, 0)
+    assert TouchFrame(11, None, None).merge(previous) == TouchFrame(11, 20, 0)
+    assert TouchFrame(None, 21, 1).merge(previous) == TouchFrame(10, 21, 1)
+    assert TouchFrame(None, 5, None).merge(None) == TouchFrame(None, 5, None)
@@ -0,0 +1,130 @@
+"""Test throttle: gửi cạnh đầu và giá trị cuối của đợt, flush/cancel và các wrapper IR, LED, touch"""
+
+import threading
+import time
+import types
+
+from IR import IRController
+from led import LEDController
+from throttle import Throttle
+from touch import TouchController
+
+INTERVAL = 0.05
+
+
+class Recorder:
+    """Ghi lại các lần gọi, chờ được số lần gọi mong muốn"""
+
+    def __init__(self):
+        self.calls = []
+        self._cond = threading.Condition()
+
+    def __call__(self, value):
+        with self._cond:
+            self.calls.append((time.monotonic(), value))
+            self._cond.notify_all()
+
+    def values(self):
+        return [value for _, value in self.calls]
+
+    def wait_for(self, count, timeout=2.0):
+        with self._cond:
+            return self._cond.wait_for(lambda: len(self.calls) >= count, timeout)
+
+
+class FakeComm:
+    """comm_handler giả, chỉ ghi lại lệnh được đưa vào hàng đợi"""
+
+    def __init__(self, accept=True):
+        self.accept = accept
+        self.commands = Recorder()
+
+    def queue_command(self, command):
+        self.commands(command)
+        return self.accept
+
+
+def test_burst_sends_leading_then_last_value_within_interval():
+    recorder = Recorder()
+    throttle = Throttle(recorder, INTERVAL)
+
+    start = time.monotonic()
+    for value in range(10):
+        throttle(value)
+    assert recorder.values() == [0]
+
+    assert recorder.wait_for(2)
+    assert recorder.values() == [0, 9]
+    # Giá trị cuối được gửi bởi timer, không trễ quá một interval (cộng sai số lập lịch)
+    assert recorder.calls[1][0] - start < INTERVAL * 3
+    assert not throttle.has_pending()
+
+
+def test_flush_sends_pending_value_immediately():
+    recorder = Recorder()
+    throttle = Throttle(recorder, 10.0)
+    throttle(1)
+    throttle(2)
+    throttle(3)
+
+    throttle.flush()
+    assert recorder.values() == [1, 3]
+    assert not throttle.has_pending()
+
+
+def test_cancel_drops_pending_value():
+    recorder = Recorder()
+    throttle = Throttle(recorder, INTERVAL)
+    throttle(1)
+    throttle(2)
+    assert throttle.has_pending()
+
+    throttle.cancel()
+    time.sleep(INTERVAL * 3)
+    assert recorder.values() == [1]
+    assert not throttle.has_pending()
+
+
+def test_ir_sends_last_value():
+    comm = FakeComm()
+    ir = IRController(comm, types.SimpleNamespace())
+    for value in (0.5, 1.0, 1.5, 2.0):
+        ir.set_transmit_value(value)
+
+    assert comm.commands.wait_for(2)
+    assert comm.commands.values() == ["IRtransmitOut:0.5", "IRtransmitOut:2.0"]
+
+
+def test_led_sends_last_value():
+    comm = FakeComm()
+    led = LEDController(comm, send_interval=INTERVAL)
+    led.set_color(255, 0, 0)
+    led.set_color(0, 255, 0)
+    led.set_brightness(255)
+
+    assert comm.commands.wait_for(2)
+    assert comm.commands.values() == ["128 0 0", "0 255 0"]
+
+
+def test_touch_sends_last_value():
+    comm = FakeComm()
+    touch = TouchController(comm, send_interval=INTERVAL)
+    for value in (100, 200, 300):
+        assert touch.set_threshold(value)
+
+    assert comm.commands.wait_for(2)
+    assert comm.commands.values() == ["THRESHOLD:100", "THRESHOLD:300"]
+    assert touch.get_threshold() == 300
+
+
+def test_touch_logs_failed_trailing_send(caplog):
+    comm = FakeComm(accept=False)
+    touch = TouchController(comm, send_interval=INTERVAL)
+    touch.set_threshold(100)
+    # Giá trị hợp lệ được nhận dù lệnh gửi sau đó thất bại
+    assert touch.set_threshold(200)
+
+    with caplog.at_level("ERROR"):
+        assert comm.commands.wait_for(2)
+        time.sleep(0.01)
+    assert "THRESHOLD:200" in caplog.text
@@ -0,0 +1,133 @@
+"""Test time-series store: giá trị ngoài phạm vi cột, thiết bị chưa có dữ liệu, chunk đã đóng, lỗi ghi và dựng lại pyramid"""
+
+import os
+import time
+import types
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from telemetry import AdcFrame, TouchFrame, parse_frame
+from tsstore import Series, TimeSeriesStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    config = types.SimpleNamespace(tsdb_dir=str(tmp_path), tsdb_chunk_size=64, tsdb_flush_size=4,
+                                   tsdb_keep_chunks=0)
+    store = TimeSeriesStore(config)
+    yield store
+    store.close()
+
+
+def test_negative_and_large_adc_values_are_stored(store):
+    values = [-5, 70000, 2342, -(2 ** 31), 2 ** 31 - 1]
+    for i, value in enumerate(values):
+        store.append_frame("10.0.0.1", parse_frame(b"IR_ADC:%d" % value), t=100.0 + i)
+    data = store.query("10.0.0.1", "adc", 0, 200)
+    assert data['value'].tolist() == values
+    assert len(data['t']) == len(data['value'])
+
+
+def test_out_of_range_values_are_rejected_without_breaking_the_series(store):
+    series_t = 100.0
+    frames = [TouchFrame(1, 2, 0), TouchFrame(2 ** 31, 2, 0), AdcFrame(2 ** 40), TouchFrame(3, 2, -(2 ** 31) - 1)]
+    frames += [TouchFrame(i, 2, 1) for i in range(10, 20)]  # Đủ nhiều để flush nhiều lần
+    for i, frame in enumerate(frames):
+        store.append_frame("10.0.0.2", frame, t=series_t + i)
+    store.flush()
+
+    touch = store.query("10.0.0.2", "touch", 0, 200)
+    assert touch['value'].tolist() == [1] + list(range(10, 20))
+    assert all(len(column) == len(touch['t']) for column in touch.values())
+    assert store.series("10.0.0.2", "touch").rejected == 2
+    assert store.series("10.0.0.2", "adc").rejected == 1
+    assert store.get_statistics()['tsdb_rejected'] == 3
+
+    envelope = store.series("10.0.0.2", "touch").envelope('value', 0, 200, 4)
+    assert envelope['max'].max() == 19
+
+
+def test_unknown_device_queries_are_empty_and_create_nothing(store, tmp_path):
+    assert len(store.query("10.9.9.9", "touch", 0, 1)['t']) == 0
+    assert len(store.downsample("10.9.9.9", "adc", 0, 1, 10)['t']) == 0
+    assert store.series("10.9.9.9", "adc") is None
+    assert not os.path.exists(tmp_path / "10.9.9.9")
+    assert "10.9.9.9" not in store.devices
+
+
+
+def make_store(tmp_path, chunk_size=64, flush_size=4, keep_chunks=0):
+    return TimeSeriesStore(types.SimpleNamespace(tsdb_dir=str(tmp_path), tsdb_chunk_size=chunk_size,
+                                                 tsdb_flush_size=flush_size, tsdb_keep_chunks=keep_chunks))
+
+
+def test_only_the_writable_chunk_stays_mapped(store):
+    for i in range(64 * 5 + 10):
+        store.append_frame("10.0.0.4", AdcFrame(i), t=100.0 + i)
+    store.flush()
+
+    series = store.series("10.0.0.4", "adc")
+    assert len(series.chunks) == 6
+    assert [chunk.columns != {} for chunk in series.chunks] == [False] * 5 + [True]
+    # Chunk đã đóng vẫn đọc được
+    assert store.query("10.0.0.4", "adc", 0, 1e9)['value'].tolist() == list(range(64 * 5 + 10))
+    assert series.envelope('value', 100.0, 100.0 + 64 * 5 + 9, 8)['max'].max() == 64 * 5 + 9
+
+
+def test_failed_segment_write_drops_the_tail(store, monkeypatch):
+    import tsstore
+
+    def no_space(*args, **kwargs):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(tsstore, "Chunk", no_space)
+    for i in range(10):
+        store.append_frame("10.0.0.5", AdcFrame(i), t=100.0 + i)
+    series = store.series("10.0.0.5", "adc")
+    assert len(series._tail['t']) < 4
+    assert series.dropped == 8
+    assert store.get_statistics()['tsdb_dropped'] == 8
+
+    monkeypatch.undo()
+    store.append_frame("10.0.0.5", AdcFrame(10), t=110.0)
+    store.append_frame("10.0.0.5", AdcFrame(11), t=111.0)
+    assert store.query("10.0.0.5", "adc", 0, 1e9)['value'].tolist() == [8, 9, 10, 11]
+
+
+def test_pyramids_are_rebuilt_outside_the_ingest_path(tmp_path):
+    store = make_store(tmp_path, keep_chunks=3)
+    for i in range(64 * 3):
+        store.append_frame("10.0.0.6", AdcFrame(i), t=100.0 + i)
+    store.close()
+
+    # Mở lại series không qua store: không có thread nền dựng pyramid
+    series = Series(str(tmp_path / "10.0.0.6"), "adc", 64, 4, keep_chunks=3)
+    try:
+        assert series.pyramids is None
+        # Chưa có pyramid: khoảng dài trả về rỗng, chunk cũ chưa bị xóa
+        assert len(series.envelope('value', 0, 1e9, 4)['t']) == 0
+        for i in range(64 * 3, 64 * 4 + 8):
+            series.append(100.0 + i, i)
+        series.flush()
+        assert len(series.chunks) == 5
+
+        series.build_pyramids()
+        assert len(series.chunks) == 3
+        result = series.envelope('value', 0, 1e9, 4)
+        assert result['max'].max() == 64 * 4 + 7
+        assert result['min'].min() == 64 * 2
+    finally:
+        series.close()
+
+    # Store dựng pyramid trong thread nền
+    store = make_store(tmp_path, keep_chunks=3)
+    try:
+        series = store.series("10.0.0.6", "adc")
+        deadline = time.monotonic() + 5
+        while series.pyramids is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert series.envelope('value', 0, 1e9, 4)['max'].max() == 64 * 4 + 7
+    finally:
+        store.close()
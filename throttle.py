@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Throttle module for Cube Touch Monitor
+Giới hạn tần suất gửi lệnh nhưng luôn gửi giá trị cuối cùng
+"""
+
+import threading
+import time
+from typing import Callable
+
+class Throttle:
+    """Gọi hàm tối đa một lần mỗi interval, có gửi ở cạnh đầu và cạnh cuối"""
+    
+    def __init__(self, func: Callable, interval: float, leading: bool = True, trailing: bool = True):
+        """
+        Khởi tạo throttle
+        
+        Args:
+            func: Hàm được gọi với tham số của lần gọi mới nhất
+            interval (float): Khoảng cách tối thiểu giữa 2 lần gọi (giây)
+            leading (bool): Gọi ngay lần đầu tiên của một đợt
+            trailing (bool): Gọi lại bằng timer với giá trị cuối của đợt
+        """
+        self.func = func
+        self.interval = interval
+        self.leading = leading
+        self.trailing = trailing
+        
+        self._lock = threading.Lock()
+        self._last_invoke = None
+        self._pending = None
+        self._timer = None
+    
+    def __call__(self, *args, **kwargs):
+        """Yêu cầu gọi hàm với giá trị mới"""
+        invoke_now = False
+        with self._lock:
+            now = time.monotonic()
+            idle = self._last_invoke is None or now - self._last_invoke >= self.interval
+            
+            if self._timer is None and idle and self.leading:
+                self._last_invoke = now
+                invoke_now = True
+            else:
+                # Chỉ giữ giá trị mới nhất, timer sẽ gửi khi hết interval
+                self._pending = (args, kwargs)
+                if self._timer is None:
+                    delay = self.interval if idle else self.interval - (now - self._last_invoke)
+                    self._schedule(delay)
+        
+        if invoke_now:
+            self.func(*args, **kwargs)
+    
+    def _schedule(self, delay: float):
+        self._timer = threading.Timer(delay, self._on_timer)
+        self._timer.daemon = True
+        self._timer.start()
+    
+    def _on_timer(self):
+        """Cạnh cuối: gửi giá trị mới nhất còn chờ"""
+        with self._lock:
+            self._timer = None
+            pending, self._pending = self._pending, None
+            if pending is None or not self.trailing:
+                return
+            self._last_invoke = time.monotonic()
+        
+        args, kwargs = pending
+        self.func(*args, **kwargs)
+    
+    def flush(self):
+        """Gửi ngay giá trị đang chờ (nếu có)"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            pending, self._pending = self._pending, None
+            if pending is None:
+                return
+            self._last_invoke = time.monotonic()
+        
+        args, kwargs = pending
+        self.func(*args, **kwargs)
+    
+    def cancel(self):
+        """Bỏ giá trị đang chờ"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._pending = None
+    
+    def has_pending(self) -> bool:
+        """Kiểm tra còn giá trị chờ gửi không"""
+        with self._lock:
+            return self._pending is not None
@@ -4,31 +4,50 @@ Touch Control module for Cube Touch Monitor
 Xử lý logic cảm biến chạm và ngưỡng
 """
 
+from throttle import Throttle
+from applog import get_logger
+
+log = get_logger('touch')
+
 class TouchController:
     """Điều khiển cảm biến chạm"""
     
-    def __init__(self, comm_handler):
+    def __init__(self, comm_handler, send_interval: float = 0.1):
         self.comm_handler = comm_handler
         self.current_threshold = 2932
+        self._threshold_throttle = Throttle(self._send_threshold, send_interval)
     
     def set_threshold(self, threshold: int) -> bool:
-        """Thiết lập ngưỡng cảm biến"""
+        """
+        Thiết lập ngưỡng cảm biến
+        
+        Returns:
+            bool: True nếu ngưỡng hợp lệ và đã được nhận. Lệnh có thể được gửi sau
+                  (throttle), lỗi khi gửi được ghi log chứ không trả về ở đây
+        """
         try:
             threshold_value = int(threshold)
             if threshold_value < 0 or threshold_value > 99999:
                 return False
                 
-            command = f"THRESHOLD:{threshold_value}"
-            success = self.comm_handler.send_udp_command(command)
-            
-            if success:
-                self.current_threshold = threshold_value
-                
-            return success
+            self.current_threshold = threshold_value
+            self._threshold_throttle(threshold_value)
+            return True
             
         except ValueError:
             return False
     
+    def _send_threshold(self, threshold_value: int):
+        """Gửi lệnh ngưỡng đến ESP32"""
+        try:
+            command = f"THRESHOLD:{threshold_value}"
+            if self.comm_handler.queue_command(command):
+                log.debug("Sent threshold command: %s", command)
+            else:
+                log.error("Failed to send threshold command: %s", command)
+        except Exception as e:
+            log.error("Error sending threshold command: %s", e)
+    
     def get_threshold(self) -> int:
         """Lấy ngưỡng hiện tại"""
         return self.current_threshold
\ No newline at end of file
@@ -0,0 +1,509 @@
+#!/usr/bin/env python3
+"""
+Time-series store module for Cube Touch Monitor
+Lưu lịch sử Value/Threshold/Stt và IR_ADC theo thiết bị dạng cột, ghi nối vào các file segment mmap
+"""
+
+import array
+import bisect
+import glob
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+from typing import Dict, List, Optional
+import numpy as np
+from telemetry import AdcFrame, TouchFrame
+from pyramid import Pyramid, reduce_columns
+from applog import get_logger
+
+log = get_logger('tsstore')
+
+# Header segment: magic, version, capacity, count
+_HEADER = struct.Struct('<4sIII')
+_MAGIC = b'CTTS'
+_VERSION = 1
+
+# Cột của từng series (t luôn là cột đầu, float64 giây epoch)
+SCHEMAS = {
+    'touch': (('t', '<f8'), ('value', '<i4'), ('threshold', '<i4'), ('stt', '<i4')),
+    'adc': (('t', '<f8'), ('value', '<i4')),
+}
+
+class Chunk:
+    """Một file segment chứa các cột liên tiếp với dung lượng cố định
+
+    Chỉ chunk đang ghi được mmap. Chunk đã đầy được đóng và chỉ map (chỉ đọc) trong lúc một lời gọi đọc nó,
+    nên số file đang mở không tăng theo số segment.
+    """
+
+    def __init__(self, path: str, schema, capacity: int, start_index: int = 0):
+        self.path = path
+        self.schema = schema
+        self.start_index = start_index  # Chỉ số (trong series) của mẫu đầu tiên
+
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                magic, version, capacity, count = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != _MAGIC or version != _VERSION:
+                raise ValueError(f"Not a time-series segment: {path}")
+        else:
+            count = 0
+
+        self.capacity = capacity
+        self.count = count
+        # Cột t (8 byte) đứng đầu ngay sau header 16 byte nên các cột đều căn hàng
+        self._offsets: Dict[str, int] = {}
+        offset = _HEADER.size
+        for name, dtype in schema:
+            self._offsets[name] = offset
+            offset += np.dtype(dtype).itemsize * capacity
+        self._size = offset
+
+        self._mm: Optional[mmap.mmap] = None
+        self.columns: Dict[str, np.ndarray] = {}  # View của mmap khi chunk đang mở
+        self._t_first = self._t_last = 0.0  # Giữ lại khi chunk đã đóng
+        if count < capacity:
+            self._open()
+        elif count:
+            t = self.read()['t']
+            self._t_first, self._t_last = float(t[0]), float(t[-1])
+
+    def _open(self):
+        with open(self.path, 'a+b') as f:
+            if f.tell() < self._size:
+                f.truncate(self._size)
+            self._mm = mmap.mmap(f.fileno(), self._size)
+        for name, dtype in self.schema:
+            self.columns[name] = np.frombuffer(self._mm, dtype=dtype, count=self.capacity,
+                                               offset=self._offsets[name])
+        self._write_header()
+
+    @property
+    def is_full(self) -> bool:
+        return self.count >= self.capacity
+
+    @property
+    def t_first(self) -> float:
+        if not self.count:
+            return float('inf')
+        return float(self.columns['t'][0]) if self._mm is not None else self._t_first
+
+    @property
+    def t_last(self) -> float:
+        if not self.count:
+            return float('-inf')
+        return float(self.columns['t'][self.count - 1]) if self._mm is not None else self._t_last
+
+    def read(self) -> Dict[str, np.ndarray]:
+        """Các cột đã ghi (view; chunk đã đóng được map chỉ đọc cho đến khi view được giải phóng)"""
+        if self._mm is not None:
+            return {name: column[:self.count] for name, column in self.columns.items()}
+        data = np.memmap(self.path, dtype=np.uint8, mode='r', shape=(self._size,))
+        columns = {}
+        for name, dtype in self.schema:
+            offset = self._offsets[name]
+            columns[name] = data[offset:offset + np.dtype(dtype).itemsize * self.count].view(dtype)
+        return columns
+
+    def append(self, columns: Dict[str, array.array], start: int) -> int:
+        """Ghi các mẫu từ vị trí start của các cột, trả về số mẫu đã ghi"""
+        n = min(len(columns['t']) - start, self.capacity - self.count)
+        if n <= 0:
+            return 0
+        end = self.count + n
+        for name, values in columns.items():
+            self.columns[name][self.count:end] = np.frombuffer(values, dtype=self.columns[name].dtype,
+                                                               count=n, offset=start * values.itemsize)
+        self.count = end
+        self._write_header()
+        return n
+
+    def slice(self, t0: float, t1: float) -> Dict[str, np.ndarray]:
+        """Các mẫu có t0 <= t <= t1 (view, không copy)"""
+        columns = self.read()
+        t = columns['t']
+        lo = np.searchsorted(t, t0, 'left')
+        hi = np.searchsorted(t, t1, 'right')
+        return {name: column[lo:hi] for name, column in columns.items()}
+
+    def search(self, t: float, side: str) -> int:
+        """Vị trí của t trong cột t của chunk (np.searchsorted)"""
+        return int(np.searchsorted(self.read()['t'], t, side))
+
+    def flush(self):
+        if self._mm is not None:
+            self._mm.flush()
+
+    def close(self):
+        """Đóng mmap, chunk vẫn đọc được qua read()"""
+        if self._mm is None:
+            return
+        self._t_first, self._t_last = self.t_first, self.t_last
+        self._mm.flush()
+        # Phải bỏ các view trước khi đóng mmap
+        self.columns = {}
+        self._mm.close()
+        self._mm = None
+
+    def _write_header(self):
+        _HEADER.pack_into(self._mm, 0, _MAGIC, _VERSION, self.capacity, self.count)
+
+class Series:
+    """Một series của một thiết bị: đuôi trong array.array, phần đã ghi trong các chunk mmap"""
+
+    def __init__(self, directory: str, name: str, chunk_size: int, flush_size: int,
+                 keep_chunks: int = 0):
+        self.directory = directory
+        self.name = name
+        self.schema = SCHEMAS[name]
+        # Phạm vi hợp lệ của từng cột giá trị, kiểm tra trước khi ghi để các cột luôn cùng độ dài
+        self._limits = [(int(np.iinfo(dtype).min), int(np.iinfo(dtype).max)) for _, dtype in self.schema[1:]]
+        self.rejected = 0  # Mẫu bị bỏ vì giá trị ngoài phạm vi cột
+        self.chunk_size = chunk_size
+        self.flush_size = flush_size
+        self.keep_chunks = keep_chunks
+
+        self._lock = threading.Lock()
+        self._tail = self._new_tail()
+        self._last_t = float('-inf')
+        self.total = 0
+        self.dropped = 0  # Mẫu bị bỏ vì không ghi được xuống segment
+        self._write_failed = False
+        self._closed = False
+        self._end_index = 0  # Chỉ số của mẫu kế tiếp ghi vào chunk
+
+        os.makedirs(directory, exist_ok=True)
+        self.chunks: List[Chunk] = []
+        for path in sorted(glob.glob(os.path.join(directory, f"{name}-*.seg"))):
+            try:
+                chunk = Chunk(path, self.schema, chunk_size, self._end_index)
+            except (OSError, ValueError) as e:
+                log.error("Skipping segment %s: %s", path, e)
+                continue
+            self.chunks.append(chunk)
+            self.total += chunk.count
+            self._end_index += chunk.count
+        # Chỉ chunk cuối còn được ghi tiếp
+        for chunk in self.chunks[:-1]:
+            chunk.close()
+        if self.chunks and self.chunks[-1].count:
+            self._last_t = self.chunks[-1].t_last
+
+        # Pyramid min/max/mean cho mỗi cột giá trị. Có dữ liệu đã lưu thì pyramid được dựng lại bằng
+        # build_pyramids() ngoài thread ingest; trong lúc đó (None) không xóa chunk cũ
+        self.pyramids: Optional[Dict[str, Pyramid]] = None
+        self._building = self._end_index > 0
+        if not self._building:
+            self.pyramids = {column: Pyramid() for column, _ in self.schema[1:]}
+        self._next_index = self._parse_index(self.chunks[-1].path) + 1 if self.chunks else 0
+
+    def _new_tail(self) -> Dict[str, array.array]:
+        return {name: array.array(np.dtype(dtype).char) for name, dtype in self.schema}
+
+    def append(self, t: float, *values) -> bool:
+        """Thêm một mẫu (t không giảm để range query dùng được binary search)
+
+        Trả về False và không ghi gì nếu có giá trị ngoài phạm vi kiểu của cột.
+        """
+        for value, (low, high) in zip(values, self._limits):
+            if not low <= value <= high:
+                self.rejected += 1
+                return False
+        with self._lock:
+            if t < self._last_t:
+                t = self._last_t
+            self._last_t = t
+            tail = self._tail
+            tail['t'].append(t)
+            for (name, _), value in zip(self.schema[1:], values):
+                tail[name].append(value)
+            self.total += 1
+            if len(tail['t']) >= self.flush_size:
+                self._flush_tail()
+        return True
+
+    def flush(self):
+        """Ghi phần đuôi vào chunk mmap"""
+        with self._lock:
+            self._flush_tail()
+
+    def _flush_tail(self):
+        tail = self._tail
+        written = 0
+        pending = len(tail['t'])
+        if not pending:
+            return
+        try:
+            while written < pending:
+                if not self.chunks or self.chunks[-1].is_full:
+                    self._open_chunk()
+                written += self.chunks[-1].append(tail, written)
+        except OSError as e:
+            # Không ghi được (đĩa đầy, hết file descriptor...): bỏ phần chưa ghi để đuôi không lớn mãi
+            self.dropped += pending - written
+            self.total -= pending - written
+            if not self._write_failed:
+                log.error("Error writing %s segment in %s, dropping samples: %s", self.name, self.directory, e)
+                self._write_failed = True
+        else:
+            if self._write_failed:
+                log.info("Writing %s segment in %s again", self.name, self.directory)
+                self._write_failed = False
+        self._end_index += written
+
+        if self.pyramids is not None and written:
+            t = np.frombuffer(tail['t'], dtype=np.float64, count=written)
+            for column, pyramid in self.pyramids.items():
+                pyramid.extend(t, np.frombuffer(tail[column], dtype=np.dtype(tail[column].typecode),
+                                                count=written))
+        self._tail = self._new_tail()
+
+    def _open_chunk(self):
+        path = os.path.join(self.directory, f"{self.name}-{self._next_index:06d}.seg")
+        self._next_index += 1
+        if self.chunks:
+            self.chunks[-1].close()
+        self.chunks.append(Chunk(path, self.schema, self.chunk_size, self._end_index))
+        if not self._building:
+            self._prune_chunks()
+
+    def _prune_chunks(self):
+        """Giữ số chunk trong giới hạn, bỏ chunk cũ nhất"""
+        while self.keep_chunks and len(self.chunks) > self.keep_chunks:
+            old = self.chunks.pop(0)
+            self.total -= old.count
+            old.close()
+            try:
+                os.remove(old.path)
+            except OSError as e:
+                log.error("Error removing segment %s: %s", old.path, e)
+        if self.pyramids is not None and self.chunks:
+            for pyramid in self.pyramids.values():
+                pyramid.trim(self.chunks[0].start_index)
+
+    def build_pyramids(self):
+        """Dựng lại pyramid từ các chunk đã lưu (gọi từ thread nền, không chặn thread ingest)
+
+        Chunk đã đầy không đổi nữa nên được đọc ngoài lock; chỉ phần trong chunk đang ghi được gom dưới lock
+        để pyramid bắt kịp trước khi _flush_tail cập nhật trực tiếp.
+        """
+        pyramids = {column: Pyramid() for column, _ in self.schema[1:]}
+        end = 0  # Chỉ số mẫu kế tiếp cần gom
+        try:
+            while True:
+                with self._lock:
+                    if self._closed or not self._building:
+                        return
+                    chunk = next((c for c in self.chunks if c.start_index + c.count > end), None)
+                    if chunk is None or chunk is self.chunks[-1]:
+                        if chunk is not None:
+                            self._extend_pyramids(pyramids, chunk.read(), end - chunk.start_index)
+                        self.pyramids = pyramids
+                        self._building = False
+                        self._prune_chunks()
+                        return
+                self._extend_pyramids(pyramids, chunk.read(), end - chunk.start_index)
+                end = chunk.start_index + chunk.count
+        except Exception as e:
+            # Không có pyramid: envelope chỉ trả khoảng ngắn, chunk cũ vẫn được xóa theo keep_chunks
+            log.error("Error rebuilding %s pyramids in %s: %s", self.name, self.directory, e)
+            with self._lock:
+                self._building = False
+
+    def _extend_pyramids(self, pyramids: Dict[str, Pyramid], columns: Dict[str, np.ndarray], start: int):
+        t = columns['t'][start:]
+        for column, pyramid in pyramids.items():
+            pyramid.extend(t, columns[column][start:])
+
+    @staticmethod
+    def _parse_index(path: str) -> int:
+        return int(os.path.basename(path).rsplit('-', 1)[1].split('.')[0])
+
+    def query(self, t0: float, t1: float) -> Dict[str, np.ndarray]:
+        """Tất cả mẫu trong [t0, t1] theo từng cột (copy)"""
+        with self._lock:
+            self._flush_tail()
+            parts = [chunk.slice(t0, t1) for chunk in self.chunks
+                     if chunk.count and chunk.t_last >= t0 and chunk.t_first <= t1]
+            if not parts:
+                return {name: np.empty(0, dtype=dtype) for name, dtype in self.schema}
+            return {name: np.concatenate([part[name] for part in parts]) for name, _ in self.schema}
+
+    def downsample(self, t0: float, t1: float, buckets: int) -> Dict[str, np.ndarray]:
+        """Gom [t0, t1] thành tối đa `buckets` khoảng thời gian: min/max/mean mỗi cột"""
+        data = self.query(t0, t1)
+        t = data['t']
+        if len(t) == 0:
+            return {'t': t, 'count': np.empty(0, dtype=np.int64)}
+
+        edges = np.linspace(t0, t1, buckets + 1)
+        starts = np.unique(np.searchsorted(t, edges[:-1], 'left'))
+        starts = starts[starts < len(t)]
+        counts = np.diff(np.append(starts, len(t)))
+
+        result = {'t': t[starts], 'count': counts}
+        for name, _ in self.schema[1:]:
+            column = data[name].astype(np.float64)
+            result[f"{name}_min"] = np.minimum.reduceat(column, starts)
+            result[f"{name}_max"] = np.maximum.reduceat(column, starts)
+            result[f"{name}_mean"] = np.add.reduceat(column, starts) / counts
+        return result
+
+    def _index_range(self, t0: float, t1: float):
+        """Chỉ số mẫu [lo, hi) của khoảng thời gian [t0, t1] (binary search chunk rồi trong chunk)"""
+        chunks = self.chunks  # Chunk rỗng (nếu có) luôn ở cuối, t_first = inf
+        if not chunks:
+            return 0, 0
+
+        def locate(t, side):
+            i = bisect.bisect_right(chunks, t, key=lambda chunk: chunk.t_first) - 1
+            if i < 0:
+                return chunks[0].start_index
+            chunk = chunks[i]
+            return chunk.start_index + chunk.search(t, side)
+
+        return locate(t0, 'left'), locate(t1, 'right')
+
+    def envelope(self, column: str, t0: float, t1: float, columns: int) -> Dict[str, np.ndarray]:
+        """Đúng tối đa `columns` điểm (t, min, max, mean) cho [t0, t1], chi phí không phụ thuộc độ dài khoảng"""
+        with self._lock:
+            self._flush_tail()
+            lo, hi = self._index_range(t0, t1)
+            if self.pyramids is not None:
+                result = self.pyramids[column].envelope(lo, hi, columns)
+                if result is not None:
+                    return result
+            elif hi - lo > self.chunk_size:
+                # Pyramid đang được dựng lại: không đọc thô khoảng dài, lần vẽ sau sẽ có dữ liệu
+                empty = np.empty(0)
+                return {'t': empty, 'min': empty, 'max': empty, 'mean': empty}
+
+            # Khoảng ngắn: ít hơn base mẫu mỗi cột nên đọc dữ liệu thô
+            parts = [chunk.slice(t0, t1) for chunk in self.chunks
+                     if chunk.count and chunk.t_last >= t0 and chunk.t_first <= t1]
+            t = np.concatenate([part['t'] for part in parts]) if parts else np.empty(0)
+            y = np.concatenate([part[column] for part in parts]).astype(np.float64) if parts else t
+        if len(t) == 0:
+            return {'t': t, 'min': t, 'max': t, 'mean': t}
+        return reduce_columns(np.arange(len(t)), t, y, y, y, np.ones(len(t)), 0, max(1, len(t)), columns)
+
+    def time_range(self):
+        """(t đầu, t cuối) của series, None nếu rỗng"""
+        with self._lock:
+            first = next((chunk.t_first for chunk in self.chunks if chunk.count), None)
+            if first is None and len(self._tail['t']):
+                first = self._tail['t'][0]
+            if first is None:
+                return None
+            return first, self._last_t
+
+    def close(self):
+        with self._lock:
+            self._flush_tail()
+            self._closed = True
+            for chunk in self.chunks:
+                chunk.close()
+            self.chunks = []
+
+class TimeSeriesStore:
+    """Lịch sử telemetry của tất cả thiết bị, mỗi thiết bị một thư mục"""
+
+    def __init__(self, config):
+        self.config = config
+        self.directory = config.tsdb_dir
+        self.devices: Dict[str, Dict[str, Series]] = {}
+        self._lock = threading.Lock()
+
+        # Thread nền dựng lại pyramid của series đã có dữ liệu trên đĩa (tạo khi cần)
+        self._build_queue = queue.SimpleQueue()
+        self._builder_thread = None
+
+    def _get_series(self, ip: str, name: str) -> Series:
+        device = self.devices.get(ip)
+        if device is None:
+            with self._lock:
+                device = self.devices.get(ip)
+                if device is None:
+                    directory = os.path.join(self.directory, ip)
+                    device = {series: Series(directory, series, self.config.tsdb_chunk_size,
+                                             self.config.tsdb_flush_size, self.config.tsdb_keep_chunks)
+                              for series in SCHEMAS}
+                    self.devices[ip] = device
+                    for series in device.values():
+                        if series.pyramids is None:
+                            self._queue_build(series)
+        return device[name]
+
+    def _queue_build(self, series: Series):
+        self._build_queue.put(series)
+        if self._builder_thread is None:
+            self._builder_thread = threading.Thread(target=self._builder_loop, daemon=True)
+            self._builder_thread.start()
+
+    def _builder_loop(self):
+        """Dựng pyramid lần lượt cho các series được đưa vào queue"""
+        while True:
+            series = self._build_queue.get()
+            if series is None:
+                return
+            series.build_pyramids()
+
+    def append_frame(self, ip: str, frame, t: Optional[float] = None):
+        """Lưu một frame đã giải mã của thiết bị ip"""
+        if t is None:
+            t = time.time()
+        if isinstance(frame, TouchFrame):
+            if None in frame:
+                return  # Thiết bị chưa gửi đủ Val/Thr/Stt lần nào
+            self._get_series(ip, 'touch').append(t, frame.value, frame.threshold, frame.stt)
+        elif isinstance(frame, AdcFrame):
+            self._get_series(ip, 'adc').append(t, frame.value)
+
+    def series(self, ip: str, name: str) -> Optional[Series]:
+        """Series của thiết bị (None nếu chưa có dữ liệu)"""
+        if ip not in self.devices and not os.path.isdir(os.path.join(self.directory, ip)):
+            return None
+        return self._get_series(ip, name)
+
+    def query(self, ip: str, name: str, t0: float, t1: float) -> Dict[str, np.ndarray]:
+        """Mẫu của thiết bị trong [t0, t1] (rỗng nếu thiết bị chưa có dữ liệu)"""
+        series = self.series(ip, name)
+        if series is None:
+            return {column: np.empty(0, dtype=dtype) for column, dtype in SCHEMAS[name]}
+        return series.query(t0, t1)
+
+    def downsample(self, ip: str, name: str, t0: float, t1: float, buckets: int) -> Dict[str, np.ndarray]:
+        """Mẫu của thiết bị gom theo khoảng thời gian (rỗng nếu thiết bị chưa có dữ liệu)"""
+        series = self.series(ip, name)
+        if series is None:
+            return {'t': np.empty(0, dtype=np.float64), 'count': np.empty(0, dtype=np.int64)}
+        return series.downsample(t0, t1, buckets)
+
+    def flush(self):
+        for device in list(self.devices.values()):
+            for series in device.values():
+                series.flush()
+
+    def close(self):
+        with self._lock:
+            for device in self.devices.values():
+                for series in device.values():
+                    series.close()
+            self.devices = {}
+            if self._builder_thread is not None:
+                self._build_queue.put(None)
+                self._builder_thread.join(timeout=1.0)
+                self._builder_thread = None
+
+    def get_statistics(self) -> dict:
+        """Thống kê store"""
+        series = [series for device in list(self.devices.values()) for series in device.values()]
+        return {
+            'tsdb_devices': len(self.devices),
+            'tsdb_samples': sum(s.total for s in series),
+            'tsdb_rejected': sum(s.rejected for s in series),
+            'tsdb_dropped': sum(s.dropped for s in series)
+        }
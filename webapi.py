@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+"""
+Web API module for Cube Touch Monitor
+HTTP/WebSocket server nhẹ (chỉ dùng thư viện chuẩn) cho dashboard từ xa: trạng thái device, thống kê, telemetry và lệnh
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import struct
+import threading
+from typing import Dict, Optional
+from applog import get_logger
+
+log = get_logger('webapi')
+
+_WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+_WS_TEXT = 0x1
+_WS_CLOSE = 0x8
+_WS_PING = 0x9
+_WS_PONG = 0xA
+_MAX_BODY = 64 * 1024
+_REQUEST_TIMEOUT = 10.0
+
+_REASONS = {200: "OK", 204: "No Content", 400: "Bad Request", 401: "Unauthorized", 403: "Forbidden",
+            404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+            415: "Unsupported Media Type", 503: "Service Unavailable"}
+
+def _ws_frame(payload: bytes, opcode: int = _WS_TEXT) -> bytes:
+    """Frame WebSocket từ server (không mask)"""
+    n = len(payload)
+    if n < 126:
+        header = struct.pack('!BB', 0x80 | opcode, n)
+    elif n < 65536:
+        header = struct.pack('!BBH', 0x80 | opcode, 126, n)
+    else:
+        header = struct.pack('!BBQ', 0x80 | opcode, 127, n)
+    return header + payload
+
+async def _read_ws_frame(reader: asyncio.StreamReader):
+    """Đọc một frame từ client, trả về (opcode, payload)"""
+    first, second = await reader.readexactly(2)
+    opcode = first & 0x0f
+    length = second & 0x7f
+    if length == 126:
+        length, = struct.unpack('!H', await reader.readexactly(2))
+    elif length == 127:
+        length, = struct.unpack('!Q', await reader.readexactly(8))
+    if length > _MAX_BODY:
+        raise ValueError("WebSocket frame too large")
+    mask = await reader.readexactly(4) if second & 0x80 else None
+    payload = await reader.readexactly(length)
+    if mask:
+        payload = bytes(b ^ mask[i & 3] for i, b in enumerate(payload))
+    return opcode, payload
+
+class _Stream:
+    """Một stream WebSocket: dựng payload một lần mỗi chu kỳ rồi gửi cho mọi client"""
+
+    def __init__(self, name: str, interval: float, source):
+        self.name = name
+        self.interval = interval
+        self.source = source  # Hàm trả về dữ liệu (chạy trong thread event loop)
+        self.clients = set()
+        self.last_frame: Optional[bytes] = None
+        self.frames_sent = 0
+        self.frames_dropped = 0
+
+class WebAPIServer:
+    """HTTP/WebSocket API trên một asyncio event loop trong thread nền
+
+    REST:
+        GET  /api/devices    trạng thái các ESP32 (HeartbeatManager)
+        GET  /api/stats      thống kê (CommunicationHandler, heartbeat, API)
+        GET  /api/telemetry  giá trị telemetry mới nhất của từng ESP32
+        POST /api/commands   lệnh LED / XILANH / THRESHOLD / IR qua các controller (Content-Type: application/json)
+    WebSocket (server chỉ gửi khi dữ liệu thay đổi, tối đa theo tần số cấu hình):
+        /ws/devices, /ws/stats, /ws/telemetry
+
+    Request từ trình duyệt (có header Origin) chỉ được nhận khi Origin nằm trong api_allowed_origins,
+    để trang web bất kỳ mở trên máy không điều khiển được thiết bị qua localhost.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.config = app.config
+        self.comm_handler = app.comm_handler
+        self.heartbeat_manager = app.heartbeat_manager
+        self.ingest_server = app.ingest_server
+
+        self.streams: Dict[str, _Stream] = {
+            '/ws/devices': _Stream('devices', self.config.api_devices_interval,
+                                   self.heartbeat_manager.get_all_devices_status),
+            '/ws/stats': _Stream('stats', self.config.api_stats_interval, self.get_all_statistics),
+            '/ws/telemetry': _Stream('telemetry', 1.0 / self.config.api_telemetry_rate,
+                                     self.ingest_server.get_all_device_states),
+        }
+
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.is_running = False
+        self.server_thread = None
+        self._server = None
+        self._tasks = []
+        self._connections = set()
+        self._started = threading.Event()
+
+        # Thống kê
+        self.requests_handled = 0
+        self.requests_rejected = 0  # Origin không được phép
+        self.commands_handled = 0
+
+    def start(self):
+        """Bắt đầu server trong thread nền"""
+        if self.is_running:
+            return
+        self.is_running = True
+        self._started.clear()
+        self.server_thread = threading.Thread(target=self._run_loop, daemon=True)
+        self.server_thread.start()
+        self._started.wait(timeout=5.0)
+
+    def stop(self):
+        """Đóng mọi kết nối và dừng event loop"""
+        if not self.is_running:
+            return
+        self.is_running = False
+        if self.loop:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        if self.server_thread:
+            self.server_thread.join(timeout=2.0)
+            self.server_thread = None
+
+    def _run_loop(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self._setup())
+            self._started.set()
+            self.loop.run_forever()
+        except Exception as e:
+            log.error("Error in web API server: %s", e)
+            self.is_running = False
+        finally:
+            self._started.set()
+            self._cleanup()
+            self.loop.close()
+            self.loop = None
+
+    async def _setup(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.config.api_host,
+                                                  self.config.api_port)
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._publish(stream)) for stream in self.streams.values()]
+        log.info("Web API listening on http://%s:%d", self.config.api_host, self.config.api_port)
+        if not self.config.api_token and self.config.api_host not in ('127.0.0.1', 'localhost', '::1'):
+            log.warning("Web API on %s accepts commands without a token, set api_token", self.config.api_host)
+
+    def _cleanup(self):
+        # Hủy các task stream và kết nối đang mở
+        pending = [task for task in asyncio.all_tasks(self.loop) if not task.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            self.loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        for writer in list(self._connections):
+            writer.close()
+        self._connections.clear()
+        self._tasks = []
+        if self._server:
+            self._server.close()
+            self.loop.run_until_complete(self._server.wait_closed())
+            self._server = None
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Một request HTTP mỗi kết nối, hoặc nâng cấp lên WebSocket"""
+        self._connections.add(writer)
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), _REQUEST_TIMEOUT)
+            parts = request_line.decode('latin-1').split()
+            if len(parts) != 3:
+                return
+            method, target, _ = parts
+            headers = {}
+            while True:
+                line = await asyncio.wait_for(reader.readline(), _REQUEST_TIMEOUT)
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            path = target.split('?', 1)[0]
+            self.requests_handled += 1
+            origin = headers.get('origin')
+
+            if origin is not None and origin not in self.config.api_allowed_origins:
+                self.requests_rejected += 1
+                await self._send_json(writer, 403, {'error': f"origin {origin} not allowed"})
+                return
+
+            if headers.get('upgrade', '').lower() == 'websocket':
+                await self._handle_websocket(path, headers, reader, writer)
+                return
+
+            if method == 'OPTIONS':
+                # Preflight CORS của origin được phép (POST JSON từ trình duyệt luôn có preflight)
+                await self._send_json(writer, 204, None, origin)
+                return
+
+            length = int(headers.get('content-length') or 0)
+            if length > _MAX_BODY:
+                status, payload = 413, {'error': "request body too large"}
+            else:
+                body = await asyncio.wait_for(reader.readexactly(length), _REQUEST_TIMEOUT) if length else b''
+                status, payload = self._route(method, path, headers, body)
+            await self._send_json(writer, status, payload, origin)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        except Exception as e:
+            log.error("Error handling API request: %s", e)
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+
+    def _route(self, method: str, path: str, headers: dict, body: bytes):
+        getters = {
+            '/api/devices': self.heartbeat_manager.get_all_devices_status,
+            '/api/stats': self.get_all_statistics,
+            '/api/telemetry': self.ingest_server.get_all_device_states,
+        }
+        if path in getters:
+            if method != 'GET':
+                return 405, {'error': "use GET"}
+            return 200, getters[path]()
+
+        if path == '/api/commands':
+            if method != 'POST':
+                return 405, {'error': "use POST"}
+            token = self.config.api_token
+            if token and headers.get('authorization') != f"Bearer {token}":
+                return 401, {'error': "invalid or missing token"}
+            # text/plain và form không cần preflight CORS nên chỉ nhận JSON
+            if headers.get('content-type', '').split(';', 1)[0].strip().lower() != 'application/json':
+                return 415, {'error': "Content-Type must be application/json"}
+            try:
+                command = json.loads(body or b'{}')
+                if not isinstance(command, dict):
+                    raise ValueError("command must be a JSON object")
+                result = self.execute_command(command)
+            except (ValueError, TypeError, KeyError) as e:
+                return 400, {'error': str(e)}
+            self.commands_handled += 1
+            return 200, {'ok': True, 'result': result}
+
+        return 404, {'error': f"no route for {path}"}
+
+    @staticmethod
+    async def _send_json(writer: asyncio.StreamWriter, status: int, payload, origin: Optional[str] = None):
+        """Gửi response JSON, origin: Origin đã được phép (thêm header CORS cho origin đó)"""
+        body = b'' if payload is None else json.dumps(payload).encode('utf-8')
+        cors = ""
+        if origin is not None:
+            cors = (f"Access-Control-Allow-Origin: {origin}\r\n"
+                    "Access-Control-Allow-Methods: GET, POST\r\n"
+                    "Access-Control-Allow-Headers: Content-Type, Authorization\r\n"
+                    "Vary: Origin\r\n")
+        writer.write((f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                      "Content-Type: application/json\r\n"
+                      f"{cors}"
+                      f"Content-Length: {len(body)}\r\n"
+                      "Connection: close\r\n\r\n").encode('latin-1') + body)
+        await writer.drain()
+
+    def execute_command(self, command: dict):
+        """Chạy một lệnh qua controller của app, ValueError nếu lệnh không hợp lệ
+
+        {"type": "led", "action": "color", "r": 255, "g": 0, "b": 0}
+        {"type": "led", "action": "brightness" | "direction", "value": ...}
+        {"type": "led", "action": "toggle" | "config_mode" | "rainbow" | "test"}
+        {"type": "xilanh", "action": "up" | "down" | "stop"}
+        {"type": "threshold", "value": 2932}
+        {"type": "ir", "transmit": 1.5, "receive": 2.0}  (một hoặc cả hai), hoặc {"type": "ir", "action": "reset"}
+        """
+        kind = command.get('type')
+        action = command.get('action')
+
+        if kind == 'led':
+            led = self.app.led_controller
+            if action == 'color':
+                led.set_color(*(self._channel(command, key) for key in ('r', 'g', 'b')))
+                return led.get_state()
+            if action == 'brightness':
+                led.set_brightness(int(command['value']))
+                return led.get_state()
+            actions = {
+                'toggle': led.toggle_led,
+                'direction': lambda: led.set_direction(int(command['value'])),
+                'config_mode': led.toggle_config_mode,
+                'rainbow': led.send_rainbow_effect,
+                'test': led.send_led_test,
+            }
+            if action in actions:
+                return actions[action]()
+            raise ValueError(f"unknown led action: {action}")
+
+        if kind == 'xilanh':
+            xilanh = self.app.xilanh_controller
+            actions = {'up': xilanh.move_up, 'down': xilanh.move_down, 'stop': xilanh.stop}
+            if action not in actions:
+                raise ValueError(f"unknown xilanh action: {action}")
+            return actions[action]()
+
+        if kind == 'threshold':
+            if not self.app.touch_controller.set_threshold(command['value']):
+                raise ValueError("threshold must be an integer between 0 and 99999")
+            return self.app.touch_controller.get_threshold()
+
+        if kind == 'ir':
+            ir = self.app.ir_controller
+            if action == 'reset':
+                ir.reset_values()
+            elif 'transmit' not in command and 'receive' not in command:
+                raise ValueError("ir command needs transmit and/or receive")
+            if 'transmit' in command:
+                ir.set_transmit_value(float(command['transmit']))
+            if 'receive' in command:
+                ir.set_receive_value(float(command['receive']))
+            return ir.get_status()
+
+        raise ValueError(f"unknown command type: {kind}")
+
+    @staticmethod
+    def _channel(command: dict, key: str) -> int:
+        value = int(command[key])
+        if not 0 <= value <= 255:
+            raise ValueError(f"{key} must be between 0 and 255")
+        return value
+
+    async def _handle_websocket(self, path: str, headers: dict, reader, writer):
+        stream = self.streams.get(path)
+        key = headers.get('sec-websocket-key')
+        if stream is None or not key:
+            await self._send_json(writer, 404, {'error': f"no stream for {path}"})
+            return
+        if sum(len(s.clients) for s in self.streams.values()) >= self.config.api_max_clients:
+            await self._send_json(writer, 503, {'error': "too many clients"})
+            return
+
+        accept = base64.b64encode(hashlib.sha1((key + _WS_GUID).encode()).digest()).decode()
+        writer.write(("HTTP/1.1 101 Switching Protocols\r\n"
+                      "Upgrade: websocket\r\n"
+                      "Connection: Upgrade\r\n"
+                      f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode('latin-1'))
+        # Client mới nhận ngay dữ liệu mới nhất, sau đó theo chu kỳ của stream
+        if stream.last_frame is not None:
+            writer.write(stream.last_frame)
+        await writer.drain()
+
+        stream.clients.add(writer)
+        try:
+            # Chỉ đọc để trả lời ping và phát hiện client đóng kết nối
+            while True:
+                opcode, payload = await _read_ws_frame(reader)
+                if opcode == _WS_CLOSE:
+                    writer.write(_ws_frame(payload[:2], _WS_CLOSE))
+                    break
+                if opcode == _WS_PING:
+                    writer.write(_ws_frame(payload, _WS_PONG))
+        finally:
+            stream.clients.discard(writer)
+
+    async def _publish(self, stream: _Stream):
+        """Task của một stream: mỗi chu kỳ dựng JSON một lần, chỉ gửi khi dữ liệu thay đổi"""
+        limit = self.config.api_client_buffer
+        last_payload = None
+        while True:
+            await asyncio.sleep(stream.interval)
+            if not stream.clients:
+                continue
+            try:
+                payload = json.dumps(stream.source()).encode('utf-8')
+            except Exception as e:
+                log.error("Error building %s stream: %s", stream.name, e)
+                continue
+            if payload == last_payload:
+                continue
+            last_payload = payload
+            stream.last_frame = frame = _ws_frame(payload)
+
+            for writer in list(stream.clients):
+                # Client chậm: bỏ frame này thay vì để buffer phình ra, frame sau mang dữ liệu mới nhất
+                if writer.transport.get_write_buffer_size() > limit:
+                    stream.frames_dropped += 1
+                    continue
+                writer.write(frame)
+                stream.frames_sent += 1
+
+    def get_statistics(self) -> dict:
+        """Thống kê API"""
+        return {
+            'api_requests': self.requests_handled,
+            'api_rejected': self.requests_rejected,
+            'api_commands': self.commands_handled,
+            'api_ws_clients': sum(len(stream.clients) for stream in self.streams.values()),
+            'api_frames_sent': sum(stream.frames_sent for stream in self.streams.values()),
+            'api_frames_dropped': sum(stream.frames_dropped for stream in self.streams.values())
+        }
+
+    def get_all_statistics(self) -> dict:
+        """Thống kê của CommunicationHandler, heartbeat và API"""
+        return {
+            **self.comm_handler.get_statistics(),
+            **self.heartbeat_manager.get_statistics(),
+            **self.get_statistics()
+        }
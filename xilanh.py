@@ -14,7 +14,7 @@ class XilanhController:
     def move_up(self) -> bool:
         """Di chuyển xi lanh lên"""
         command = "XILANH:2"
-        success = self.comm_handler.send_udp_command(command)
+        success = self.comm_handler.queue_command(command)
         
         if success:
             self.current_state = 2
@@ -24,7 +24,7 @@ class XilanhController:
     def move_down(self) -> bool:
         """Di chuyển xi lanh xuống"""
         command = "XILANH:1"
-        success = self.comm_handler.send_udp_command(command)
+        success = self.comm_handler.queue_command(command)
         
         if success:
             self.current_state = 1
@@ -34,7 +34,7 @@ class XilanhController:
     def stop(self) -> bool:
         """Dừng xi lanh"""
         command = "XILANH:0"
-        success = self.comm_handler.send_udp_command(command)
+        success = self.comm_handler.queue_command(command)
         
         if success:
             self.current_state = 0